@@ -4,9 +4,9 @@ Process graph building functionality for 1.0.0-style process graphs and DataCube
 
 """
 import collections
-from typing import Union
-
-from openeo.internal.process_graph_visitor import ProcessGraphVisitor
+import hashlib
+import json
+from typing import Dict, Generator, List, Union
 
 
 class PGNode:
@@ -32,6 +32,8 @@ class PGNode:
                 arguments[arg] = {"from_node": value}
         # TODO: use a frozendict of some sort to ensure immutability?
         self._arguments = arguments
+        # Memoized structural hash (assumes node is not modified after construction)
+        self._structural_hash = None
 
     def __repr__(self):
         return "<{c} {p!r} at 0x{m:x}>".format(c=self.__class__.__name__, p=self.process_id, m=id(self))
@@ -49,25 +51,149 @@ class PGNode:
         Convert process graph to a nested dictionary structure.
         Uses deep copy style: nodes that are reused in graph will be deduplicated
         """
-
-        def _deep_copy(x):
-            """PGNode aware deep copy helper"""
+        # Explicit stack based deep copy (instead of recursion) to support very deep graphs.
+        holder = [None]
+        # Stack of (value to convert, container to put converted value in, key/index in that container)
+        stack = [(self, holder, 0)]
+        tuples = []
+        while stack:
+            x, container, key = stack.pop()
             if isinstance(x, PGNode):
-                return {"process_id": x.process_id, "arguments": _deep_copy(x.arguments)}
+                converted = {"process_id": x.process_id, "arguments": None}
+                stack.append((x.arguments, converted, "arguments"))
             elif isinstance(x, dict):
-                return {str(k): _deep_copy(v) for k, v in x.items()}
+                converted = {str(k): None for k in x.keys()}
+                stack.extend((v, converted, str(k)) for k, v in x.items())
             elif isinstance(x, (list, tuple)):
-                return type(x)(_deep_copy(v) for v in x)
+                converted = [None] * len(x)
+                stack.extend((v, converted, i) for i, v in enumerate(x))
+                if isinstance(x, tuple):
+                    tuples.append((type(x), container, key))
             elif isinstance(x, (str, int, float)) or x is None:
-                return x
+                converted = x
             else:
                 raise ValueError(repr(x))
+            container[key] = converted
+        # Convert (innermost first) the lists that should be tuples.
+        for cls, container, key in reversed(tuples):
+            container[key] = cls(container[key])
+        return holder[0]
+
+    def _child_nodes(self) -> List['PGNode']:
+        """Nodes directly referenced from the arguments (including sub-process graphs) of this node."""
+        children = []
+        stack = [self.arguments]
+        while stack:
+            x = stack.pop()
+            if isinstance(x, PGNode):
+                children.append(x)
+            elif isinstance(x, dict):
+                stack.extend(x.values())
+            elif isinstance(x, (list, tuple)):
+                stack.extend(x)
+        return children
 
-        return _deep_copy(self)
+    def structural_hash(self) -> str:
+        """
+        Canonical hash of the (sub)graph represented by this node:
+        structurally identical graphs have the same hash, regardless of Python object identity.
+        """
+        # Hash dependencies first (post-order with explicit stack instead of recursion to support very deep graphs).
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            if node._structural_hash is not None:
+                stack.pop()
+                continue
+            pending = [c for c in node._child_nodes() if c._structural_hash is None]
+            if pending:
+                stack.extend(pending)
+            else:
+                node._structural_hash = node._compute_structural_hash()
+                stack.pop()
+        return self._structural_hash
 
-    def flatten(self):
-        # First convert to dict (as deep copy)
-        return GraphFlattener().flatten(node=self)
+    def _compute_structural_hash(self) -> str:
+        """Compute structural hash, assuming the hashes of all dependencies are already computed."""
+
+        def _canonical(x):
+            if isinstance(x, PGNode):
+                return {"pgnode": x._structural_hash}
+            elif isinstance(x, dict):
+                return {str(k): _canonical(v) for k, v in x.items()}
+            elif isinstance(x, (list, tuple)):
+                return [_canonical(v) for v in x]
+            else:
+                return x
+
+        canonical = json.dumps(
+            {"process_id": self.process_id, "arguments": _canonical(self.arguments)},
+            sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def flatten(self, merge_common_subgraphs: bool = False):
+        """
+        Convert to flat process graph dictionary.
+
+        :param merge_common_subgraphs: whether to merge structurally identical nodes
+            (see :py:class:`GraphFlattener`)
+        """
+        return GraphFlattener(merge_common_subgraphs=merge_common_subgraphs).flatten(node=self)
+
+    @classmethod
+    def from_flat_graph(cls, flat_graph: dict) -> 'PGNode':
+        """
+        Build a (nested) PGNode graph from a flat process graph dictionary (e.g. loaded from JSON),
+        for example to reuse it with :py:class:`DataCube`.
+
+        Nodes are created in a single topological pass (without recursion),
+        a node that is used multiple times results in a single (shared) PGNode object.
+        Child process graphs (e.g. callbacks under "process_graph") are converted too.
+        The given dictionary is not modified.
+
+        :param flat_graph: flat process graph dictionary (mapping node id to node dictionary)
+        :return: PGNode corresponding to the "result" node of the graph
+        """
+        result_id = None
+        for node_id, node in flat_graph.items():
+            if node.get("result", False):
+                if result_id is not None:
+                    raise ValueError("Multiple result nodes: {a}, {b}".format(a=result_id, b=node_id))
+                result_id = node_id
+        if result_id is None:
+            raise ValueError("The provided process graph does not contain a result node.")
+
+        nodes = {}  # type: Dict[str, PGNode]
+        # Nodes waiting for their dependencies to be created.
+        in_progress = set()
+        stack = [result_id]
+        while stack:
+            node_id = stack[-1]
+            if node_id in nodes:
+                stack.pop()
+                continue
+            arguments = flat_graph[node_id].get("arguments", {})
+            pending = []
+            for ref in _flat_node_references(arguments):
+                if ref not in flat_graph:
+                    raise ValueError('from_node {f!r} (referenced by {n!r}) not in process graph.'.format(
+                        f=ref, n=node_id))
+                if ref not in nodes:
+                    if ref in in_progress:
+                        raise ValueError("Cycle in process graph: {r!r} (indirectly) depends on itself.".format(r=ref))
+                    pending.append(ref)
+            if pending:
+                in_progress.add(node_id)
+                stack.extend(pending)
+            else:
+                nodes[node_id] = PGNode(
+                    process_id=flat_graph[node_id]["process_id"],
+                    arguments=_resolve_flat_node_references(arguments, nodes)
+                )
+                in_progress.discard(node_id)
+                stack.pop()
+        return nodes[result_id]
 
     @staticmethod
     def to_process_graph_argument(value: Union['PGNode', str, dict]):
@@ -87,6 +213,35 @@ class PGNode:
             raise ValueError(value)
 
 
+def _flat_node_references(arguments: dict) -> List[str]:
+    """Node ids referenced (with "from_node") in given arguments of a flat graph node (excluding child graphs)."""
+    references = []
+    stack = [arguments]
+    while stack:
+        x = stack.pop()
+        if isinstance(x, dict):
+            if "from_node" in x:
+                references.append(x["from_node"])
+            elif "process_graph" not in x:
+                stack.extend(x.values())
+        elif isinstance(x, list):
+            stack.extend(x)
+    return references
+
+
+def _resolve_flat_node_references(value, nodes: Dict[str, PGNode]):
+    """Copy of given (flat graph) argument value, with "from_node" references resolved to the given PGNodes."""
+    if isinstance(value, dict):
+        if "from_node" in value:
+            return {"from_node": nodes[value["from_node"]]}
+        elif isinstance(value.get("process_graph"), dict):
+            return dict(value, process_graph=PGNode.from_flat_graph(value["process_graph"]))
+        return {k: _resolve_flat_node_references(v, nodes) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [_resolve_flat_node_references(v, nodes) for v in value]
+    return value
+
+
 class ReduceNode(PGNode):
     """
     A process graph node for "reduce" processes (has a reducer sub-process-graph)
@@ -138,74 +293,99 @@ class FlatGraphNodeIdGenerator:
         return "{p}{c}".format(p=process_id.replace('_', ''), c=self._counters[process_id])
 
 
-class GraphFlattener(ProcessGraphVisitor):
+class GraphFlattener:
+    """
+    Convert a nested PGNode based process graph to a flat dict based process graph.
+
+    With `merge_common_subgraphs` enabled, structurally identical nodes
+    (common subexpressions) are merged into a single flat graph node,
+    even if they are different Python objects.
+    By default (and for graphs that can not be hashed, e.g. with non-JSON arguments),
+    only reused node objects are merged.
+
+    The graph is walked with an explicit stack (instead of recursion), so that the cost is linear
+    in the number of nodes and very deep graphs (e.g. long generated chains) are supported.
+    Node dependencies are handled in argument name order,
+    as in the default (tree walking) mode of :py:class:`ProcessGraphVisitor`.
+    """
 
-    def __init__(self, node_id_generator: FlatGraphNodeIdGenerator = None):
-        super().__init__()
+    def __init__(self, node_id_generator: FlatGraphNodeIdGenerator = None, merge_common_subgraphs: bool = False):
         self._node_id_generator = node_id_generator or FlatGraphNodeIdGenerator()
+        self._merge_common_subgraphs = merge_common_subgraphs
         self._last_node_id = None
         self._flattened = {}
-        self._argument_stack = []
+        # Node ids of the nodes flattened already (by structural hash or object id)
         self._node_cache = {}
 
     def flatten(self, node: PGNode):
         """Consume given nested process graph and return flattened version"""
-        self.accept_node(node)
-        assert len(self._argument_stack) == 0
+        if self._merge_common_subgraphs:
+            try:
+                # Hash the whole graph up front: all or nothing.
+                node.structural_hash()
+            except (TypeError, ValueError):
+                # Non-JSON arguments: fall back on merging reused node objects only.
+                self._merge_common_subgraphs = False
+        self._last_node_id = self._flatten_node(node)
         self._flattened[self._last_node_id]["result"] = True
         return self._flattened
 
-    def accept_node(self, node: PGNode):
-        # Process reused nodes only first time and remember node id.
-        node_id = id(node)
-        if node_id not in self._node_cache:
-            super()._accept_process(process_id=node.process_id, arguments=node.arguments)
-            self._node_cache[node_id] = self._last_node_id
-        else:
-            self._last_node_id = self._node_cache[node_id]
-
-    def enterProcess(self, process_id: str, arguments: dict):
-        self._argument_stack.append({})
-
-    def leaveProcess(self, process_id: str, arguments: dict):
-        node_id = self._node_id_generator.generate(process_id)
+    def _key(self, node: PGNode):
+        return node.structural_hash() if self._merge_common_subgraphs else id(node)
+
+    def _flatten_node(self, root: PGNode) -> str:
+        """Flatten given node and its dependencies, return its node id."""
+        key = self._key(root)
+        if key in self._node_cache:
+            return self._node_cache[key]
+        # Stack of (node key, flattening generator): generators yield the nodes they depend on
+        # and get the corresponding node id sent back.
+        stack = [(key, self._flatten_process(root))]
+        node_id = None
+        while stack:
+            key, flattening = stack[-1]
+            try:
+                dependency = flattening.send(node_id)
+            except StopIteration as e:
+                stack.pop()
+                node_id = self._node_cache[key] = e.value
+                continue
+            dependency_key = self._key(dependency)
+            if dependency_key in self._node_cache:
+                node_id = self._node_cache[dependency_key]
+            else:
+                stack.append((dependency_key, self._flatten_process(dependency)))
+                node_id = None
+        return node_id
+
+    def _flatten_process(self, node: PGNode) -> Generator[PGNode, str, str]:
+        arguments = {}
+        for arg_id, value in sorted(node.arguments.items()):
+            if isinstance(value, list):
+                array = []
+                for element in value:
+                    if isinstance(element, dict):
+                        element = yield from self._flatten_argument(element)
+                    array.append(element)
+                arguments[arg_id] = array
+            elif isinstance(value, dict):
+                arguments[arg_id] = yield from self._flatten_argument(value)
+            else:
+                arguments[arg_id] = value
+        node_id = self._node_id_generator.generate(node.process_id)
         self._flattened[node_id] = {
-            "process_id": process_id,
-            "arguments": self._argument_stack.pop()
+            "process_id": node.process_id,
+            "arguments": arguments
         }
-        self._last_node_id = node_id
-
-    def _store_argument(self, argument_id: str, value):
-        self._argument_stack[-1][argument_id] = value
-
-    def _store_array_element(self, value):
-        self._argument_stack[-1].append(value)
-
-    def enterArray(self, argument_id: str):
-        array = []
-        self._store_argument(argument_id, array)
-        self._argument_stack.append(array)
-
-    def leaveArray(self, argument_id: str):
-        self._argument_stack.pop()
-
-    def arrayElementDone(self, value):
-        self._store_array_element(self._flatten_argument(value))
-
-    def constantArrayElement(self, value):
-        self._store_array_element(self._flatten_argument(value))
-
-    def _flatten_argument(self, value):
-        if isinstance(value, dict):
-            if "from_node" in value:
-                value = {"from_node": self._last_node_id}
-            elif "process_graph" in value:
-                pg = value["process_graph"]
-                value = {"process_graph": GraphFlattener(node_id_generator=self._node_id_generator).flatten(pg)}
+        return node_id
+
+    def _flatten_argument(self, value: dict) -> Generator[PGNode, str, dict]:
+        if value.get("from_node"):
+            node_id = yield value["from_node"]
+            value = {"from_node": node_id}
+        elif "process_graph" in value:
+            pg = value["process_graph"]
+            value = {"process_graph": GraphFlattener(
+                node_id_generator=self._node_id_generator, merge_common_subgraphs=self._merge_common_subgraphs
+            ).flatten(pg)}
         return value
-
-    def leaveArgument(self, argument_id: str, value):
-        self._store_argument(argument_id, self._flatten_argument(value))
-
-    def constantArgument(self, argument_id: str, value):
-        self._store_argument(argument_id, value)
@@ -0,0 +1,251 @@
+"""
+Client-side optimization passes for 1.0.0-style (PGNode based) process graphs.
+
+Optimization passes are graph rewrites: they return a new graph and leave the original untouched.
+"""
+import copy
+import logging
+import operator
+from typing import Callable, Dict, List, Union
+
+from openeo.internal.graph_building import PGNode
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_CRS = 4326
+
+
+def _is_argument_container(value) -> bool:
+    return (isinstance(value, dict) and "process_graph" not in value) or isinstance(value, (list, tuple))
+
+
+def _node_references(value) -> List[PGNode]:
+    """Node references (PGNode instances) in (nested) argument value, excluding sub-process graphs (callbacks)."""
+    references = []
+    stack = [value]
+    while stack:
+        x = stack.pop()
+        if isinstance(x, PGNode):
+            references.append(x)
+        elif _is_argument_container(x):
+            stack.extend(reversed(list(x.values() if isinstance(x, dict) else x)))
+    return references
+
+
+def _map_node_references(value, f: Callable[[PGNode], PGNode]):
+    """
+    Apply function to all node references (PGNode instances) in (nested) argument value.
+    Sub-process graphs (callbacks) are left untouched.
+    Returns original value if nothing changed.
+    """
+    # Post-order walk with explicit stack: containers are rebuilt after their items are mapped.
+    mapped = []
+    stack = [(value, False)]
+    while stack:
+        x, items_done = stack.pop()
+        if isinstance(x, PGNode):
+            mapped.append(f(x))
+        elif _is_argument_container(x):
+            items = list(x.values() if isinstance(x, dict) else x)
+            if not items_done:
+                stack.append((x, True))
+                stack.extend((v, False) for v in reversed(items))
+                continue
+            new_items = mapped[len(mapped) - len(items):]
+            del mapped[len(mapped) - len(items):]
+            if all(n is v for n, v in zip(new_items, items)):
+                mapped.append(x)
+            elif isinstance(x, dict):
+                mapped.append(dict(zip(x.keys(), new_items)))
+            else:
+                mapped.append(type(x)(new_items))
+        else:
+            mapped.append(x)
+    return mapped[0]
+
+
+def clone_with_arguments(node: PGNode, arguments: dict) -> PGNode:
+    """Shallow copy of given node (keeping its class and attributes), with new arguments."""
+    clone = copy.copy(node)
+    clone._arguments = arguments
+    clone._structural_hash = None
+    return clone
+
+
+def count_consumers(node: PGNode) -> Dict[int, int]:
+    """Count for each node (by object id) how many references there are to it in the graph."""
+    counts = {id(node): 0}
+    stack = [node]
+    while stack:
+        for ref in _node_references(stack.pop().arguments):
+            if id(ref) not in counts:
+                counts[id(ref)] = 0
+                stack.append(ref)
+            counts[id(ref)] += 1
+    return counts
+
+
+def rewrite_graph(node: PGNode, rewriter: Callable[[PGNode, PGNode], PGNode]) -> PGNode:
+    """
+    Bottom-up rewrite of a process graph.
+
+    :param node: result node of the graph to rewrite
+    :param rewriter: function that is called for each node with the node (with already rewritten inputs)
+        and the original node, and returns the (possibly new) node to use instead.
+    :return: result node of rewritten graph
+    """
+    rewritten = {}
+    # Rewrite dependencies first (post-order with explicit stack instead of recursion to support very deep graphs).
+    stack = [node]
+    while stack:
+        n = stack[-1]
+        if id(n) in rewritten:
+            stack.pop()
+            continue
+        pending = [r for r in _node_references(n.arguments) if id(r) not in rewritten]
+        if pending:
+            stack.extend(reversed(pending))
+        else:
+            arguments = _map_node_references(n.arguments, lambda r: rewritten[id(r)])
+            new = n if arguments is n.arguments else clone_with_arguments(n, arguments)
+            rewritten[id(n)] = rewriter(new, n)
+            stack.pop()
+    return rewritten[id(node)]
+
+
+def intersect_spatial_extent(extent: Union[dict, None], bbox: dict) -> Union[dict, None]:
+    """Intersect (optional) load_collection spatial extent with filter_bbox extent (None if not possible)."""
+    if not isinstance(bbox, dict) or set(bbox.keys()) - {"west", "east", "north", "south", "crs"}:
+        return None
+    if not all(isinstance(bbox.get(k), (int, float)) for k in ["west", "east", "north", "south"]):
+        return None
+    if extent is None:
+        return dict(bbox)
+    if not isinstance(extent, dict) or set(extent.keys()) - {"west", "east", "north", "south", "crs"}:
+        return None
+    if (extent.get("crs") or DEFAULT_CRS) != (bbox.get("crs") or DEFAULT_CRS):
+        return None
+    intersection = dict(
+        west=max(extent["west"], bbox["west"]), east=min(extent["east"], bbox["east"]),
+        north=min(extent["north"], bbox["north"]), south=max(extent["south"], bbox["south"]),
+    )
+    if "crs" in extent or "crs" in bbox:
+        intersection["crs"] = extent.get("crs") or bbox.get("crs")
+    return intersection
+
+
+def intersect_temporal_extent(extent: Union[list, None], interval: list) -> Union[list, None]:
+    """Intersect (optional) load_collection temporal extent with filter_temporal extent (None if not possible)."""
+
+    def valid(e):
+        return isinstance(e, (list, tuple)) and len(e) == 2 and all(d is None or isinstance(d, str) for d in e)
+
+    if not valid(interval):
+        return None
+    if extent is None:
+        return list(interval)
+    if not valid(extent):
+        return None
+    starts = [d for d in [extent[0], interval[0]] if d is not None]
+    ends = [d for d in [extent[1], interval[1]] if d is not None]
+    return [max(starts) if starts else None, min(ends) if ends else None]
+
+
+def _filter_bands(bands: Union[list, None], selection: list) -> Union[list, None]:
+    """Apply filter_bands band selection to (optional) load_collection bands (None if not possible)."""
+    if not isinstance(selection, list) or not all(isinstance(b, str) for b in selection):
+        return None
+    if bands is None:
+        return list(selection)
+    if not isinstance(bands, list) or not set(selection).issubset(bands):
+        return None
+    return list(selection)
+
+
+# Filter process id to (load_collection argument, argument merge function)
+_PUSHDOWN_FILTERS = {
+    "filter_bbox": ("spatial_extent", "extent", intersect_spatial_extent),
+    "filter_temporal": ("temporal_extent", "extent", intersect_temporal_extent),
+    "filter_bands": ("bands", "bands", _filter_bands),
+}
+
+
+def push_down_filters(node: PGNode) -> PGNode:
+    """
+    Fold `filter_bbox`, `filter_temporal` and `filter_bands` nodes into the
+    `spatial_extent`, `temporal_extent` and `bands` arguments of their input `load_collection` node
+    (intersecting with extents that are already set there).
+
+    Filters are only pushed down into `load_collection` nodes that have no other consumers.
+    """
+    consumers = count_consumers(node)
+
+    def rewrite(new: PGNode, original: PGNode) -> PGNode:
+        if new.process_id not in _PUSHDOWN_FILTERS or set(new.arguments.keys()) - {"data", "extent", "bands"}:
+            return new
+        data = new.arguments.get("data")
+        original_data = original.arguments.get("data")
+        if not (isinstance(data, dict) and isinstance(data.get("from_node"), PGNode)):
+            return new
+        load = data["from_node"]
+        if load.process_id != "load_collection" or consumers.get(id(original_data["from_node"])) != 1:
+            return new
+        load_argument, filter_argument, merge = _PUSHDOWN_FILTERS[new.process_id]
+        merged = merge(load.arguments.get(load_argument), new.arguments.get(filter_argument))
+        if merged is None:
+            return new
+        _log.debug("Pushing down {p!r} into 'load_collection'".format(p=new.process_id))
+        return clone_with_arguments(load, dict(load.arguments, **{load_argument: merged}))
+
+    return rewrite_graph(node, rewrite)
+
+
+# Operators that allow folding the scalar constants of chained operations, with the function to combine constants:
+# `(x + a) + b` to `x + (a + b)`, `(x - a) - b` to `x - (a + b)`, `(x * a) * b` to `x * (a * b)`, ...
+_FOLDABLE_OPERATORS = {
+    "add": operator.add,
+    "subtract": operator.add,
+    "multiply": operator.mul,
+    "divide": operator.mul,
+}
+_COMMUTATIVE_OPERATORS = {"add", "multiply"}
+
+
+def _is_number(x) -> bool:
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def _unwrap_node_reference(x):
+    if isinstance(x, dict) and set(x.keys()) == {"from_node"} and isinstance(x["from_node"], PGNode):
+        return x["from_node"]
+    return x
+
+
+def binary_operation_node(process_id: str, x, y) -> PGNode:
+    """
+    Build node for a binary (mathematical) operator process with arguments `x` and `y`,
+    folding scalar constants of chained operations where possible (e.g. `(x * 2) * 3` to `x * 6`).
+    """
+    x = _unwrap_node_reference(x)
+    y = _unwrap_node_reference(y)
+    combine = _FOLDABLE_OPERATORS.get(process_id)
+    if combine:
+        if _is_number(x) and process_id in _COMMUTATIVE_OPERATORS:
+            expression, constant = y, x
+        else:
+            expression, constant = x, y
+        if (
+                _is_number(constant) and isinstance(expression, PGNode)
+                and expression.process_id == process_id and set(expression.arguments.keys()) == {"x", "y"}
+        ):
+            inner_x, inner_y = expression.arguments["x"], expression.arguments["y"]
+            if _is_number(inner_y):
+                return PGNode(process_id, x=inner_x, y=combine(inner_y, constant))
+            elif _is_number(inner_x) and process_id in _COMMUTATIVE_OPERATORS:
+                return PGNode(process_id, x=combine(inner_x, constant), y=inner_y)
+    return PGNode(process_id, x=x, y=y)
+
+
+def optimize(node: PGNode) -> PGNode:
+    """Apply all optimization passes to given process graph."""
+    return push_down_filters(node)
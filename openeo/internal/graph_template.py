@@ -0,0 +1,160 @@
+"""
+Parameterized process graph templates: compile a process graph with `from_parameter` placeholders once
+(flattening and JSON serialization) and only substitute the parameter values for each request.
+"""
+import collections
+import json
+import re
+import threading
+from typing import Dict, Iterable, List, Tuple, Union
+
+from openeo.internal.graph_building import PGNode
+
+
+def parameter(name: str) -> dict:
+    """Placeholder for a template parameter (to be used as argument value when building a graph)."""
+    return {"from_parameter": name}
+
+
+def is_parameter(value) -> bool:
+    """Is given value a parameter placeholder?"""
+    return isinstance(value, dict) and set(value.keys()) == {"from_parameter"}
+
+
+class GraphTemplate:
+    """
+    Flattened process graph, with parameter placeholders (``{"from_parameter": name}``)
+    that can be substituted with actual values at low cost:
+
+    - :py:meth:`render` only copies the containers on the path to the placeholders
+      (the rest of the returned graph is shared with the template and should not be modified)
+    - :py:meth:`render_json` splices the JSON encoded parameter values in pre-serialized JSON
+
+    Only placeholders outside of child process graphs (callbacks) are considered template parameters.
+
+    Usage example:
+
+    >>> cube = connection.load_collection("S2", spatial_extent=parameter("bbox"), temporal_extent=parameter("dates"))
+    >>> template = cube.ndvi().to_template()
+    >>> graph = template.render(bbox={"west": 3, "south": 51, "east": 4, "north": 52}, dates=["2020-01-01", "2020-02-01"])
+    """
+
+    # Token to mark placeholders in the pre-serialized JSON.
+    _TOKEN = "__openeo_graph_template_parameter_{i}__"
+
+    def __init__(self, graph: Union[PGNode, dict], parameters: Iterable[str] = None):
+        """
+        :param graph: process graph (PGNode, or flattened dict)
+        :param parameters: names of template parameters (default: all parameters used outside callbacks)
+        """
+        self._flat = graph.flatten() if isinstance(graph, PGNode) else graph
+        placeholders = list(self._find_placeholders(self._flat))
+        if parameters is None:
+            parameters = sorted(set(name for (path, name) in placeholders))
+        self.parameters = list(parameters)
+        # Placeholder locations: (path of keys/indexes, parameter name)
+        self._placeholders = [(path, name) for (path, name) in placeholders if name in self.parameters]  \
+            # type: List[Tuple[tuple, str]]
+        self._json_segments, self._json_parameters = self._compile_json()
+
+    @classmethod
+    def _find_placeholders(cls, data, path=()) -> Iterable[Tuple[tuple, str]]:
+        if isinstance(data, dict):
+            if is_parameter(data):
+                yield path, data["from_parameter"]
+                return
+            for key, value in data.items():
+                if key != "process_graph":
+                    yield from cls._find_placeholders(value, path + (key,))
+        elif isinstance(data, (list, tuple)):
+            for index, value in enumerate(data):
+                yield from cls._find_placeholders(value, path + (index,))
+
+    def _compile_json(self) -> Tuple[List[bytes], List[str]]:
+        """Pre-serialize the graph to JSON, split in segments around the placeholders."""
+        tokens = {}
+        marked = self._substitute({
+            name: self._TOKEN.format(i=i) for i, name in enumerate(self.parameters)
+        })
+        for i, name in enumerate(self.parameters):
+            tokens[self._TOKEN.format(i=i)] = name
+        serialized = json.dumps(marked)
+        if tokens:
+            parts = re.split('"({t})"'.format(t="|".join(re.escape(t) for t in tokens)), serialized)
+        else:
+            parts = [serialized]
+        # Even parts are JSON segments, odd parts are the tokens.
+        return [p.encode("utf-8") for p in parts[0::2]], [tokens[t] for t in parts[1::2]]
+
+    def _check_values(self, values: dict):
+        missing = set(self.parameters).difference(values.keys())
+        if missing:
+            raise ValueError("Missing template parameters: {m}".format(m=sorted(missing)))
+        unknown = set(values.keys()).difference(self.parameters)
+        if unknown:
+            raise ValueError("Unknown template parameters: {u}".format(u=sorted(unknown)))
+
+    def _substitute(self, values: dict) -> dict:
+        result = dict(self._flat)
+        copies = {(): result}
+        for path, name in self._placeholders:
+            container = result
+            for i in range(len(path) - 1):
+                sub_path = path[:i + 1]
+                if sub_path not in copies:
+                    original = container[path[i]]
+                    copies[sub_path] = dict(original) if isinstance(original, dict) else list(original)
+                    container[path[i]] = copies[sub_path]
+                container = copies[sub_path]
+            container[path[-1]] = values[name]
+        return result
+
+    def render(self, **values) -> dict:
+        """Get flattened process graph with given parameter values filled in."""
+        self._check_values(values)
+        return self._substitute(values)
+
+    def render_json(self, **values) -> bytes:
+        """Get JSON serialized flat process graph with given parameter values filled in."""
+        self._check_values(values)
+        encoded = {name: json.dumps(value).encode("utf-8") for name, value in values.items()}
+        parts = [self._json_segments[0]]
+        for name, segment in zip(self._json_parameters, self._json_segments[1:]):
+            parts.append(encoded[name])
+            parts.append(segment)
+        return b"".join(parts)
+
+
+class GraphTemplateCache:
+    """Thread-safe, least-recently-used cache of compiled graph templates, keyed by structural graph hash."""
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._templates = collections.OrderedDict()  # type: Dict[tuple, GraphTemplate]
+        self._lock = threading.Lock()
+
+    def get(self, graph: PGNode, parameters: Iterable[str] = None) -> GraphTemplate:
+        """Get compiled template for given graph (compile it if not in cache yet)."""
+        key = (graph.structural_hash(), tuple(parameters) if parameters is not None else None)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                return template
+        template = GraphTemplate(graph, parameters=parameters)
+        with self._lock:
+            self._templates[key] = template
+            while len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+        return template
+
+    def __len__(self):
+        return len(self._templates)
+
+
+_default_cache = GraphTemplateCache()
+
+
+def compile_template(graph: PGNode, parameters: Iterable[str] = None) -> GraphTemplate:
+    """Compile given graph to a template (cached by structural hash in the default template cache)."""
+    return _default_cache.get(graph, parameters=parameters)
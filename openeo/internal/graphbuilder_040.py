@@ -1,11 +1,75 @@
 import copy
+import re
+import threading
 from typing import Dict, Union
 
 
-class GraphBuilder():
+class _Segment:
+    """
+    Immutable (by convention) batch of process graph nodes, with a pointer to the parent segment.
+    Segments are shared between graph builders, so that adding a process to a copy of a builder
+    does not require copying the existing nodes.
+    A node can be overridden by a node with the same id in a later segment (copy on write).
+    """
+    __slots__ = ("parent", "nodes", "result_ids")
+
+    def __init__(self, parent: Union['_Segment', None], nodes: Dict[str, dict]):
+        self.parent = parent
+        self.nodes = nodes
+        # Ids of the result nodes in this segment and its ancestors (taking overridden nodes into account).
+        self.result_ids = _update_result_ids(parent.result_ids if parent else frozenset(), nodes)
+
+    def find(self, node_id: str) -> Union[dict, None]:
+        """Find (most recent version of) node in this segment or its ancestors."""
+        segment = self
+        while segment is not None:
+            if node_id in segment.nodes:
+                return segment.nodes[node_id]
+            segment = segment.parent
+        return None
 
-    #id_counter is a class level field, this way we ensure that id's are unique, and don't have to make them unique when merging graphs
-    id_counter = {}
+    def flatten(self) -> Dict[str, dict]:
+        """Collect (deep copies of) the nodes of this segment and its ancestors, in insertion order."""
+        segments = []
+        segment = self
+        while segment is not None:
+            segments.append(segment)
+            segment = segment.parent
+        latest = {}
+        for segment in reversed(segments):
+            latest.update(segment.nodes)
+        # Only copy the most recent version of each node.
+        return _copy_graph_data(latest)
+
+
+def _update_result_ids(result_ids: frozenset, nodes: Dict[str, dict]) -> frozenset:
+    if not nodes:
+        return result_ids
+    result_ids = set(result_ids)
+    for node_id, node in nodes.items():
+        if node.get("result", False):
+            result_ids.add(node_id)
+        else:
+            result_ids.discard(node_id)
+    return frozenset(result_ids)
+
+
+def _copy_graph_data(value, share_builders=False):
+    """
+    Deep copy of (JSON style) process graph data,
+    converting embedded graph builders (e.g. band math callbacks) to flat process graph dictionaries,
+    or keeping references to them (`share_builders`), as embedded builders are not modified anymore.
+    """
+    if isinstance(value, dict):
+        return {k: _copy_graph_data(v, share_builders) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [_copy_graph_data(v, share_builders) for v in value]
+    elif isinstance(value, GraphBuilder):
+        return value if share_builders else value.shallow_copy().processes
+    return copy.deepcopy(value)
+
+
+class GraphBuilder():
 
     def __init__(self, graph = None):
         """
@@ -14,22 +78,69 @@ class GraphBuilder():
 
             :param graph: Dict : Optional, existing process graph
         """
-        self.processes = {}
+        # Guards the builder state, for builders shared between threads (e.g. a common base cube).
+        self._lock = threading.RLock()
+        # Nodes are stored as a chain of shared segments (`_base`) and the nodes added to this builder (`_nodes`).
+        # The flat `processes` dictionary is only built (with private copies of the nodes) when it is accessed.
+        # Node arguments can embed graph builders (e.g. a band math callback under construction),
+        # which are converted to flat process graph dictionaries at that point.
+        self._base = None  # type: Union[_Segment, None]
+        self._nodes = {}  # type: Dict[str, dict]
+        self._processes = None  # type: Union[Dict[str, dict], None]
+        # Node id counters (per process name) of this graph: node ids are only unique within a graph
+        # (use `same_graph_data` to compare nodes of different graphs).
+        self._id_counter = {}  # type: Dict[str, int]
 
         if graph is not None:
             self._merge_processes(graph)
 
+    @property
+    def processes(self) -> Dict[str, dict]:
+        """Flat process graph dictionary (can be modified in place without affecting other builders)."""
+        with self._lock:
+            if self._processes is None:
+                processes = self._base.flatten() if self._base is not None else {}
+                processes.update(_copy_graph_data(self._nodes))
+                self._processes = processes
+                self._base = None
+                self._nodes = {}
+            return self._processes
+
+    @processes.setter
+    def processes(self, processes: Dict[str, dict]):
+        with self._lock:
+            self._processes = processes
+            self._base = None
+            self._nodes = {}
+            for node_id in processes:
+                self._reserve_id(node_id)
+
+    def _freeze(self) -> Union[_Segment, None]:
+        """Get segment with the current nodes of this builder, to be shared with other builders."""
+        with self._lock:
+            if self._processes is not None:
+                # Flat dictionary might still be modified by its users: share a snapshot.
+                return _Segment(None, copy.deepcopy(self._processes))
+            if self._nodes:
+                self._base = _Segment(self._base, self._nodes)
+                self._nodes = {}
+            return self._base
+
     def copy(self,return_key_map=False):
         the_copy = GraphBuilder()
         return the_copy._merge_processes(self.processes,return_key_map=return_key_map)
 
     def shallow_copy(self):
         """
-        Copy, but don't update keys
+        Copy, but don't update keys.
+        The nodes are shared with this builder (not copied), so this is a constant time operation
+        (unless the flat `processes` dictionary of this builder has been accessed).
         :return:
         """
         the_copy = GraphBuilder()
-        the_copy.processes = copy.deepcopy(self.processes)
+        with self._lock:
+            the_copy._base = self._freeze()
+            the_copy._id_counter = dict(self._id_counter)
         return the_copy
 
     @classmethod
@@ -38,11 +149,34 @@ class GraphBuilder():
         builder.processes = copy.deepcopy(graph)
         return builder
 
+    def get_node(self, node_id: str) -> dict:
+        """
+        Get node for reading, without building the flat process graph dictionary.
+        The node might be shared with other builders: use `update_node` to modify it.
+        """
+        with self._lock:
+            if self._processes is not None:
+                return self._processes[node_id]
+            if node_id in self._nodes:
+                return self._nodes[node_id]
+            node = self._base.find(node_id) if self._base is not None else None
+            if node is None:
+                raise KeyError(node_id)
+            return node
+
+    def update_node(self, node_id: str) -> dict:
+        """Get node for updating: a node shared with other builders is copied first (copy on write)."""
+        with self._lock:
+            if self._processes is not None:
+                return self._processes[node_id]
+            if node_id not in self._nodes:
+                self._nodes[node_id] = _copy_graph_data(self.get_node(node_id), share_builders=True)
+            return self._nodes[node_id]
 
     def add_process(self,process_id,result=None, **args):
         process_id = self.process(process_id, args)
         if result is not None:
-            self.processes[process_id]["result"] = result
+            self.update_node(process_id)["result"] = result
         return process_id
 
     def process(self,process_id, args):
@@ -63,20 +197,32 @@ class GraphBuilder():
         #    return existing_id
         #except ValueError as e:
         #    pass
-        id = self._generate_id(process_id)
-        self.processes[id] = new_process
+        with self._lock:
+            id = self._generate_id(process_id)
+            if self._processes is not None:
+                self._processes[id] = new_process
+            else:
+                self._nodes[id] = new_process
         return id
 
     def _generate_id(self,name:str):
         name = name.replace("_","")
-        if( not GraphBuilder.id_counter.get(name)):
-            GraphBuilder.id_counter[name] = 1
-        else:
-            GraphBuilder.id_counter[name] += 1
-        return name + str(GraphBuilder.id_counter[name])
+        with self._lock:
+            count = self._id_counter.get(name, 0) + 1
+            self._id_counter[name] = count
+        return name + str(count)
+
+    def _reserve_id(self, node_id: str):
+        """Make sure that generated ids don't collide with an existing (e.g. user provided) node id."""
+        match = re.match(r"^(.*?)(\d+)$", node_id)
+        if match:
+            name, count = match.group(1), int(match.group(2))
+            with self._lock:
+                if count > self._id_counter.get(name, 0):
+                    self._id_counter[name] = count
 
     def merge(self, other: 'GraphBuilder'):
-        return GraphBuilder.from_process_graph(self.processes)._merge_processes(other.processes)
+        return self.shallow_copy()._merge_processes(other.processes)
 
     def _merge_processes(self, processes: Dict, return_key_map=False):
         # Maps original node key to new key in merged result
@@ -93,7 +239,7 @@ class GraphBuilder():
             node_refs += self._extract_node_references(args_copy)
 
             if result is not None:
-                self.processes[id]['result'] = result
+                self.update_node(id)['result'] = result
 
         for node_ref in node_refs:
             old_node_id = node_ref['from_node']
@@ -119,12 +265,69 @@ class GraphBuilder():
         return node_ref_list
 
     def find_result_node_id(self):
-        result_node_ids = [k for k,v in self.processes.items() if v.get('result',False)]
+        with self._lock:
+            if self._processes is not None:
+                result_node_ids = [k for k,v in self._processes.items() if v.get('result',False)]
+            else:
+                # Read through the segments, without building the flat process graph dictionary.
+                base_result_ids = self._base.result_ids if self._base is not None else frozenset()
+                result_node_ids = sorted(_update_result_ids(base_result_ids, self._nodes))
         if len(result_node_ids) == 1:
             return result_node_ids[0]
         else:
             raise RuntimeError("Invalid list of result node id's: " + str(result_node_ids))
 
+    def same_graph_data(self, value, other: 'GraphBuilder', other_value) -> bool:
+        """
+        Compare (argument) data of this graph with data of another graph (e.g. `{"from_node": "reduce1"}`),
+        following node references: nodes are the same if they have the same process and arguments
+        (ignoring the "result" flag), and the same input nodes (recursively), regardless of their ids.
+        Node ids can not be compared directly, as they are only unique within a graph.
+        """
+        # Pairs of (node id in this graph, node id in other graph) to compare.
+        pairs = []
+        stack = [(value, other_value)]
+        compared = set()
+        while True:
+            while stack:
+                x, y = stack.pop()
+                if isinstance(x, dict) and isinstance(y, dict):
+                    if x.keys() != y.keys():
+                        return False
+                    for k in x:
+                        if k == "from_node" and isinstance(x[k], str) and isinstance(y[k], str):
+                            pairs.append((x[k], y[k]))
+                        elif k == "callback":
+                            # Callback graphs have their own node ids.
+                            if _copy_graph_data(x[k]) != _copy_graph_data(y[k]):
+                                return False
+                        else:
+                            stack.append((x[k], y[k]))
+                elif isinstance(x, list) and isinstance(y, list):
+                    if len(x) != len(y):
+                        return False
+                    stack.extend(zip(x, y))
+                elif isinstance(x, GraphBuilder) or isinstance(y, GraphBuilder):
+                    if _copy_graph_data(x) != _copy_graph_data(y):
+                        return False
+                elif type(x) != type(y) or x != y:
+                    return False
+            if not pairs:
+                return True
+            node_id, other_node_id = pairs.pop()
+            if (node_id, other_node_id) in compared:
+                continue
+            compared.add((node_id, other_node_id))
+            node = self.get_node(node_id)
+            other_node = other.get_node(other_node_id)
+            if node is other_node and node_id == other_node_id:
+                # Node (and its inputs) shared between both graphs.
+                continue
+            stack.append((
+                {k: v for k, v in node.items() if k != "result"},
+                {k: v for k, v in other_node.items() if k != "result"},
+            ))
+
     @classmethod
     def combine(cls, operator: str, first: Union['GraphBuilder', dict], second: Union['GraphBuilder', dict], arg_name='data'):
         """Combine two GraphBuilders to a new merged one using the given operator"""
@@ -135,7 +338,7 @@ class GraphBuilder():
             result_node = builder.find_result_node_id()
             _, key_map = merged._merge_processes(builder.processes, return_key_map=True)
             key = key_map.get(result_node, result_node)
-            merged.processes[key]['result'] = False
+            merged.update_node(key)['result'] = False
             return {'from_node': key}
 
         if isinstance(first, GraphBuilder):
@@ -1,13 +1,25 @@
 from abc import ABC
+from typing import Any, Dict, Generator, Tuple
 
 
 class ProcessGraphVisitor(ABC):
     """
     Hierarchical Visitor for process graphs, to allow different tools to traverse the graph.
+
+    By default, the (dereferenced) graph is walked as a tree: a node that is used by multiple other nodes
+    is visited again for each usage, which grows exponentially with the depth of graphs with "diamonds".
+    With `visit_shared_nodes_once` enabled, each node is only visited the first time
+    (the return value of :py:meth:`leaveProcess` is memoized as result of the node)
+    and :py:meth:`revisitProcess` is called with the memoized result for subsequent usages.
+    Arguments of a process are visited in argument name order in tree walking mode,
+    and in their given order (without sorting them for every process) with `visit_shared_nodes_once`.
     """
 
-    def __init__(self):
+    def __init__(self, visit_shared_nodes_once: bool = False):
         self.process_stack = []
+        self._visit_shared_nodes_once = visit_shared_nodes_once
+        # Memoized node results, keyed by node object id (node is kept to guarantee the id stays valid).
+        self._visited = {}  # type: Dict[int, Tuple[dict, Any]]
 
     @classmethod
     def dereference_from_node_arguments(cls, process_graph: dict) -> str:
@@ -15,6 +27,8 @@ class ProcessGraphVisitor(ABC):
         Walk through the given (flat) process graph and replace (in-place) "from_node" references in
         process arguments (dictionaries or lists) with the corresponding resolved subgraphs
 
+        Also see `PGNode.from_flat_graph` to build a (PGNode based) graph without modifying the flat graph.
+
         :param process_graph: process graph dictionary to be manipulated in-place
         :return: name of the "result" node of the graph
 
@@ -65,43 +79,95 @@ class ProcessGraphVisitor(ABC):
         self.accept_node(node)
 
     def accept_node(self, node: dict):
+        return self._walk(self._node_steps(node))
+
+    def _walk(self, steps: Generator[dict, Any, Any]) -> Any:
+        """
+        Drive given visiting steps with an explicit stack instead of recursion,
+        so that deep (e.g. long chained) graphs do not hit the recursion limit.
+
+        Visiting steps are generators that yield the nodes they depend on
+        and get the corresponding visit result sent back.
+        Nested nodes are dispatched to :py:meth:`accept_node` when a subclass overrides it
+        (which brings back recursion, bounded by the depth of the graph).
+        """
+        dispatch = getattr(self.accept_node, "__func__", None) is not ProcessGraphVisitor.accept_node
+        stack = [steps]
+        result = None
+        while stack:
+            try:
+                node = stack[-1].send(result)
+            except StopIteration as e:
+                stack.pop()
+                result = e.value
+                continue
+            if dispatch:
+                result = self.accept_node(node)
+            else:
+                stack.append(self._node_steps(node))
+                result = None
+        return result
+
+    def _node_steps(self, node: dict) -> Generator[dict, Any, Any]:
         pid = node['process_id']
         arguments = node.get('arguments', {})
-        self._accept_process(process_id=pid, arguments=arguments)
+        if self._visit_shared_nodes_once:
+            if id(node) in self._visited:
+                self.revisitProcess(process_id=pid, arguments=arguments, result=self._visited[id(node)][1])
+                return None
+            result = yield from self._process_steps(process_id=pid, arguments=arguments)
+            self._visited[id(node)] = (node, result)
+            return result
+        else:
+            return (yield from self._process_steps(process_id=pid, arguments=arguments))
 
     def _accept_process(self, process_id: str, arguments: dict):
+        return self._walk(self._process_steps(process_id=process_id, arguments=arguments))
+
+    def _process_steps(self, process_id: str, arguments: dict) -> Generator[dict, Any, Any]:
         self.process_stack.append(process_id)
         self.enterProcess(process_id=process_id, arguments=arguments)
-        for arg_id, value in sorted(arguments.items()):
+        items = arguments.items()
+        if not self._visit_shared_nodes_once:
+            # Tree walking mode visits arguments in name order (as it always did).
+            items = sorted(items)
+        for arg_id, value in items:
             if isinstance(value, list):
                 self.enterArray(argument_id=arg_id)
-                self._accept_argument_list(value)
+                yield from self._argument_list_steps(value)
                 self.leaveArray(argument_id=arg_id)
             elif isinstance(value, dict):
                 self.enterArgument(argument_id=arg_id, value=value)
-                self._accept_argument_dict(value)
+                yield from self._argument_dict_steps(value)
                 self.leaveArgument(argument_id=arg_id, value=value)
             else:
                 self.constantArgument(argument_id=arg_id, value=value)
-        self.leaveProcess(process_id=process_id, arguments=arguments)
+        result = self.leaveProcess(process_id=process_id, arguments=arguments)
         assert self.process_stack.pop() == process_id
+        return result
 
     def _accept_argument_list(self, elements: list):
+        self._walk(self._argument_list_steps(elements))
+
+    def _argument_list_steps(self, elements: list) -> Generator[dict, Any, None]:
         for element in elements:
             if isinstance(element, dict):
-                self._accept_argument_dict(element)
+                yield from self._argument_dict_steps(element)
                 self.arrayElementDone(element)
             else:
                 self.constantArrayElement(element)
 
     def _accept_argument_dict(self, value: dict):
+        self._walk(self._argument_dict_steps(value))
+
+    def _argument_dict_steps(self, value: dict) -> Generator[dict, Any, None]:
         if 'node' in value and 'from_node' in value:
             # TODO: this looks bit weird (or at least very specific).
-            self.accept_node(value['node'])
+            yield value['node']
         elif value.get("from_node"):
-            self.accept_node(value['from_node'])
+            yield value['from_node']
         elif "process_id" in value:
-            self.accept_node(value)
+            yield value
         else:
             self._accept_dict(value)
 
@@ -114,6 +180,13 @@ class ProcessGraphVisitor(ABC):
     def leaveProcess(self, process_id: str, arguments: dict):
         pass
 
+    def revisitProcess(self, process_id: str, arguments: dict, result):
+        """
+        Called (in `visit_shared_nodes_once` mode) instead of visiting a node again,
+        with the result of the first visit (return value of `leaveProcess`).
+        """
+        pass
+
     def enterArgument(self, argument_id: str, value):
         pass
 
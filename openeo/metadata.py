@@ -16,14 +16,22 @@ class Dimension:
         self.type = type
         self.name = name
 
+    def _public_fields(self) -> dict:
+        # Private attributes (e.g. caches) are not considered for representation and comparison.
+        return {k: v for (k, v) in self.__dict__.items() if not k.startswith("_")}
+
     def __repr__(self):
         return "{c}({f})".format(
             c=self.__class__.__name__,
-            f=", ".join("{k!s}={v!r}".format(k=k, v=v) for (k, v) in self.__dict__.items())
+            f=", ".join("{k!s}={v!r}".format(k=k, v=v) for (k, v) in self._public_fields().items())
         )
 
     def __eq__(self, other):
-        return self.__class__ == other.__class__ and self.__dict__ == other.__dict__
+        return self.__class__ == other.__class__ and self._public_fields() == other._public_fields()
+
+    def to_dict(self) -> dict:
+        """Convert to JSON-serializable dictionary (see `dimension_from_dict` for the reverse)."""
+        return dict(self._public_fields())
 
 
 class SpatialDimension(Dimension):
@@ -50,6 +58,8 @@ class BandDimension(Dimension):
     def __init__(self, name: str, bands: List[Band]):
         super().__init__(type="bands", name=name)
         self.bands = bands
+        # Cache of band lookup maps: (band list, name to index map, common name to index map)
+        self._lookup = None
 
     @property
     def band_names(self) -> List[str]:
@@ -59,36 +69,48 @@ class BandDimension(Dimension):
     def common_names(self) -> List[str]:
         return [b.common_name for b in self.bands]
 
+    def _lookup_maps(self) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Get name to index and common name to index maps (rebuilt when band list is replaced)."""
+        if self._lookup is None or self._lookup[0] is not self.bands:
+            name_index = {}
+            common_name_index = {}
+            for index, band in enumerate(self.bands):
+                name_index.setdefault(band.name, index)
+                if band.common_name is not None:
+                    common_name_index.setdefault(band.common_name, index)
+            self._lookup = (self.bands, name_index, common_name_index)
+        return self._lookup[1], self._lookup[2]
+
     def band_index(self, band: Union[int, str]) -> int:
         """
         Resolve a given band (common) name/index to band index
         :param band: band name, common name or index
         :return int: band index
         """
-        band_names = self.band_names
-        if isinstance(band, int) and 0 <= band < len(band_names):
+        if isinstance(band, int) and 0 <= band < len(self.bands):
             return band
         elif isinstance(band, str):
-            common_names = self.common_names
+            name_index, common_name_index = self._lookup_maps()
             # First try common names if possible
-            if band in common_names:
-                return common_names.index(band)
-            if band in band_names:
-                return band_names.index(band)
-        raise ValueError("Invalid band name/index {b!r}. Valid names: {n!r}".format(b=band, n=band_names))
+            if band in common_name_index:
+                return common_name_index[band]
+            if band in name_index:
+                return name_index[band]
+        raise ValueError("Invalid band name/index {b!r}. Valid names: {n!r}".format(b=band, n=self.band_names))
 
     def band_name(self, band: Union[str, int], allow_common=True) -> str:
         """Resolve (common) name or index to a valid (common) name"""
         if isinstance(band, str):
-            if band in self.band_names:
+            name_index, common_name_index = self._lookup_maps()
+            if band in name_index:
                 return band
-            elif band in self.common_names:
+            elif band in common_name_index:
                 if allow_common:
                     return band
                 else:
-                    return self.band_names[self.common_names.index(band)]
+                    return self.bands[common_name_index[band]].name
         elif isinstance(band, int) and 0 <= band < len(self.bands):
-            return self.band_names[band]
+            return self.bands[band].name
         raise ValueError("Invalid band name/index {b!r}. Valid names: {n!r}".format(b=band, n=self.band_names))
 
     def filter_bands(self, bands: List[Union[int, str]]) -> 'BandDimension':
@@ -101,6 +123,31 @@ class BandDimension(Dimension):
             bands=[self.bands[self.band_index(b)] for b in bands]
         )
 
+    def to_dict(self) -> dict:
+        name_index, common_name_index = self._lookup_maps()
+        return {
+            "type": self.type, "name": self.name,
+            "bands": [list(b) for b in self.bands],
+            "name_index": name_index, "common_name_index": common_name_index,
+        }
+
+
+def dimension_from_dict(data: dict) -> Dimension:
+    """Reconstruct a `Dimension` object from its `to_dict()` representation."""
+    dim_type = data["type"]
+    if dim_type == "spatial":
+        return SpatialDimension(name=data["name"], extent=data["extent"], crs=data["crs"])
+    elif dim_type == "temporal":
+        return TemporalDimension(name=data["name"], extent=data["extent"])
+    elif dim_type == "bands":
+        dim = BandDimension(name=data["name"], bands=[Band(*b) for b in data["bands"]])
+        if "name_index" in data and "common_name_index" in data:
+            # Use precomputed lookup maps.
+            dim._lookup = (dim.bands, data["name_index"], data["common_name_index"])
+        return dim
+    else:
+        return Dimension(type=dim_type, name=data["name"])
+
 
 class CollectionMetadata:
     """
@@ -119,7 +166,7 @@ class CollectionMetadata:
         # Original collection metadata (actual cube metadata might be altered through processes)
         self._orig_metadata = metadata
 
-        self._dimensions = dimensions or self._parse_dimensions(self._orig_metadata)
+        self._dimensions = dimensions if dimensions is not None else self._parse_dimensions(self._orig_metadata)
         self._band_dimension = None
         self._temporal_dimension = None
         for dim in self._dimensions:
@@ -212,6 +259,10 @@ class CollectionMetadata:
         # TODO: check against extent metadata in dimensions
         return self._orig_metadata.get('extent')
 
+    @property
+    def dimensions(self) -> List[Dimension]:
+        return self._dimensions
+
     def dimension_names(self) -> List[str]:
         return list(d.name for d in self._dimensions)
 
@@ -0,0 +1,470 @@
+"""
+Asyncio based variant of :py:class:`openeo.rest.connection.Connection` and :py:class:`openeo.rest.job.RESTJob`,
+to handle many concurrent requests (e.g. polling and downloading of many batch jobs) from a single event loop.
+
+Requires the `aiohttp` package (e.g. install with ``pip install openeo[async]``).
+
+Usage example:
+
+    >>> async with AsyncConnection("https://openeo.example") as connection:
+    ...     cube = await connection.load_collection("S2", bands=["B04", "B08"])
+    ...     cube = cube.filter_temporal("2020-01-01", "2020-02-01").ndvi()
+    ...     job = await cube.send_job(out_format="GTiff")
+    ...     await job.start_and_wait()
+    ...     await job.download_results("results/")
+
+Note that only openEO API 1.0.0 (and higher) backends are supported.
+"""
+
+import asyncio
+import datetime
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Union, List
+
+import aiohttp
+import requests
+from requests.auth import AuthBase, HTTPBasicAuth
+
+from openeo.capabilities import ComparableVersion, ApiVersionException
+from openeo.imagecollection import CollectionMetadata
+from openeo.rest import OpenEoClientException, JobFailedException
+from openeo.rest.auth.auth import NullAuth, BearerAuth
+from openeo.rest.connection import url_join, Connection, default_headers, parse_api_error, \
+    build_request_with_process_graph
+from openeo.rest.datacube import DataCube
+from openeo.rest.rest_capabilities import RESTCapabilities
+from openeo.util import ensure_list, ensure_dir
+
+_log = logging.getLogger(__name__)
+
+
+class AsyncRestApiConnection:
+    """Base connection class implementing generic REST API request functionality with `asyncio`/`aiohttp`."""
+
+    def __init__(self, root_url: str, auth: AuthBase = None, session: aiohttp.ClientSession = None,
+                 default_timeout: int = None):
+        self._root_url = root_url
+        self.auth = auth or NullAuth()
+        self._session = session
+        self.default_timeout = default_timeout
+        self.default_headers = default_headers()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Lazy creation: an `aiohttp` session should be created from within a running event loop.
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def build_url(self, path: str):
+        return url_join(self._root_url, path)
+
+    def _merged_headers(self, headers: dict, auth: AuthBase = None) -> dict:
+        """Merge default headers with given headers and authentication headers"""
+        result = self.default_headers.copy()
+        if headers:
+            result.update(headers)
+        # Authentication objects follow the `requests` approach of manipulating the headers of a request object.
+        (auth or self.auth)(requests.Request(headers=result))
+        return result
+
+    async def request(self, method: str, path: str, headers: dict = None, auth: AuthBase = None,
+                      check_error=True, expected_status=None, **kwargs) -> aiohttp.ClientResponse:
+        """
+        Generic request send.
+
+        Note that the response body still has to be consumed (e.g. with `await response.json()`)
+        or the response has to be released explicitly.
+        """
+        timeout = kwargs.pop("timeout", self.default_timeout)
+        resp = await self.session.request(
+            method=method,
+            url=self.build_url(path),
+            headers=self._merged_headers(headers, auth=auth),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            **kwargs
+        )
+        # Check for API errors and unexpected HTTP status codes as desired.
+        status = resp.status
+        if check_error and status >= 400:
+            await self._raise_api_error(resp)
+        if expected_status and status not in ensure_list(expected_status):
+            resp.release()
+            raise OpenEoClientException("Status code {s} is not expected {e}".format(s=status, e=expected_status))
+        return resp
+
+    async def _raise_api_error(self, response: aiohttp.ClientResponse):
+        """Convert API error response to Python exception"""
+        raise parse_api_error(response.status, await response.text())
+
+    async def get(self, path, auth: AuthBase = None, **kwargs) -> aiohttp.ClientResponse:
+        return await self.request("get", path=path, auth=auth, **kwargs)
+
+    async def get_json(self, path, **kwargs):
+        """Do GET request and return parsed JSON response."""
+        resp = await self.get(path, **kwargs)
+        return await resp.json(content_type=None)
+
+    async def post(self, path, json: dict = None, **kwargs) -> aiohttp.ClientResponse:
+        return await self.request("post", path=path, json=json, **kwargs)
+
+    async def delete(self, path, **kwargs) -> aiohttp.ClientResponse:
+        return await self.request("delete", path=path, **kwargs)
+
+    async def download_to_file(self, response: aiohttp.ClientResponse, path: Union[str, Path],
+                               chunk_size: int = 1024 * 1024) -> Path:
+        """Stream response body to given file."""
+        path = Path(path)
+        ensure_dir(path.parent)
+        try:
+            with path.open("wb") as f:
+                async for block in response.content.iter_chunked(chunk_size):
+                    f.write(block)
+        finally:
+            response.release()
+        return path
+
+
+class AsyncConnection(AsyncRestApiConnection):
+    """
+    Asyncio based connection to an openEO backend.
+    """
+
+    _MINIMUM_API_VERSION = ComparableVersion("1.0.0")
+
+    # Uploading large geometries (see :py:class:`openeo.rest.geometry.GeometryEncoding`) is not supported.
+    geometry_encoding = None
+
+    def __init__(self, url, auth: AuthBase = None, session: aiohttp.ClientSession = None,
+                 default_timeout: int = None, optimize_graphs: bool = False):
+        """
+        :param url: root url of the backend
+        :param auth: (optional) authentication to use for all requests
+        :param session: (optional) `aiohttp` session to use for requests
+        :param default_timeout: default timeout (in seconds) for requests
+        :param optimize_graphs: whether to apply client-side optimizations to process graphs of data cubes
+            (see :py:class:`openeo.rest.connection.ConnectionOptions`)
+        """
+        super().__init__(root_url=url, auth=auth, session=session, default_timeout=default_timeout)
+        self.optimize_graphs = optimize_graphs
+        self._cached_capabilities = None
+
+    async def capabilities(self) -> RESTCapabilities:
+        """Loads all available capabilities (and checks the API version)."""
+        if self._cached_capabilities is None:
+            capabilities = RESTCapabilities(await self.get_json("/"))
+            if capabilities.api_version_check.below(self._MINIMUM_API_VERSION):
+                raise ApiVersionException("OpenEO API version should be at least {m!s}, but got {v!s}".format(
+                    m=self._MINIMUM_API_VERSION, v=capabilities.api_version_check)
+                )
+            self._cached_capabilities = capabilities
+        return self._cached_capabilities
+
+    async def authenticate_basic(self, username: str, password: str) -> 'AsyncConnection':
+        """
+        Authenticate a user to the backend using basic username and password.
+
+        :param username: User name
+        :param password: User passphrase
+        """
+        resp = await self.get_json('/credentials/basic', auth=HTTPBasicAuth(username, password))
+        # Switch to bearer based authentication in further requests.
+        self.auth = BearerAuth(bearer=resp["access_token"])
+        return self
+
+    async def describe_collection(self, name) -> dict:
+        return await self.get_json('/collections/{}'.format(name))
+
+    async def collection_metadata(self, name) -> CollectionMetadata:
+        return CollectionMetadata(metadata=await self.describe_collection(name))
+
+    async def list_jobs(self) -> List[dict]:
+        return (await self.get_json('/jobs'))["jobs"]
+
+    async def load_collection(self, collection_id: str, fetch_metadata=True, **kwargs) -> 'AsyncDataCube':
+        """
+        Load a collection by collection id.
+
+        see :py:meth:`openeo.rest.datacube.DataCube.load_collection` for available arguments.
+        """
+        await self.capabilities()
+        metadata = await self.collection_metadata(collection_id) if fetch_metadata else None
+        return AsyncDataCube(DataCube.load_collection(
+            collection_id=collection_id, connection=self, fetch_metadata=False, metadata=metadata, **kwargs
+        ))
+
+    def _build_request_with_process_graph(self, process_graph: Union[dict, bytes], **kwargs) -> Union[dict, bytes]:
+        """
+        Prepare a json payload with a process graph to submit to /result, /jobs, ...
+        (see :py:func:`openeo.rest.connection.build_request_with_process_graph`)
+        """
+        return build_request_with_process_graph(process_graph, api_version=self._MINIMUM_API_VERSION, **kwargs)
+
+    async def execute(self, process_graph: dict):
+        """
+        Execute a process graph synchronously.
+
+        :param process_graph: (flat) dict representing a process graph
+        """
+        req = self._build_request_with_process_graph(process_graph=process_graph)
+        resp = await self.post(path="/result", json=req)
+        return await resp.json(content_type=None)
+
+    async def download(self, graph: dict, outputfile: Union[str, Path], timeout=1000) -> Path:
+        """
+        Downloads the result of a process graph synchronously, and save the result to the given file.
+
+        :param graph: (flat) dict representing a process graph
+        :param outputfile: output file
+        """
+        request = self._build_request_with_process_graph(process_graph=graph)
+        resp = await self.post(path="/result", json=request, timeout=timeout)
+        return await self.download_to_file(resp, outputfile)
+
+    async def create_job(self, process_graph: dict, title: str = None, description: str = None,
+                         plan: str = None, budget=None, additional: Dict = None) -> 'AsyncRESTJob':
+        """
+        Posts a job to the back end.
+
+        :param process_graph: (flat) dict representing process graph
+        :param title: String title of the job
+        :param description: String description of the job
+        :param plan: billing plan
+        :param budget: Budget
+        :param additional: additional job options to pass to the backend
+        :return: the created job
+        """
+        req = self._build_request_with_process_graph(
+            process_graph=process_graph,
+            title=title, description=description, plan=plan, budget=budget
+        )
+        if additional:
+            req["job_options"] = additional
+        resp = await self.post("/jobs", json=req)
+        resp.release()
+        return AsyncRESTJob(Connection._extract_job_id(resp.headers), self)
+
+    def job(self, job_id: str) -> 'AsyncRESTJob':
+        """
+        Get the job based on the id. The job with the given id should already exist.
+
+        :param job_id: the job id of an existing job
+        """
+        return AsyncRESTJob(job_id, self)
+
+
+def _unwrap(value):
+    return value.cube if isinstance(value, AsyncDataCube) else value
+
+
+def _delegated(name: str):
+    """Build AsyncDataCube method that delegates to the wrapped DataCube (e.g. for band math operators)."""
+
+    def method(self: 'AsyncDataCube', *args, **kwargs):
+        return self._call(getattr(self.cube, name), *args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+class AsyncDataCube:
+    """
+    Asyncio based wrapper of a :py:class:`openeo.rest.datacube.DataCube` (as returned by
+    :py:meth:`AsyncConnection.load_collection`).
+
+    Methods that build the process graph (e.g. `filter_bbox`, `ndvi`, band math operators, ...)
+    are delegated to the wrapped cube, resulting cubes are wrapped again.
+    The methods that interact with the backend (`execute`, `download` and `send_job`) are coroutines.
+    Other backend interacting methods of :py:class:`~openeo.rest.datacube.DataCube`
+    require a synchronous :py:class:`~openeo.rest.connection.Connection` and are not supported.
+    """
+
+    # DataCube methods that require a synchronous connection.
+    _UNSUPPORTED = frozenset([
+        "download_tiled", "execute_timeseries_chunked", "download_to_buffer", "to_xarray", "execute_to_array",
+        "tiled_viewing_service", "execute_batch", "execute_iter",
+    ])
+
+    def __init__(self, cube: DataCube):
+        self.cube = cube
+
+    @property
+    def connection(self) -> AsyncConnection:
+        return self.cube.connection
+
+    def __repr__(self):
+        return "<{c} of {r!r}>".format(c=self.__class__.__name__, r=self.cube)
+
+    def _call(self, function, *args, **kwargs):
+        result = function(*(_unwrap(a) for a in args), **{k: _unwrap(v) for k, v in kwargs.items()})
+        return AsyncDataCube(result) if isinstance(result, DataCube) else result
+
+    def __getattr__(self, name):
+        if name.startswith("__") or name == "cube":
+            raise AttributeError(name)
+        if name in self._UNSUPPORTED:
+            raise OpenEoClientException(
+                "{n!r} is not supported with an AsyncConnection (requires a synchronous Connection)".format(n=name)
+            )
+        attribute = getattr(self.cube, name)
+        if not callable(attribute):
+            return attribute
+        return lambda *args, **kwargs: self._call(attribute, *args, **kwargs)
+
+    __invert__ = _delegated("__invert__")
+    __neg__ = _delegated("__neg__")
+    __eq__ = _delegated("__eq__")
+    __ne__ = _delegated("__ne__")
+    __gt__ = _delegated("__gt__")
+    __lt__ = _delegated("__lt__")
+    __add__ = _delegated("__add__")
+    __radd__ = _delegated("__radd__")
+    __sub__ = _delegated("__sub__")
+    __rsub__ = _delegated("__rsub__")
+    __mul__ = _delegated("__mul__")
+    __rmul__ = _delegated("__rmul__")
+    __truediv__ = _delegated("__truediv__")
+    __or__ = _delegated("__or__")
+    __and__ = _delegated("__and__")
+
+    async def execute(self) -> dict:
+        """Execute the process graph synchronously and return the result."""
+        return await self.connection.execute(self.cube._request_graph())
+
+    async def download(self, outputfile: Union[str, Path], format: str = "GTIFF", options: dict = None) -> Path:
+        """Download the result (e.g. as GeoTIFF) synchronously."""
+        cube = self.cube.save_result(format=format, options=options)
+        return await self.connection.download(cube._request_graph(), outputfile)
+
+    async def send_job(self, out_format=None, job_options=None, **format_options) -> 'AsyncRESTJob':
+        """
+        Create a batch job on the backend.
+
+        :param out_format: (optional) format of the job result
+        :param job_options: (optional) additional job options to pass to the backend
+        :param format_options: parameters for the job result format
+        """
+        cube = self.cube
+        if out_format:
+            cube = cube.save_result(format=out_format, options=format_options)
+        return await self.connection.create_job(process_graph=cube._request_graph(), additional=job_options)
+
+
+class AsyncRESTJob:
+    """Asyncio based variant of :py:class:`openeo.rest.job.RESTJob`."""
+
+    def __init__(self, job_id: str, connection: AsyncConnection):
+        self.job_id = job_id
+        self.connection = connection
+
+    def __repr__(self):
+        return '<{c} job_id={i!r}>'.format(c=self.__class__.__name__, i=self.job_id)
+
+    async def describe_job(self) -> dict:
+        """ Get all job information."""
+        return await self.connection.get_json("/jobs/{}".format(self.job_id))
+
+    async def start_job(self):
+        """ Start / queue a job for processing."""
+        url = "/jobs/{}/results".format(self.job_id)
+        resp = await self.connection.post(url)
+        resp.release()
+        if resp.status != 202:
+            _log.warning("{u} returned with status code {s} instead of 202".format(u=url, s=resp.status))
+
+    async def stop_job(self):
+        """ Stop / cancel job processing."""
+        resp = await self.connection.delete("/jobs/{}/results".format(self.job_id))
+        resp.release()
+        return resp.status
+
+    async def delete_job(self):
+        """ Delete a job."""
+        resp = await self.connection.delete("/jobs/{}".format(self.job_id), expected_status=204)
+        resp.release()
+
+    async def _download_get_assets(self) -> Dict[str, dict]:
+        response = await self.connection.get_json("/jobs/{}/results".format(self.job_id), expected_status=200)
+        if "assets" in response:
+            return response["assets"]
+        else:
+            return {a["href"].split("/")[-1]: a for a in response["links"]}
+
+    async def download_results(self, target: Union[str, Path] = None, max_concurrent: int = 4) -> Dict[Path, dict]:
+        """
+        Download job results into given folder (current working dir by default).
+
+        :param target: String/path, folder where to put the result files.
+        :param max_concurrent: maximum number of concurrent downloads
+        :return: file_list: Dict containing the downloaded file path as value and asset metadata
+        """
+        target = Path(target or Path.cwd())
+        if target.exists() and not target.is_dir():
+            raise OpenEoClientException("The target argument must be a folder. Got {t!r}".format(t=str(target)))
+
+        assets = {target / f: m for (f, m) in (await self._download_get_assets()).items()}
+        if len(assets) == 0:
+            raise OpenEoClientException("Expected at least one result file to download, but got 0.")
+
+        semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def download(path: Path, url: str):
+            async with semaphore:
+                resp = await self.connection.get(url)
+                await self.connection.download_to_file(resp, path)
+
+        await asyncio.gather(*(download(path, metadata["href"]) for path, metadata in assets.items()))
+        return assets
+
+    async def start_and_wait(self, print=print, max_poll_interval: int = 60, connection_retry_interval: int = 30):
+        """
+        Start the batch job, poll its status (without blocking the event loop) and wait till it finishes (or fails)
+
+        :param print: print/logging function to show progress/status
+        :param max_poll_interval: maximum number of seconds to sleep between status polls
+        :param connection_retry_interval: how long to wait when status poll failed due to connection issue
+        """
+        await self.start_job()
+        poll_interval = min(5, max_poll_interval)
+        status = None
+        start_time = time.time()
+        while True:
+            elapsed = str(datetime.timedelta(seconds=time.time() - start_time))
+            try:
+                job_info = await self.describe_job()
+            except aiohttp.ClientConnectionError as e:
+                print("{t} Connection error while querying job status: {e}".format(t=elapsed, e=e))
+                await asyncio.sleep(connection_retry_interval)
+                continue
+
+            status = job_info.get("status", "N/A")
+            print("{t} Job {i!r}: {s} (progress {p})".format(
+                t=elapsed, i=self.job_id, s=status,
+                p='{p}%'.format(p=job_info["progress"]) if "progress" in job_info else "N/A"
+            ))
+            if status not in ('submitted', 'created', 'queued', 'running'):
+                break
+
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(1.25 * poll_interval, max_poll_interval)
+
+        elapsed = str(datetime.timedelta(seconds=time.time() - start_time))
+        if status != "finished":
+            raise JobFailedException("Batch job {i} didn't finish properly. Status: {s} (after {t}).".format(
+                i=self.job_id, s=status, t=elapsed
+            ), job=self)
+
+        return self
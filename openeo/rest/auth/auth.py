@@ -1,6 +1,13 @@
+import logging
+import threading
+import time
+from typing import Callable, Tuple, Union
+
 from requests import Request
 from requests.auth import AuthBase
 
+_log = logging.getLogger(__name__)
+
 
 class OpenEoApiAuthBase(AuthBase):
     """
@@ -27,10 +34,53 @@ class BearerAuth(OpenEoApiAuthBase):
     https://open-eo.github.io/openeo-api/apireference/#section/Authentication/Bearer
     """
 
-    def __init__(self, bearer: str):
+    def __init__(self, bearer: str, identity: str = None):
+        """
+        :param bearer: bearer token
+        :param identity: (optional) stable identifier of the authenticated user (e.g. user name),
+            which, unlike the bearer token, does not change when the token is refreshed
+        """
         self.bearer = bearer
+        self.identity = identity
 
     def __call__(self, req: Request) -> Request:
         # Add bearer authorization header.
         req.headers['Authorization'] = "Bearer {b}".format(b=self.bearer)
         return req
+
+
+class RefreshingBearerAuth(BearerAuth):
+    """
+    Bearer token authentication that proactively refreshes the bearer token
+    shortly before it expires (e.g. with an OpenID Connect refresh token grant).
+    """
+
+    # Function that returns current time (overridable for unit tests)
+    _now = time.time
+
+    def __init__(self, bearer: str, refresh: Callable[[], Tuple[str, Union[float, None]]],
+                 expires_at: float = None, refresh_margin: float = 60, identity: str = None):
+        """
+        :param bearer: current bearer token
+        :param refresh: function that returns a new bearer token and its expiration time (epoch seconds, or None)
+        :param expires_at: expiration time of current bearer token (epoch seconds, or None if unknown)
+        :param refresh_margin: number of seconds before expiration to refresh the bearer token
+        :param identity: (optional) stable identifier of the authenticated user
+        """
+        super().__init__(bearer=bearer, identity=identity)
+        self.expires_at = expires_at
+        self.refresh_margin = refresh_margin
+        self._refresh = refresh
+        self._lock = threading.Lock()
+
+    def _needs_refresh(self) -> bool:
+        return self.expires_at is not None and self._now() >= self.expires_at - self.refresh_margin
+
+    def __call__(self, req: Request) -> Request:
+        if self._needs_refresh():
+            with self._lock:
+                # Check again: another thread might have refreshed already.
+                if self._needs_refresh():
+                    _log.info("Refreshing bearer token (expires at {e})".format(e=self.expires_at))
+                    self.bearer, self.expires_at = self._refresh()
+        return super().__call__(req)
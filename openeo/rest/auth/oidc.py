@@ -4,11 +4,13 @@ OpenID Connect related functionality and helpers.
 """
 
 import base64
+import contextlib
 import functools
 import hashlib
 import http.server
 import json
 import logging
+import os
 import random
 import string
 import threading
@@ -17,11 +19,13 @@ import urllib.parse
 import warnings
 import webbrowser
 from collections import namedtuple
+from pathlib import Path
 from queue import Queue, Empty
-from typing import Tuple, Callable
+from typing import Tuple, Callable, Union
 
 import requests
 from openeo.rest import OpenEoClientException
+from openeo.util import ensure_dir
 
 log = logging.getLogger(__name__)
 
@@ -160,6 +164,10 @@ class OAuthException(OpenEoClientException):
     pass
 
 
+# Tokens as returned by a token endpoint (`refresh_token` can be None)
+AccessTokenResult = namedtuple("AccessTokenResult", ["access_token", "id_token", "refresh_token"])
+
+
 class OidcAuthenticator:
     pass
 
@@ -185,16 +193,24 @@ class OidcAuthCodePkceAuthenticator(OidcAuthenticator):
     """
 
     AuthCodeResult = namedtuple("AuthCodeResult", ["auth_code", "nonce", "code_verifier", "redirect_uri"])
-    AccessTokenResult = namedtuple("AccessTokenResult", ["access_token", "id_token", "refresh_token"])
+    AccessTokenResult = AccessTokenResult
 
     def __init__(self, client_id: str, oidc_discovery_url: str, webbrowser_open: Callable = None, timeout=120,
-                 server_address: Tuple[str, int] = None):
+                 server_address: Tuple[str, int] = None, provider_info: dict = None):
+        """
+        :param provider_info: (optional) already fetched (e.g. cached) OpenID Connect discovery document,
+            to avoid fetching it from the discovery url
+        """
         self._client_id = client_id
-        self._provider_info = requests.get(oidc_discovery_url).json()
+        self._provider_info = provider_info or requests.get(oidc_discovery_url).json()
         self._webbrowser_open = webbrowser_open or webbrowser.open
         self._authentication_timeout = timeout
         self._server_address = server_address
 
+    @property
+    def token_endpoint(self) -> str:
+        return self._provider_info['token_endpoint']
+
     @staticmethod
     def hash_code_verifier(code: str) -> str:
         """Hash code verifier to code challenge"""
@@ -323,7 +339,8 @@ class OidcAuthCodePkceAuthenticator(OidcAuthenticator):
 
         access_token = extract_token("access_token")
         id_token = extract_token("id_token")
-        refresh_token = extract_token("refresh_token")
+        # Refresh token is optional and opaque (not necessarily a JWT): no nonce check.
+        refresh_token = result.get("refresh_token")
         return self.AccessTokenResult(
             access_token=access_token,
             id_token=id_token,
@@ -331,6 +348,186 @@ class OidcAuthCodePkceAuthenticator(OidcAuthenticator):
         )
 
 
+class OidcRefreshTokenAuthenticator(OidcAuthenticator):
+    """
+    Get new tokens with an OAuth refresh token grant (non-interactive).
+    """
+
+    def __init__(self, client_id: str, token_endpoint: str, refresh_token: str):
+        self._client_id = client_id
+        self._token_endpoint = token_endpoint
+        self._refresh_token = refresh_token
+
+    def get_tokens(self) -> AccessTokenResult:
+        log.info("Refreshing access token at {u}".format(u=self._token_endpoint))
+        token_response = requests.post(
+            url=self._token_endpoint,
+            data={
+                "grant_type": "refresh_token",
+                "client_id": self._client_id,
+                "refresh_token": self._refresh_token,
+            },
+        )
+        if token_response.status_code != 200:
+            raise OAuthException("Failed to refresh access token: [{s}] {t}".format(
+                s=token_response.status_code, t=token_response.text
+            ))
+        result = token_response.json()
+        if "access_token" not in result:
+            raise OAuthException("No access_token in response")
+        return AccessTokenResult(
+            access_token=result["access_token"],
+            id_token=result.get("id_token"),
+            # Refresh token might be rotated, otherwise the current one stays valid.
+            refresh_token=result.get("refresh_token", self._refresh_token),
+        )
+
+
+class OidcTokenStore:
+    """
+    Persistent store of OpenID Connect tokens (and token endpoint), keyed by backend URL and client id,
+    so that new (short-lived) client processes can reuse or refresh tokens
+    instead of running an interactive authentication flow again.
+
+    The store is a JSON file, that is only readable and writable by the user (file mode 0600),
+    and is updated by atomic file replacement.
+    Updates are serialized between processes with a lock file, so that concurrent processes
+    (e.g. parallel batch scripts refreshing their tokens) do not overwrite each other's updates.
+    """
+
+    DEFAULT_PATH = Path("~/.local/share/openeo-python-client/oidc_tokens.json")
+
+    def __init__(self, path: Union[str, Path] = None):
+        self.path = Path(path or self.DEFAULT_PATH).expanduser()
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            log.warning("Failed to read OIDC token store {p}".format(p=self.path), exc_info=True)
+            return {}
+
+    def _save(self, data: dict):
+        ensure_dir(self.path.parent)
+        temp_path = self.path.with_name(self.path.name + ".{p}.tmp".format(p=os.getpid()))
+        fd = os.open(str(temp_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(str(temp_path), str(self.path))
+
+    @contextlib.contextmanager
+    def _update_lock(self):
+        """Exclusive lock (between threads and processes) for a read-modify-write update of the store."""
+        with self._lock:
+            ensure_dir(self.path.parent)
+            fd = os.open(str(self.path.with_name(self.path.name + ".lock")), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                _lock_file(fd)
+                try:
+                    yield
+                finally:
+                    _unlock_file(fd)
+            finally:
+                os.close(fd)
+
+    def get(self, backend: str, client_id: str) -> Union[dict, None]:
+        """Get stored tokens (dictionary with "access_token", "refresh_token", "token_endpoint") or None."""
+        with self._lock:
+            return self._load().get(backend, {}).get(client_id)
+
+    def set(self, backend: str, client_id: str, access_token: str, refresh_token: str = None,
+            token_endpoint: str = None):
+        with self._update_lock():
+            data = self._load()
+            data.setdefault(backend, {})[client_id] = {
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+                "token_endpoint": token_endpoint,
+            }
+            self._save(data)
+
+    def update(self, backend: str, client_id: str,
+               update: Callable[[Union[dict, None]], Union[dict, None]]) -> Union[dict, None]:
+        """
+        Read-modify-write update of the stored tokens, holding the store lock (between threads and processes)
+        for the whole update, e.g. to refresh tokens with a (rotating) refresh token only once.
+
+        :param update: function that gets the stored tokens (or None) and returns the tokens to store
+            (returning the given tokens or None leaves the store unchanged)
+        :return: tokens returned by the update function
+        """
+        with self._update_lock():
+            data = self._load()
+            stored = data.get(backend, {}).get(client_id)
+            tokens = update(stored)
+            if tokens is not None and tokens is not stored:
+                data.setdefault(backend, {})[client_id] = {
+                    "access_token": tokens["access_token"],
+                    "refresh_token": tokens.get("refresh_token"),
+                    "token_endpoint": tokens.get("token_endpoint"),
+                }
+                self._save(data)
+            return tokens
+
+    def remove(self, backend: str, client_id: str):
+        with self._update_lock():
+            data = self._load()
+            if data.get(backend, {}).pop(client_id, None) is not None:
+                self._save(data)
+
+
+def _lock_file(fd: int):
+    """Acquire exclusive (advisory) lock on an open file, blocking until available."""
+    try:
+        import fcntl
+    except ImportError:
+        # Windows
+        import msvcrt
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after 10 attempts (1 second apart): keep trying.
+                continue
+    fcntl.flock(fd, fcntl.LOCK_EX)
+
+
+def _unlock_file(fd: int):
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        return
+    fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def jwt_expiration(token: str) -> Union[float, None]:
+    """Get expiration time (`exp` claim, as epoch seconds) of a JWT token (None if unknown or not a JWT)."""
+    try:
+        _, payload = jwt_decode(token)
+    except Exception:
+        return None
+    exp = payload.get("exp")
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+def jwt_subject(token: str) -> Union[str, None]:
+    """Get subject (`sub` claim, user identifier) of a JWT token (None if unknown or not a JWT)."""
+    try:
+        _, payload = jwt_decode(token)
+    except Exception:
+        return None
+    sub = payload.get("sub")
+    return str(sub) if sub is not None else None
+
+
 def jwt_decode(token: str) -> Tuple[dict, dict]:
     """
     Poor man's JWT decoding
@@ -338,7 +535,7 @@ def jwt_decode(token: str) -> Tuple[dict, dict]:
     """
 
     def _decode(data: str) -> dict:
-        decoded = base64.b64decode(data + '=' * (4 - len(data) % 4)).decode('ascii')
+        decoded = base64.urlsafe_b64decode(data + '=' * (4 - len(data) % 4)).decode('utf-8')
         return json.loads(decoded)
 
     header, payload, signature = token.split('.')
@@ -0,0 +1,150 @@
+"""
+Caching of (JSON) responses of metadata endpoints (collections, processes, file formats, ...).
+"""
+
+import collections
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Union
+
+from openeo.util import ensure_dir
+
+_log = logging.getLogger(__name__)
+
+# Cached response: JSON data, ETag header value (if any) and time of (re)validation.
+CacheEntry = collections.namedtuple("CacheEntry", ["data", "etag", "timestamp"])
+
+
+class ResponseCache(ABC):
+    """
+    Base class for response caches: store of JSON response data (and ETag) keyed by URL.
+
+    Entries older than the time-to-live are not used directly,
+    but can still be revalidated with the backend (using their ETag).
+    """
+
+    # Function that returns current time (overridable for unit tests)
+    _now = time.time
+
+    def __init__(self, ttl: float = 3600):
+        """
+        :param ttl: time-to-live of cache entries (in seconds)
+        """
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, key: str) -> Union[CacheEntry, None]:
+        """Get cache entry for given key (or None)."""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry):
+        """Store cache entry for given key."""
+        pass
+
+    def store(self, key: str, data, etag: str = None):
+        """Store (or refresh) response data for given key, with current time as timestamp."""
+        self.set(key, CacheEntry(data=data, etag=etag, timestamp=self._now()))
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return self._now() - entry.timestamp < self.ttl
+
+
+class MemoryCache(ResponseCache):
+    """In-memory, thread-safe, least-recently-used cache."""
+
+    def __init__(self, ttl: float = 3600, max_size: int = 128):
+        super().__init__(ttl=ttl)
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Union[CacheEntry, None]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        # Return copy of the data to protect the cache against manipulation by the caller.
+        return entry._replace(data=copy.deepcopy(entry.data))
+
+    def set(self, key: str, entry: CacheEntry):
+        # Store copy of the data: the caller might still manipulate the original.
+        entry = entry._replace(data=copy.deepcopy(entry.data))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache(ResponseCache):
+    """
+    On-disk cache (one JSON file per entry), that can be shared between processes.
+
+    When there are more than ``max_size`` entries, the least recently written ones are removed.
+    """
+
+    DEFAULT_DIRECTORY = Path("~/.cache/openeo-python-client/responses")
+
+    def __init__(self, directory: Union[str, Path] = None, ttl: float = 24 * 3600, max_size: int = 1000):
+        super().__init__(ttl=ttl)
+        self.directory = Path(directory or self.DEFAULT_DIRECTORY).expanduser()
+        self.max_size = max_size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key: str) -> Union[CacheEntry, None]:
+        path = self._path(key)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if stored.get("key") != key:
+            return None
+        return CacheEntry(data=stored["data"], etag=stored.get("etag"), timestamp=stored["timestamp"])
+
+    def set(self, key: str, entry: CacheEntry):
+        ensure_dir(self.directory)
+        # Write to temp file first and rename: other processes never see partially written entries.
+        fd, temp_path = tempfile.mkstemp(dir=str(self.directory), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "data": entry.data, "etag": entry.etag, "timestamp": entry.timestamp}, f)
+            os.replace(temp_path, str(self._path(key)))
+        except Exception:
+            _log.warning("Failed to write cache entry for {k!r}".format(k=key), exc_info=True)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self._evict()
+
+    def _evict(self):
+        """Remove least recently written entries until there are at most `max_size` entries."""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                # Already removed (e.g. by other process).
+                pass
+        if len(entries) <= self.max_size:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_size]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
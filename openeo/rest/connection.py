@@ -2,28 +2,38 @@
 This module provides a Connection object to manage and persist settings when interacting with the OpenEO API.
 """
 
+import gzip
+import hashlib
+import json
 import logging
 import pathlib
 import shutil
 import sys
+import tempfile
+import time
 import warnings
-from typing import Dict, List, Tuple, Union
+from typing import Any, Dict, IO, Iterator, List, Tuple, Union
 from urllib.parse import urljoin
 
 import requests
 from deprecated import deprecated
 from openeo.rest import OpenEoClientException
 from openeo.rest.datacube import DataCube
-from openeo.util import ensure_list
+from openeo.util import ensure_list, iter_json_items, encode_json
 from requests import Response
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth, AuthBase
+from urllib3.util.retry import Retry
 
 import openeo
 from openeo.capabilities import Capabilities, ApiVersionException, ComparableVersion
 from openeo.imagecollection import CollectionMetadata
-from openeo.rest.auth.auth import NullAuth, BearerAuth
+from openeo.rest.auth.auth import NullAuth, BearerAuth, RefreshingBearerAuth
+from openeo.rest.cache import ResponseCache
+from openeo.rest.geometry import GeometryEncoding
 from openeo.rest.imagecollectionclient import ImageCollectionClient
 from openeo.rest.job import RESTJob
+from openeo.rest.metadata_index import CollectionMetadataIndex
 from openeo.rest.rest_capabilities import RESTCapabilities
 
 _log = logging.getLogger(__name__)
@@ -34,6 +44,52 @@ def url_join(root_url: str, path: str):
     return urljoin(root_url.rstrip('/') + '/', path.lstrip('/'))
 
 
+# Idempotent HTTP methods that are safe to retry automatically.
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+# Status codes of (likely) transient failures to retry on.
+RETRY_STATUS_CODES = frozenset([429, 502, 503, 504])
+
+
+def build_retry(max_retries: int = 3, backoff_factor: float = 0.5) -> Retry:
+    """
+    Build `urllib3` retry policy for idempotent requests (GET/HEAD/OPTIONS):
+    retry on connection errors and transient HTTP errors (429, 502, 503, 504), with exponential backoff
+    (respecting `Retry-After` headers).
+    """
+    kwargs = dict(
+        total=max_retries, connect=max_retries, read=max_retries, status=max_retries,
+        backoff_factor=backoff_factor, status_forcelist=RETRY_STATUS_CODES,
+        # Return the final error response (instead of raising), to be handled as API error.
+        raise_on_status=False,
+    )
+    try:
+        return Retry(allowed_methods=RETRY_METHODS, **kwargs)
+    except TypeError:
+        # urllib3 < 1.26
+        return Retry(method_whitelist=RETRY_METHODS, **kwargs)
+
+
+def configure_session(session: requests.Session, pool_size: int = 10, pool_block: bool = False,
+                      max_retries: Union[int, Retry] = 0, backoff_factor: float = 0.5) -> requests.Session:
+    """
+    Mount HTTP adapters with given connection pool and retry configuration on a session.
+
+    :param session: session to configure
+    :param pool_size: maximum number of (keep-alive) connections to keep per host,
+        should be at least the number of threads doing concurrent requests
+    :param pool_block: whether to block (instead of opening a throw-away connection) when the pool is exhausted
+    :param max_retries: number of retries of idempotent requests, or `urllib3` retry policy
+    :param backoff_factor: backoff factor for retries (ignored if `max_retries` is a retry policy)
+    :return: the session
+    """
+    retry = max_retries if isinstance(max_retries, Retry) else build_retry(max_retries, backoff_factor)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=pool_block,
+                          max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 class OpenEoApiError(OpenEoClientException):
     """
     Error returned by OpenEO API according to https://open-eo.github.io/openeo-api/errors/
@@ -49,26 +105,185 @@ class OpenEoApiError(OpenEoClientException):
         super().__init__("[{s}] {c}: {m}".format(s=self.http_status_code, c=self.code, m=self.message))
 
 
+# Common request building and response handling of the synchronous and asynchronous connection classes.
+
+def default_headers() -> dict:
+    """Default headers (e.g. "User-Agent") of requests to the REST API."""
+    return {
+        "User-Agent": "openeo-python-client/{cv} {py}/{pv} {pl}".format(
+            cv=openeo.client_version(),
+            py=sys.implementation.name, pv=".".join(map(str, sys.version_info[:3])),
+            pl=sys.platform
+        )
+    }
+
+
+def parse_api_error(status_code: int, text: str) -> OpenEoApiError:
+    """Convert (body text of) API error response to Python exception."""
+    try:
+        # Try parsing the error info according to spec and wrap it in an exception.
+        info = json.loads(text)
+        return OpenEoApiError(
+            http_status_code=status_code,
+            code=info.get("code", "unknown"),
+            message=info.get("message", "unknown error"),
+            id=info.get("id"),
+            url=info.get("url"),
+        )
+    except Exception:
+        # When parsing went wrong: give minimal information.
+        return OpenEoApiError(http_status_code=status_code, message=text)
+
+
+# Placeholder for a pre-encoded process graph in a JSON encoded request payload.
+_PROCESS_GRAPH_PLACEHOLDER = "__openeo_pre_encoded_process_graph__"
+
+
+def build_request_with_process_graph(
+        process_graph: Union[dict, bytes], api_version: ComparableVersion, **kwargs
+) -> Union[dict, bytes]:
+    """
+    Prepare a json payload with a process graph to submit to /result, /services, /jobs, ...
+
+    :param process_graph: flat dict representing a process graph,
+        or already JSON encoded process graph (as bytes, e.g. from a graph template),
+        in which case the payload is returned in JSON encoded form too
+    :param api_version: API version of the backend
+    """
+    result = kwargs
+    pre_encoded = isinstance(process_graph, bytes)
+    graph = _PROCESS_GRAPH_PLACEHOLDER if pre_encoded else process_graph
+    if api_version.at_least("1.0.0"):
+        result["process"] = {"process_graph": graph}
+    else:
+        result["process_graph"] = graph
+    if pre_encoded:
+        placeholder = '"{p}"'.format(p=_PROCESS_GRAPH_PLACEHOLDER).encode("utf-8")
+        return encode_json(result).replace(placeholder, process_graph, 1)
+    return result
+
+
+class ConnectionOptions:
+    """
+    Transport and performance related options of a connection:
+    caching, compression, connection pooling, retries and process graph optimization.
+
+    Usage example:
+
+    >>> options = ConnectionOptions(response_cache=DiskCache(), pool_size=16, max_retries=3)
+    >>> connection = openeo.connect(url, options=options)
+    """
+
+    def __init__(
+            self, response_cache: ResponseCache = None, metadata_index: CollectionMetadataIndex = None,
+            optimize_graphs: bool = False, gzip_threshold: int = None, geometry_encoding: GeometryEncoding = None,
+            pool_size: int = None, max_retries: Union[int, Retry] = None
+    ):
+        """
+        :param response_cache: (optional) cache for responses of metadata endpoints
+            (e.g. :py:class:`openeo.rest.cache.MemoryCache` or :py:class:`openeo.rest.cache.DiskCache`)
+        :param metadata_index: (optional) persistent index of parsed collection metadata
+            (see :py:class:`openeo.rest.metadata_index.CollectionMetadataIndex`)
+        :param optimize_graphs: whether to apply client-side optimizations
+            (see :py:mod:`openeo.internal.graph_optimizer`) to process graphs of data cubes
+            before sending them to the backend, and merge structurally identical subgraphs
+        :param gzip_threshold: (optional) minimum size (in bytes) of JSON request bodies
+            (e.g. process graphs with large inline geometries) to send gzip compressed
+        :param geometry_encoding: (optional) options to compact (or upload) large geometries
+            used in data cube operations like `mask_polygon` and `aggregate_spatial`
+            (see :py:class:`openeo.rest.geometry.GeometryEncoding`)
+        :param pool_size: (optional) maximum number of keep-alive connections per host
+            (should be at least the number of threads doing concurrent requests)
+        :param max_retries: (optional) number of retries (with exponential backoff) of idempotent requests
+            (GET/HEAD/OPTIONS, e.g. job status polling) on connection errors and transient HTTP errors,
+            or a `urllib3.util.retry.Retry` policy
+        """
+        self.response_cache = response_cache
+        self.metadata_index = metadata_index
+        self.optimize_graphs = optimize_graphs
+        self.gzip_threshold = gzip_threshold
+        self.geometry_encoding = geometry_encoding
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+
+
 class RestApiConnection:
     """Base connection class implementing generic REST API request functionality"""
 
     def __init__(self, root_url: str, auth: AuthBase = None, session: requests.Session = None,
-                 default_timeout: int = None):
+                 default_timeout: int = None, options: ConnectionOptions = None):
+        """
+        :param root_url: root url of the API
+        :param auth: (optional) authentication to use for all requests
+        :param session: (optional) session to use for requests, used as is: its connection pool and retry
+            configuration are left alone (see :py:func:`configure_session`)
+        :param default_timeout: default timeout (in seconds) for requests
+        :param options: (optional) transport and performance options
+        """
+        options = options or ConnectionOptions()
         self._root_url = root_url
         self.auth = auth or NullAuth()
-        self.session = session or requests.Session()
+        if session is None:
+            self.session = requests.Session()
+            if options.pool_size is not None or options.max_retries is not None:
+                configure_session(
+                    self.session, pool_size=options.pool_size if options.pool_size is not None else 10,
+                    max_retries=options.max_retries or 0
+                )
+        else:
+            self.session = session
+            if options.pool_size is not None or options.max_retries is not None:
+                _log.warning("Ignoring pool_size/max_retries options for a given session: use `configure_session`.")
         self.default_timeout = default_timeout
-        self.default_headers = {
-            "User-Agent": "openeo-python-client/{cv} {py}/{pv} {pl}".format(
-                cv=openeo.client_version(),
-                py=sys.implementation.name, pv=".".join(map(str,sys.version_info[:3])),
-                pl=sys.platform
-            )
-        }
+        self.response_cache = options.response_cache
+        # Minimum size (in bytes) of JSON request bodies to compress with gzip (None: no compression)
+        self.gzip_threshold = options.gzip_threshold
+        self.default_headers = default_headers()
 
     def build_url(self, path: str):
         return url_join(self._root_url, path)
 
+    def _auth_identity(self) -> Union[str, None]:
+        """
+        Identifier of the user the requests are authenticated as (None when not authenticated),
+        e.g. to avoid sharing user specific state (like cached responses) between users.
+        A token is only included as hash.
+        """
+        auth = self.auth
+        if auth is None or isinstance(auth, NullAuth):
+            return None
+        if getattr(auth, "identity", None):
+            return auth.identity
+        if isinstance(auth, BearerAuth):
+            return "bearer:" + hashlib.sha256(auth.bearer.encode("utf-8")).hexdigest()[:32]
+        if isinstance(auth, HTTPBasicAuth):
+            return "basic:{u}".format(u=auth.username)
+        return "auth:{i}".format(i=id(auth))
+
+    def pool_stats(self) -> Dict[str, dict]:
+        """
+        Connection pool usage statistics, per pool (scheme, host and port):
+        number of connections opened ("connections"), requests done ("requests"),
+        idle keep-alive connections ("idle") and maximum pool size ("maxsize").
+
+        A number of connections close to the number of requests indicates
+        that connections are not reused (e.g. pool size too small for the number of threads).
+        """
+        stats = {}
+        for adapter in set(self.session.adapters.values()):
+            pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+            if pools is None:
+                continue
+            for key in pools.keys():
+                pool = pools[key]
+                stats["{s}://{h}:{p}".format(s=pool.scheme, h=pool.host, p=pool.port)] = {
+                    "connections": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "idle": pool.pool.qsize() if pool.pool is not None else 0,
+                    "maxsize": pool.pool.maxsize if pool.pool is not None else 0,
+                }
+        return stats
+
     def _merged_headers(self, headers: dict) -> dict:
         """Merge default headers with given headers"""
         result = self.default_headers.copy()
@@ -79,6 +294,11 @@ class RestApiConnection:
     def request(self, method: str, path: str, headers: dict = None, auth: AuthBase = None,
                 check_error=True, expected_status=None, **kwargs):
         """Generic request send"""
+        json = kwargs.pop("json", None)
+        if json is not None:
+            # Encode JSON payload ourselves (instead of leaving it to `requests`) for speed and compression.
+            kwargs["data"], json_headers = self._encode_json_body(json)
+            headers = dict(json_headers, **(headers or {}))
         resp = self.session.request(
             method=method,
             url=self.build_url(path),
@@ -97,20 +317,7 @@ class RestApiConnection:
 
     def _raise_api_error(self, response: requests.Response):
         """Convert API error response to Python exception"""
-        try:
-            # Try parsing the error info according to spec and wrap it in an exception.
-            info = response.json()
-            exception = OpenEoApiError(
-                http_status_code=response.status_code,
-                code=info.get("code", "unknown"),
-                message=info.get("message", "unknown error"),
-                id=info.get("id"),
-                url=info.get("url"),
-            )
-        except Exception:
-            # When parsing went wrong: give minimal information.
-            exception = OpenEoApiError(http_status_code=response.status_code, message=response.text)
-        raise exception
+        raise parse_api_error(response.status_code, response.text)
 
     def get(self, path, stream=False, auth: AuthBase = None, **kwargs) -> Response:
         """
@@ -123,12 +330,57 @@ class RestApiConnection:
         """
         return self.request("get", path=path, stream=stream, auth=auth, **kwargs)
 
-    def post(self, path, json: dict = None, **kwargs) -> Response:
+    def get_json_cached(self, path: str, **kwargs):
+        """
+        Do GET request to REST API and return the parsed JSON response,
+        using the response cache (if any): a fresh cache entry is returned without request,
+        an expired entry is revalidated with its ETag (``If-None-Match`` header).
+        Responses can depend on the user (e.g. private collections or processes),
+        so cache entries are kept per authenticated user.
+
+        :param path: API path (without root url)
+        :return: parsed JSON data
+        """
+        cache = self.response_cache
+        if cache is None:
+            return self.get(path, **kwargs).json()
+        url = self.build_url(path)
+        identity = self._auth_identity()
+        key = url if identity is None else "{u} (user {i})".format(u=url, i=identity)
+        entry = cache.get(key)
+        if entry and cache.is_fresh(entry):
+            return entry.data
+        headers = {"If-None-Match": entry.etag} if entry and entry.etag else None
+        resp = self.get(path, headers=headers, **kwargs)
+        if resp.status_code == 304 and entry:
+            _log.debug("Revalidated cached response for {u}".format(u=url))
+            cache.store(key, data=entry.data, etag=entry.etag)
+            return entry.data
+        data = resp.json()
+        cache.store(key, data=data, etag=resp.headers.get("ETag"))
+        return data
+
+    def _encode_json_body(self, data: Union[dict, bytes]) -> Tuple[bytes, dict]:
+        """
+        Encode data (unless already pre-encoded as bytes) to a JSON request body,
+        gzip compressed if it is larger than the compression threshold.
+
+        :return: tuple of request body and corresponding headers
+        """
+        body = data if isinstance(data, bytes) else encode_json(data)
+        headers = {"Content-Type": "application/json"}
+        if self.gzip_threshold is not None and len(body) >= self.gzip_threshold:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    def post(self, path, json: Union[dict, bytes] = None, **kwargs) -> Response:
         """
         Do POST request to REST API.
 
         :param path: API path (without root url)
-        :param json: Data (as dictionary) to be posted with JSON encoding)
+        :param json: Data (as dictionary) to be posted with JSON encoding,
+            or already JSON encoded data (as bytes)
         :return: response: Response
         """
         return self.request("post", path=path, json=json, **kwargs)
@@ -170,13 +422,20 @@ class Connection(RestApiConnection):
 
     _MINIMUM_API_VERSION = ComparableVersion("0.4.0")
 
-    def __init__(self, url, auth: AuthBase = None, session: requests.Session = None, default_timeout: int = None):
+    def __init__(self, url, auth: AuthBase = None, session: requests.Session = None, default_timeout: int = None,
+                 options: ConnectionOptions = None):
         """
         Constructor of Connection, authenticates user.
 
         :param url: String Backend root url
-        """
-        super().__init__(root_url=url, auth=auth, session=session, default_timeout=default_timeout)
+        :param options: (optional) transport and performance options
+            (caching, compression, connection pooling, retries, ...), see :py:class:`ConnectionOptions`
+        """
+        options = options or ConnectionOptions()
+        super().__init__(root_url=url, auth=auth, session=session, default_timeout=default_timeout, options=options)
+        self.metadata_index = options.metadata_index
+        self.optimize_graphs = options.optimize_graphs
+        self.geometry_encoding = options.geometry_encoding
         self._cached_capabilities = None
 
         # Initial API version check.
@@ -198,36 +457,111 @@ class Connection(RestApiConnection):
             auth=HTTPBasicAuth(username, password)
         ).json()
         # Switch to bearer based authentication in further requests.
-        self.auth = BearerAuth(bearer=resp["access_token"])
+        self.auth = BearerAuth(bearer=resp["access_token"], identity="basic:{u}".format(u=username))
         return self
 
     def authenticate_OIDC(self, client_id: str, webbrowser_open=None, timeout=120,
-                          server_address: Tuple[str, int] = None) -> 'Connection':
+                          server_address: Tuple[str, int] = None, token_store: 'OidcTokenStore' = None,
+                          refresh_margin: float = 60) -> 'Connection':
         """
         Authenticates a user to the backend using OpenID Connect.
 
+        When a refresh token is available, the access token is refreshed automatically
+        (with a refresh token grant) shortly before it expires.
+        With a token store, tokens are persisted between client processes:
+        a new process reuses a stored (non-expired) access token without any request,
+        or refreshes it with a single request to the token endpoint,
+        and only falls back on the interactive (browser based) flow when both are not possible.
+
         :param client_id: Client id to use for OpenID Connect authentication
         :param webbrowser_open: optional handler for the initial OAuth authentication request
             (opens a webbrowser by default)
         :param timeout: number of seconds after which to abort the authentication procedure
         :param server_address: optional tuple (hostname, port_number) to serve the OAuth redirect callback on
+        :param token_store: (optional) persistent token store (:py:class:`openeo.rest.auth.oidc.OidcTokenStore`)
+        :param refresh_margin: number of seconds before expiration of the access token to refresh it
         """
         # Local import to avoid importing the whole OpenID Connect dependency chain. TODO: just do global import?
-        from openeo.rest.auth.oidc import OidcAuthCodePkceAuthenticator
-
-        # Per spec: '/credentials/oidc' will redirect to  OpenID Connect discovery document
-        oidc_discovery_url = self.build_url('/credentials/oidc')
-        authenticator = OidcAuthCodePkceAuthenticator(
-            client_id=client_id,
-            oidc_discovery_url=oidc_discovery_url,
-            webbrowser_open=webbrowser_open,
-            timeout=timeout,
-            server_address=server_address,
-        )
-        # Do the Oauth/OpenID Connect flow and use the access token as bearer token.
-        tokens = authenticator.get_tokens()
-        # TODO: ability to refresh the token when expired?
-        self.auth = BearerAuth(bearer=tokens.access_token)
+        from openeo.rest.auth.oidc import OidcAuthCodePkceAuthenticator, OidcRefreshTokenAuthenticator, \
+            OAuthException, jwt_expiration, jwt_subject
+
+        backend = self._root_url
+
+        def is_valid(tokens: dict) -> bool:
+            expires_at = jwt_expiration(tokens["access_token"])
+            return expires_at is not None and time.time() < expires_at - refresh_margin
+
+        def refresh_tokens(tokens: dict) -> dict:
+            refreshed = OidcRefreshTokenAuthenticator(
+                client_id=client_id, token_endpoint=tokens["token_endpoint"], refresh_token=tokens["refresh_token"]
+            ).get_tokens()
+            return dict(refreshed._asdict(), token_endpoint=tokens["token_endpoint"])
+
+        def use_or_refresh_stored(stored: Union[dict, None]) -> Union[dict, None]:
+            # Runs while holding the token store lock: concurrent processes wait for the refreshed tokens
+            # instead of refreshing with the same (rotating) refresh token.
+            if not stored:
+                return None
+            if is_valid(stored):
+                _log.info("Using stored OIDC access token")
+                return stored
+            if stored.get("refresh_token") and stored.get("token_endpoint"):
+                try:
+                    return refresh_tokens(stored)
+                except (OAuthException, requests.RequestException) as e:
+                    _log.warning("Failed to refresh stored OIDC tokens: {e!r}".format(e=e))
+            return None
+
+        tokens = token_store.update(backend, client_id, use_or_refresh_stored) if token_store else None
+
+        if tokens is None:
+            # Per spec: '/credentials/oidc' will redirect to  OpenID Connect discovery document
+            oidc_discovery_url = self.build_url('/credentials/oidc')
+            authenticator = OidcAuthCodePkceAuthenticator(
+                client_id=client_id,
+                oidc_discovery_url=oidc_discovery_url,
+                webbrowser_open=webbrowser_open,
+                timeout=timeout,
+                server_address=server_address,
+                # Discovery document (rarely changing) is cached like other metadata
+                provider_info=self.get_json_cached('/credentials/oidc'),
+            )
+            # Do the Oauth/OpenID Connect flow and use the access token as bearer token.
+            tokens = dict(authenticator.get_tokens()._asdict(), token_endpoint=authenticator.token_endpoint)
+            if token_store:
+                token_store.set(
+                    backend, client_id, access_token=tokens["access_token"],
+                    refresh_token=tokens.get("refresh_token"), token_endpoint=tokens.get("token_endpoint")
+                )
+
+        subject = jwt_subject(tokens.get("id_token") or tokens["access_token"])
+        identity = "oidc:{c}:{s}".format(c=client_id, s=subject) if subject else None
+        if tokens.get("refresh_token") and tokens.get("token_endpoint"):
+            state = dict(tokens)
+
+            def refresh_state(stored: Union[dict, None]) -> dict:
+                if stored and stored["access_token"] != state["access_token"] and is_valid(stored):
+                    # Already refreshed by another process (or connection) sharing the token store.
+                    return stored
+                if stored and stored.get("refresh_token") and stored.get("token_endpoint"):
+                    # Stored refresh token is the most recent one (it might have been rotated meanwhile).
+                    return refresh_tokens(stored)
+                return refresh_tokens(state)
+
+            def refresh() -> Tuple[str, Union[float, None]]:
+                if token_store:
+                    state.update(token_store.update(backend, client_id, refresh_state))
+                else:
+                    state.update(refresh_state(None))
+                return state["access_token"], jwt_expiration(state["access_token"])
+
+            self.auth = RefreshingBearerAuth(
+                bearer=tokens["access_token"], refresh=refresh,
+                expires_at=jwt_expiration(tokens["access_token"]), refresh_margin=refresh_margin,
+                identity=identity
+            )
+        else:
+            self.auth = BearerAuth(bearer=tokens["access_token"], identity=identity)
         return self
 
     def describe_account(self) -> str:
@@ -251,7 +585,7 @@ class Connection(RestApiConnection):
 
         :return: list of collection meta data dictionaries
         """
-        return self.get('/collections').json()["collections"]
+        return self.get_json_cached('/collections')["collections"]
 
     def list_collection_ids(self) -> List[str]:
         """
@@ -268,7 +602,7 @@ class Connection(RestApiConnection):
         :return: data_dict: Dict All available data types
         """
         if self._cached_capabilities is None:
-            self._cached_capabilities = RESTCapabilities(self.get('/').json())
+            self._cached_capabilities = RESTCapabilities(self.get_json_cached('/'))
 
         return self._cached_capabilities
 
@@ -280,13 +614,13 @@ class Connection(RestApiConnection):
         if self._api_version.at_least("1.0.0"):
             return self.list_file_formats()["output"]
         else:
-            return self.get('/output_formats').json()
+            return self.get_json_cached('/output_formats')
 
     def list_file_formats(self) -> dict:
         """
         Get available input and output formats
         """
-        return self.get('/file_formats').json()
+        return self.get_json_cached('/file_formats')
 
     def list_service_types(self) -> dict:
         """
@@ -294,7 +628,7 @@ class Connection(RestApiConnection):
 
         :return: data_dict: Dict All available service types
         """
-        return self.get('/service_types').json()
+        return self.get_json_cached('/service_types')
 
     def list_services(self) -> dict:
         """
@@ -313,10 +647,18 @@ class Connection(RestApiConnection):
         :param name: String Id of the collection
         :return: data_dict: Dict Detailed information about the collection
         """
-        return  self.get('/collections/{}'.format(name)).json()
+        return self.get_json_cached('/collections/{}'.format(name))
 
     def collection_metadata(self, name) -> CollectionMetadata:
-        return CollectionMetadata(metadata=self.describe_collection(name))
+        if self.metadata_index is None:
+            return CollectionMetadata(metadata=self.describe_collection(name))
+        # Like cached responses, index entries are kept per user (see `get_json_cached`).
+        user = self._auth_identity()
+        metadata = self.metadata_index.get(backend=self._root_url, collection_id=name, user=user)
+        if metadata is None:
+            metadata = CollectionMetadata(metadata=self.describe_collection(name))
+            self.metadata_index.set(backend=self._root_url, collection_id=name, metadata=metadata, user=user)
+        return metadata
 
     def list_processes(self) -> dict:
         # TODO: Maybe format the result dictionary so that the process_id is the key of the dictionary.
@@ -325,7 +667,7 @@ class Connection(RestApiConnection):
 
         :return: processes_dict: Dict All available processes of the back end.
         """
-        return self.get('/processes').json()["processes"]
+        return self.get_json_cached('/processes')["processes"]
 
     def list_jobs(self) -> dict:
         """
@@ -412,41 +754,85 @@ class Connection(RestApiConnection):
         # No endpoint just returns a file object.
         raise NotImplementedError()
 
-    def _build_request_with_process_graph(self, process_graph: dict, **kwargs) -> dict:
+    def _build_request_with_process_graph(self, process_graph: Union[dict, bytes], **kwargs) -> Union[dict, bytes]:
         """
         Prepare a json payload with a process graph to submit to /result, /services, /jobs, ...
-        :param process_graph: flat dict representing a process graph
+        (see :py:func:`build_request_with_process_graph`)
         """
-        result = kwargs
-        if self._api_version.at_least("1.0.0"):
-            result["process"] = {"process_graph": process_graph}
-        else:
-            result["process_graph"] = process_graph
-        return result
+        return build_request_with_process_graph(process_graph, api_version=self._api_version, **kwargs)
 
     # TODO: Maybe rename to execute and merge with execute().
-    def download(self, graph: dict, outputfile):
+    def download(self, graph: dict, outputfile, timeout: int = 1000):
         """
         Downloads the result of a process graph synchronously, and save the result to the given file.
         This method is useful to export binary content such as images. For json content, the execute method is recommended.
 
         :param graph: (flat) dict representing a process graph
         :param outputfile: output file
+        :param timeout: request timeout (in seconds)
         """
         request = self._build_request_with_process_graph(process_graph=graph)
-        r = self.post(path="/result", json=request, stream=True, timeout=1000)
+        r = self.post(path="/result", json=request, stream=True, timeout=timeout)
         with pathlib.Path(outputfile).open(mode="wb") as f:
             shutil.copyfileobj(r.raw, f)
 
-    def execute(self, process_graph: dict):
+    def download_to_buffer(self, graph: dict, max_memory: int = 256 * 1024 * 1024,
+                           chunk_size: int = 1024 * 1024, timeout: int = 1000) -> IO[bytes]:
+        """
+        Downloads the result of a process graph synchronously into a (seekable) file-like buffer,
+        without writing it to a file path:
+        the result is kept in memory, unless it is larger than `max_memory` bytes,
+        in which case it is moved to an anonymous temporary file.
+
+        :param graph: (flat) dict representing a process graph
+        :param max_memory: maximum size (in bytes) of the result to keep in memory
+        :param chunk_size: size (in bytes) of the chunks to read from the response
+        :param timeout: request timeout (in seconds)
+        :return: file-like object (positioned at the start of the data)
+        """
+        request = self._build_request_with_process_graph(process_graph=graph)
+        r = self.post(path="/result", json=request, stream=True, timeout=timeout)
+        buffer = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        try:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                buffer.write(chunk)
+        except Exception:
+            buffer.close()
+            raise
+        finally:
+            r.close()
+        buffer.seek(0)
+        return buffer
+
+    def execute(self, process_graph: Union[dict, bytes]):
         """
         Execute a process graph synchronously.
 
-        :param process_graph: (flat) dict representing a process graph
+        :param process_graph: (flat) dict representing a process graph (or its JSON encoding as bytes)
         """
         req = self._build_request_with_process_graph(process_graph=process_graph)
         return self.post(path="/result", json=req).json()
 
+    def execute_iter(self, process_graph: dict, chunk_size: int = 64 * 1024) -> Iterator[Tuple[Union[str, int], Any]]:
+        """
+        Execute a process graph synchronously and incrementally parse the (JSON) result while it is downloaded:
+        yield the (key, value) items of a JSON object result (or (index, value) items of a JSON array result).
+
+        Unlike :py:meth:`execute`, the full response is never held in memory,
+        which is useful for large results, e.g. timeseries from `aggregate_spatial`:
+
+            >>> timeseries_json_to_pandas(connection.execute_iter(process_graph))
+
+        :param process_graph: (flat) dict representing a process graph
+        :param chunk_size: size (in bytes) of the chunks to read from the response
+        """
+        req = self._build_request_with_process_graph(process_graph=process_graph)
+        response = self.post(path="/result", json=req, stream=True)
+        try:
+            yield from iter_json_items(response.iter_content(chunk_size=chunk_size))
+        finally:
+            response.close()
+
     def create_job(self, process_graph: dict, title: str = None, description: str = None,
                    plan: str = None, budget=None,
                    additional: Dict = None) -> RESTJob:
@@ -464,22 +850,25 @@ class Connection(RestApiConnection):
         # TODO move all this (RESTJob factory) logic to RESTJob?
         req = self._build_request_with_process_graph(
             process_graph=process_graph,
-            title=title, description=description, plan=plan, budget=budget
-        )
-        if additional:
+            title=title, description=description, plan=plan, budget=budget,
             # TODO: get rid of this non-standard field? https://github.com/Open-EO/openeo-api/issues/276
-            req["job_options"] = additional
+            **({"job_options": additional} if additional else {})
+        )
 
         response = self.post("/jobs", json=req)
+        job_id = self._extract_job_id(response.headers)
+        return RESTJob(job_id, self)
 
-        if "openeo-identifier" in response.headers:
-            job_id = response.headers['openeo-identifier']
-        elif "location" in response.headers:
+    @staticmethod
+    def _extract_job_id(headers) -> str:
+        """Extract job id from (case insensitive) response headers of a job creation request."""
+        if "openeo-identifier" in headers:
+            return headers['openeo-identifier']
+        elif "location" in headers:
             _log.warning("Backend did not explicitly respond with job id, will guess it from redirect URL.")
-            job_id = response.headers['location'].split("/")[-1]
+            return headers['location'].split("/")[-1]
         else:
             raise OpenEoClientException("Failed fo extract job id")
-        return RESTJob(job_id, self)
 
     def job(self,job_id:str):
         """
@@ -513,7 +902,7 @@ class Connection(RestApiConnection):
 
 
 def connect(url, auth_type: str = None, auth_options: dict = {}, session: requests.Session = None,
-            default_timeout: int = None) -> Connection:
+            default_timeout: int = None, options: ConnectionOptions = None) -> Connection:
     """
     This method is the entry point to OpenEO.
     You typically create one connection object in your script or application
@@ -532,9 +921,11 @@ def connect(url, auth_type: str = None, auth_options: dict = {}, session: reques
     :param auth_type: Which authentication to use: None, "basic" or "oidc" (for OpenID Connect)
     :param auth_options: Options/arguments specific to the authentication type
     :param default_timeout: default timeout (in seconds) for requests
+    :param options: (optional) transport and performance options
+        (caching, compression, connection pooling, retries, ...), see :py:class:`ConnectionOptions`
     :rtype: openeo.connections.Connection
     """
-    connection = Connection(url, session=session, default_timeout=default_timeout)
+    connection = Connection(url, session=session, default_timeout=default_timeout, options=options)
     auth_type = auth_type.lower() if isinstance(auth_type, str) else auth_type
     if auth_type in {None, 'null', 'none'}:
         pass
@@ -2,11 +2,95 @@
 Helpers for data conversions between Python ecosystem data types and openEO data structures.
 """
 
+from typing import Iterable, List, Tuple, Union
+
 import numpy as np
 import pandas
 
 
-def timeseries_json_to_pandas(timeseries: dict, index: str = "date", auto_collapse=True) -> pandas.DataFrame:
+def _fill_polygon_data(target: np.ndarray, polygon_data: list):
+    """Fill (polygon, band) array with the band values of given list of polygons (empty band lists stay NaN)."""
+    band_count = target.shape[1]
+    try:
+        # Fast path: all polygons have full band lists.
+        values = np.array(polygon_data, dtype=float)
+    except (ValueError, TypeError):
+        values = None
+    if values is not None and values.ndim == 2 and values.shape[1] == band_count:
+        target[:len(values)] = values
+        return
+    for polygon_index, band_data in enumerate(polygon_data):
+        if band_data:
+            if len(band_data) != band_count:
+                raise ValueError("Multiple band counts found in timeseries data: {b}".format(
+                    b={band_count, len(band_data)}
+                ))
+            target[polygon_index] = np.array(band_data, dtype=float)
+
+
+def _first_band_data(polygon_data: list) -> Union[list, None]:
+    return next((band_data for band_data in polygon_data if band_data), None)
+
+
+def timeseries_json_to_ndarray(timeseries: Union[dict, Iterable[Tuple[str, list]]]) -> Tuple[List[str], np.ndarray]:
+    """
+    Load timeseries data as returned by the `aggregate_polygon` process in a NumPy array
+    with dimensions (date, polygon, band). Missing data (null values, empty band lists) is set to NaN.
+
+    :param timeseries: dictionary as returned by `aggregate_polygon`,
+        or an iterable of (date, polygon data) items of such a dictionary (consumed incrementally)
+    :return: tuple of list of dates and array
+    """
+    # The input timeseries dictionary is assumed to have this structure:
+    #       {dict mapping date -> [list with one item per polygon: [list with one float/None per band or empty list]]}
+    first = None
+    if isinstance(timeseries, dict):
+        # Sizes are known: preallocate the full array and fill it directly.
+        dates = list(timeseries.keys())
+        polygon_count = max((len(p) for p in timeseries.values()), default=0)
+        first = next((b for b in map(_first_band_data, timeseries.values()) if b is not None), None)
+        if first is None:
+            raise ValueError("Multiple band counts found in timeseries data: {b}".format(b=set()))
+        data = np.full((len(dates), polygon_count, len(first)), np.nan)
+        for date_index, polygon_data in enumerate(timeseries.values()):
+            _fill_polygon_data(data[date_index], polygon_data)
+    else:
+        # Streaming input: convert each date to a compact (polygon, band) block, assemble at the end.
+        dates = []
+        blocks = []
+        band_count = None
+        for date, polygon_data in timeseries:
+            dates.append(date)
+            if band_count is None:
+                first = _first_band_data(polygon_data)
+                if first is None:
+                    # Band count still unknown: block is filled in at the end.
+                    blocks.append(len(polygon_data))
+                    continue
+                band_count = len(first)
+            block = np.full((len(polygon_data), band_count), np.nan)
+            _fill_polygon_data(block, polygon_data)
+            blocks.append(block)
+        if band_count is None:
+            raise ValueError("Multiple band counts found in timeseries data: {b}".format(b=set()))
+        polygon_count = max((b if isinstance(b, int) else b.shape[0] for b in blocks), default=0)
+        data = np.full((len(dates), polygon_count, band_count), np.nan)
+        for date_index, block in enumerate(blocks):
+            if not isinstance(block, int):
+                data[date_index, :block.shape[0]] = block
+        del blocks
+
+    # Keep integer type when all values are (available) integers.
+    first_value = next((v for v in first if v is not None), None)
+    if isinstance(first_value, int) and not np.isnan(data).any() and np.all(np.trunc(data) == data):
+        data = data.astype(np.int64)
+    return dates, data
+
+
+def timeseries_json_to_pandas(
+        timeseries: Union[dict, Iterable[Tuple[str, list]]], index: str = "date", auto_collapse=True,
+        parse_dates=False
+) -> pandas.DataFrame:
     """
     Convert a timeseries JSON object as returned by the `aggregate_polygon` process to a pandas DataFrame object
 
@@ -16,50 +100,73 @@ def timeseries_json_to_pandas(timeseries: dict, index: str = "date", auto_collap
     When there is just a single polygon or band in play, the dataframe will be simplified
     by removing the corresponding dimension if `auto_collapse` is enabled (on by default).
 
-    :param timeseries: dictionary as returned by `aggregate_polygon` (TODO: is this standardized?)
+    :param timeseries: dictionary as returned by `aggregate_polygon` (TODO: is this standardized?),
+        or an iterable of (date, polygon data) items of such a dictionary
+        (e.g. as produced by :py:meth:`openeo.rest.connection.Connection.execute_iter`)
     :param index: which dimension should be used for the DataFrame index: 'date' or 'polygon'
     :param auto_collapse: whether single band or single polygon cases should be simplified automatically
+    :param parse_dates: whether to convert the dates to a `pandas.DatetimeIndex` (instead of keeping strings)
 
     :return: pandas DataFrame or Series
     """
-    # The input timeseries dictionary is assumed to have this structure:
-    #       {dict mapping date -> [list with one item per polygon: [list with one float/None per band or empty list]]}
+    if index not in ("date", "polygon"):
+        raise ValueError(index)
+    dates, data = timeseries_json_to_ndarray(timeseries)
+    dates = pandas.to_datetime(dates) if parse_dates else pandas.Index(dates, dtype=object)
+    order = dates.argsort()
+    if not np.all(order[1:] > order[:-1]):
+        dates = dates[order]
+        data = data[order]
+    dates = dates.rename("date")
+    date_count, polygon_count, band_count = data.shape
+    polygons = pandas.RangeIndex(polygon_count, name="polygon")
+    bands = pandas.RangeIndex(band_count, name="band")
+
+    # Single band and single polygon cases (note that the index dimension can not be dropped)
+    drop_band = auto_collapse and band_count == 1
+    drop_polygon = auto_collapse and polygon_count == 1 and index != "polygon"
+
+    def columns(level: pandas.Index) -> pandas.Index:
+        if drop_band:
+            return level
+        return pandas.MultiIndex.from_product([level, bands])
 
-    # Count the number of bands in the timeseries, so we can provide a fallback array for missing data
-    band_counts = set(len(band_data) for values in timeseries.values() for band_data in values)
-    band_counts.discard(0)
-    if len(band_counts) != 1:
-        raise ValueError("Multiple band counts found in timeseries data: {b}".format(b=band_counts))
-    band_count = band_counts.pop()
-    band_data_fallback = [np.nan] * band_count
-    # Load the timeseries data in a pandas Series with multi-index ["date", "polygon", "band"]
-    s = pandas.DataFrame.from_records(
-        (
-            (date, polygon_index, band_index, value)
-            for (date, polygon_data) in timeseries.items()
-            for polygon_index, band_data in enumerate(polygon_data)
-            for band_index, value in enumerate(band_data or band_data_fallback)
-        ),
-        columns=["date", "polygon", "band", "value"],
-        index=["date", "polygon", "band"]
-    )["value"].rename(None)
-    # TODO convert date to real date index?
-
-    if auto_collapse:
-        if s.index.levshape[2] == 1:
-            # Single band case
-            s.index = s.index.droplevel("band")
-        if s.index.levshape[1] == 1:
-            # Single polygon case
-            s.index = s.index.droplevel("polygon")
-
-    # Reshape as desired
     if index == "date":
-        if len(s.index.names) > 1:
-            return s.unstack("date").T
-        else:
-            return s
-    elif index == "polygon":
-        return s.unstack("polygon").T
+        if drop_band and drop_polygon:
+            return pandas.Series(data.reshape(date_count), index=dates)
+        return pandas.DataFrame(
+            data.reshape(date_count, polygon_count * band_count),
+            index=dates,
+            columns=bands if drop_polygon else columns(polygons),
+        )
     else:
-        raise ValueError(index)
+        return pandas.DataFrame(
+            data.transpose(1, 0, 2).reshape(polygon_count, date_count * band_count),
+            index=polygons,
+            columns=columns(dates),
+        )
+
+
+def timeseries_json_to_xarray(timeseries: Union[dict, Iterable[Tuple[str, list]]], parse_dates=True):
+    """
+    Convert a timeseries JSON object as returned by the `aggregate_polygon` process
+    to a `xarray.DataArray` with dimensions "date", "polygon" and "band".
+
+    Requires the `xarray` package.
+
+    :param timeseries: dictionary as returned by `aggregate_polygon`,
+        or an iterable of (date, polygon data) items of such a dictionary
+    :param parse_dates: whether to convert the dates to datetime values (instead of keeping strings)
+    :return: xarray.DataArray
+    """
+    import xarray
+    dates, data = timeseries_json_to_ndarray(timeseries)
+    return xarray.DataArray(
+        data,
+        dims=("date", "polygon", "band"),
+        coords={
+            "date": pandas.to_datetime(dates) if parse_dates else dates,
+            "polygon": np.arange(data.shape[1]),
+            "band": np.arange(data.shape[2]),
+        }
+    )
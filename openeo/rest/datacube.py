@@ -1,19 +1,23 @@
 import datetime
+import json
 import logging
+import os
 import pathlib
 import typing
-from typing import List, Dict, Union, Tuple
+from typing import Any, IO, List, Dict, Iterator, Union, Tuple
 
 import shapely.geometry
 import shapely.geometry.base
 from deprecated import deprecated
-from shapely.geometry import Polygon, MultiPolygon, mapping
+from shapely.geometry import Polygon, MultiPolygon
 
 from openeo.imagecollection import ImageCollection, CollectionMetadata
+from openeo.internal import graph_optimizer
 from openeo.internal.graph_building import PGNode, ReduceNode
-from openeo.rest import BandMathException, OperatorException
+from openeo.internal.graph_template import GraphTemplate, compile_template, is_parameter
+from openeo.rest import BandMathException, OperatorException, OpenEoClientException, partitioning
 from openeo.rest.job import RESTJob
-from openeo.util import get_temporal_extent, dict_no_none
+from openeo.util import get_temporal_extent, dict_no_none, ensure_dir
 
 if hasattr(typing, 'TYPE_CHECKING') and typing.TYPE_CHECKING:
     # Only import this for type hinting purposes. Runtime import causes circular dependency issues.
@@ -50,6 +54,41 @@ class DataCube(ImageCollection):
         """Get the process graph in flattened dict representation"""
         return self._pg.flatten()
 
+    def optimize(self) -> 'DataCube':
+        """
+        Get a new DataCube with a client-side optimized process graph
+        (e.g. filters pushed down into `load_collection`).
+        """
+        return DataCube(graph=graph_optimizer.optimize(self._pg), connection=self._connection, metadata=self.metadata)
+
+    def _request_pg(self) -> PGNode:
+        """Get process graph to send to the backend (optimized if enabled on the connection)."""
+        pg = self._pg
+        if getattr(self._connection, "optimize_graphs", False):
+            pg = graph_optimizer.optimize(pg)
+        return pg
+
+    def _request_graph(self) -> dict:
+        """
+        Get flattened process graph to send to the backend
+        (optimized, with structurally identical subgraphs merged, if enabled on the connection).
+        """
+        optimize = getattr(self._connection, "optimize_graphs", False)
+        return self._request_pg().flatten(merge_common_subgraphs=optimize)
+
+    def to_template(self, parameters: List[str] = None) -> GraphTemplate:
+        """
+        Compile the process graph of this cube to a template, in which the parameter placeholders
+        (``{"from_parameter": name}``, see :py:func:`openeo.internal.graph_template.parameter`)
+        can be filled in cheaply for each request.
+        Compiled templates are cached by structural graph hash,
+        so rebuilding the same cube and calling this method again does not flatten or serialize again.
+
+        :param parameters: names of template parameters (default: all parameters used outside callbacks)
+        :return: compiled template
+        """
+        return compile_template(self._request_pg(), parameters=parameters)
+
     @property
     def _api_version(self):
         return self._connection.capabilities().api_version_check
@@ -92,7 +131,8 @@ class DataCube(ImageCollection):
             spatial_extent: Union[Dict[str, float], None] = None,
             temporal_extent: Union[List[Union[str, datetime.datetime, datetime.date]], None] = None,
             bands: Union[List[str], None] = None,
-            fetch_metadata=True
+            fetch_metadata=True,
+            metadata: CollectionMetadata = None
     ):
         """
         Create a new Raster Data cube.
@@ -100,18 +140,23 @@ class DataCube(ImageCollection):
         :param collection_id: A collection id, should exist in the backend.
         :param connection: The connection to use to connect with the backend.
         :param spatial_extent: limit data to specified bounding box or polygons
-        :param temporal_extent: limit data to specified temporal interval
+        :param temporal_extent: limit data to specified temporal interval (or parameter placeholder)
         :param bands: only add the specified bands
+        :param fetch_metadata: whether to fetch the collection metadata from the backend
+        :param metadata: (optional) already available collection metadata (instead of fetching it)
         :return:
         """
-        normalized_temporal_extent = list(
-            get_temporal_extent(extent=temporal_extent)) if temporal_extent is not None else None
+        if temporal_extent is None or is_parameter(temporal_extent):
+            normalized_temporal_extent = temporal_extent
+        else:
+            normalized_temporal_extent = list(get_temporal_extent(extent=temporal_extent))
         arguments = {
             'id': collection_id,
             'spatial_extent': spatial_extent,
             'temporal_extent': normalized_temporal_extent,
         }
-        metadata = connection.collection_metadata(collection_id) if fetch_metadata else None
+        if metadata is None and fetch_metadata:
+            metadata = connection.collection_metadata(collection_id)
         if bands:
             if isinstance(bands, str):
                 bands = [bands]
@@ -232,13 +277,12 @@ class DataCube(ImageCollection):
                 return self._bandmath_operator_binary_cubes(operator, other)
         else:
             if isinstance(other, DataCube):
+                fused = self._elementwise_operator_binary_cubes(operator, other)
+                if fused is not None:
+                    return fused
                 return self._merge_operator_binary_cubes(operator, other)
-            elif isinstance(other, (int, float)) and not reverse:
-                # TODO #123: support appending to pre-existing apply process instead of adding a whole new one
-                return self.apply(process=PGNode(
-                    process_id=operator,
-                    arguments={"x": {"from_parameter": "x"}, "y": other}
-                ))
+            elif isinstance(other, (int, float)):
+                return self._elementwise_operator_binary_scalar(operator, other, reverse=reverse)
         raise OperatorException("Unsupported operator {op!r} with {other!r} (band math mode={b})".format(
             op=operator, other=other, b=band_math_mode))
 
@@ -246,8 +290,8 @@ class DataCube(ImageCollection):
         band_math_mode = self._in_bandmath_mode()
         if band_math_mode:
             return self._bandmath_operator_unary(operator)
-        raise OperatorException("Unsupported unary operator {op!r} (band math mode={b})".format(
-            op=operator, b=band_math_mode))
+        data, expression = self._get_elementwise_expression()
+        return self._apply_elementwise_expression(data, PGNode(operator, x=expression))
 
     def add(self, other: Union['DataCube', int, float], reverse=False) -> 'DataCube':
         return self._operator_binary("add", other, reverse=reverse)
@@ -368,7 +412,7 @@ class DataCube(ImageCollection):
         if reverse:
             x, y = y, x
         return self.process_with_node(node.clone_with_new_reducer(
-            PGNode(operator, x=x, y=y)
+            graph_optimizer.binary_operation_node(operator, x=x, y=y)
         ))
 
     def _bandmath_operator_unary(self, operator: str) -> 'DataCube':
@@ -387,6 +431,48 @@ class DataCube(ImageCollection):
             raise BandMathException("Must be in band math mode already")
         return self._pg
 
+    def _get_elementwise_expression(self) -> Tuple[PGNode, Union[PGNode, dict]]:
+        """
+        Split this cube in an input data node and an element-wise expression on it (to fuse element-wise operations):
+        the input data and callback of an `apply` node, or this cube itself with the identity expression.
+        """
+        pg = self._pg
+        if pg.process_id == "apply" and type(pg) is PGNode and set(pg.arguments.keys()) == {"data", "process"}:
+            data = pg.arguments["data"]
+            process = pg.arguments["process"]
+            if (
+                    isinstance(data, dict) and isinstance(data.get("from_node"), PGNode)
+                    and isinstance(process, dict) and isinstance(process.get("process_graph"), PGNode)
+            ):
+                return data["from_node"], process["process_graph"]
+        return pg, {"from_parameter": "x"}
+
+    def _apply_elementwise_expression(self, data: PGNode, expression: PGNode) -> 'DataCube':
+        return self.process_with_node(PGNode(
+            process_id="apply",
+            arguments={"data": data, "process": {"process_graph": expression}}
+        ))
+
+    def _elementwise_operator_binary_scalar(self, operator: str, other: Union[int, float],
+                                            reverse=False) -> 'DataCube':
+        """Binary operator with scalar: append to existing `apply` callback, or add a new `apply` process."""
+        data, x = self._get_elementwise_expression()
+        y = other
+        if reverse:
+            x, y = y, x
+        return self._apply_elementwise_expression(data, graph_optimizer.binary_operation_node(operator, x=x, y=y))
+
+    def _elementwise_operator_binary_cubes(self, operator: str, other: 'DataCube') -> Union['DataCube', None]:
+        """
+        Binary operator between element-wise expressions on the same input cube:
+        fuse in a single `apply` callback (instead of `merge_cubes`). Returns None when not possible.
+        """
+        data, x = self._get_elementwise_expression()
+        other_data, y = other._get_elementwise_expression()
+        if data.structural_hash() != other_data.structural_hash():
+            return None
+        return self._apply_elementwise_expression(data, graph_optimizer.binary_operation_node(operator, x=x, y=y))
+
     def _merge_operator_binary_cubes(self, operator: str, other: 'DataCube', left_arg_name="x",
                                      right_arg_name="y") -> 'DataCube':
         """Merge two cubes with given operator as overlap_resolver."""
@@ -414,7 +500,7 @@ class DataCube(ImageCollection):
         """
         regions_geojson = regions
         if isinstance(regions, Polygon) or isinstance(regions, MultiPolygon):
-            regions_geojson = mapping(regions)
+            regions_geojson = self._geometry_argument(regions, add_crs=False)
         process_id = 'zonal_statistics'
         args = {
             'data': {'from_node': self._pg},
@@ -721,11 +807,7 @@ class DataCube(ImageCollection):
         elif isinstance(mask, shapely.geometry.base.BaseGeometry):
             if mask.area == 0:
                 raise ValueError("Mask {m!s} has an area of {a!r}".format(m=mask, a=mask.area))
-            mask = shapely.geometry.mapping(mask)
-            mask['crs'] = {
-                'type': 'name',
-                'properties': {'name': srs}
-            }
+            mask = self._geometry_argument(mask, srs=srs)
         else:
             # Assume mask is already a valid GeoJSON object
             assert "type" in mask
@@ -828,13 +910,7 @@ class DataCube(ImageCollection):
             # TODO this is non-standard process: check capabilities? #104 #40
             geometries = PGNode(process_id="read_vector", arguments={"filename": polygon})
         else:
-            geometries = shapely.geometry.mapping(polygon)
-            geometries['crs'] = {
-                'type': 'name',  # TODO: name?
-                'properties': {
-                    'name': 'EPSG:4326'
-                }
-            }
+            geometries = self._geometry_argument(polygon, srs="EPSG:4326")
 
         return self.process_with_node(PGNode(
             process_id="aggregate_spatial",
@@ -849,6 +925,33 @@ class DataCube(ImageCollection):
             }
         ))
 
+    def _geometry_argument(
+            self, geometry: shapely.geometry.base.BaseGeometry, srs: str = "EPSG:4326", add_crs: bool = True
+    ) -> Union[dict, PGNode]:
+        """
+        Build process graph argument for given geometry: inline GeoJSON
+        or (when the connection has a geometry encoding with upload threshold) a `read_vector` node
+        referencing the uploaded geometry.
+        See :py:class:`openeo.rest.geometry.GeometryEncoding` for the options to compact large geometries.
+        """
+        encoding = getattr(self._connection, "geometry_encoding", None)
+        if encoding is None:
+            geojson = shapely.geometry.mapping(geometry)
+            if add_crs:
+                geojson["crs"] = {"type": "name", "properties": {"name": srs}}
+            return geojson
+        try:
+            extent = partitioning.find_process_argument(self._pg, "load_collection", "spatial_extent")
+        except OpenEoClientException:
+            extent = None
+        argument = encoding.geometry_argument(self._connection, geometry, srs=srs, extent=extent)
+        if isinstance(argument, str):
+            # TODO: change read_vector to load_uploaded_files https://github.com/Open-EO/openeo-processes/pull/106
+            return PGNode(process_id="read_vector", arguments={"filename": argument})
+        if not add_crs:
+            del argument["crs"]
+        return argument
+
     def save_result(self, format: str = "GTIFF", options: dict = None):
         return self.process(
             process_id="save_result",
@@ -862,10 +965,173 @@ class DataCube(ImageCollection):
     def download(self, outputfile: str, format: str = "GTIFF", options: dict = None):
         """Download image collection, e.g. as GeoTIFF."""
         newcollection = self.save_result(format=format, options=options)
-        return self._connection.download(newcollection._pg.flatten(), outputfile)
+        return self._connection.download(newcollection._request_graph(), outputfile)
+
+    def download_tiled(
+            self, target: Union[str, pathlib.Path], tile_size: Union[float, Tuple[float, float]],
+            format: str = "GTiff", options: dict = None, spatial_extent: dict = None,
+            max_workers: int = 4, max_retries: int = 3, retry_interval: float = 5, timeout: int = 300,
+            mosaic: Union[str, pathlib.Path] = None
+    ) -> List[Tuple[partitioning.Tile, pathlib.Path]]:
+        """
+        Download the result in spatial tiles: the spatial extent is split in a grid of tiles,
+        which are executed as separate (smaller and faster) synchronous requests, concurrently and with retries.
+
+        The tiles are saved as a tile set in the target folder (one file per tile,
+        with a "tiles.json" index of the tile extents), and can optionally be merged in a single mosaic file.
+
+        :param target: folder to save the tiles in
+        :param tile_size: tile size (in units of the CRS of the spatial extent), or (width, height) tuple
+        :param format: result format
+        :param options: result format options
+        :param spatial_extent: (optional) bounding box to tile,
+            by default the spatial extent of the `load_collection` process (narrowed down by `filter_bbox`)
+        :param max_workers: maximum number of concurrent requests
+        :param max_retries: maximum number of retries per tile
+        :param retry_interval: base interval (in seconds) between retries
+        :param timeout: request timeout per tile (in seconds)
+        :param mosaic: (optional) path of GeoTIFF file to merge the tiles into (requires `rasterio`)
+        :return: list of (tile, result file) tuples
+        """
+        pg = self._request_pg()
+        if spatial_extent is None:
+            spatial_extent = partitioning.find_extent(pg, "spatial_extent")
+            if not isinstance(spatial_extent, dict):
+                raise OpenEoClientException("No (bounding box) spatial extent to tile: {e!r}".format(e=spatial_extent))
+        tiles = partitioning.split_spatial_extent(spatial_extent, tile_size=tile_size)
+        target = ensure_dir(target)
+        suffix = {"gtiff": ".tiff", "geotiff": ".tiff", "netcdf": ".nc", "json": ".json"}.get(format.lower(), "")
+        log.info("Downloading {n} tiles to {t}".format(n=len(tiles), t=target))
+
+        def download_tile(tile: partitioning.Tile) -> pathlib.Path:
+            path = target / "tile_{r}_{c}{s}".format(r=tile.row, c=tile.col, s=suffix)
+            tile_cube = DataCube(
+                graph=partitioning.restrict_load_collections(pg, spatial_extent=tile.extent),
+                connection=self._connection, metadata=self.metadata
+            ).save_result(format=format, options=options)
+            # Download to temp file first: a failed (e.g. truncated) download never leaves a partial tile.
+            temp_path = path.with_name(path.name + ".part")
+            try:
+                self._connection.download(tile_cube.flatten(), temp_path, timeout=timeout)
+                os.replace(str(temp_path), str(path))
+            finally:
+                if temp_path.exists():
+                    temp_path.unlink()
+            return path
+
+        paths = partitioning.run_partitioned(
+            download_tile, tiles, max_workers=max_workers, max_retries=max_retries, retry_interval=retry_interval
+        )
+        with (target / "tiles.json").open("w") as f:
+            json.dump([dict(t._asdict(), path=p.name) for t, p in zip(tiles, paths)], f, indent=2)
+        if mosaic:
+            partitioning.mosaic_tiles(paths, mosaic)
+        return list(zip(tiles, paths))
+
+    def execute_timeseries_chunked(
+            self, temporal_chunk: Union[int, datetime.timedelta] = 365, geometry_chunk_size: int = None,
+            temporal_extent: List[str] = None, max_workers: int = 4, max_retries: int = 3, retry_interval: float = 5
+    ) -> dict:
+        """
+        Execute a (long) timeseries aggregation (e.g. built with :py:meth:`polygonal_mean_timeseries`)
+        in smaller synchronous requests: the temporal extent (and optionally the geometries) are split in chunks,
+        which are executed concurrently and with retries, after which the partial timeseries are merged.
+
+        The result can be converted with :py:func:`openeo.rest.conversions.timeseries_json_to_pandas`.
+
+        :param temporal_chunk: size of the temporal chunks (as number of days or timedelta)
+        :param geometry_chunk_size: (optional) maximum number of geometries per chunk
+            (the geometries should be a GeoJSON GeometryCollection or FeatureCollection)
+        :param temporal_extent: (optional) temporal extent to split,
+            by default the temporal extent of the `load_collection` process (narrowed down by `filter_temporal`)
+        :param max_workers: maximum number of concurrent requests
+        :param max_retries: maximum number of retries per chunk
+        :param retry_interval: base interval (in seconds) between retries
+        :return: timeseries (dictionary mapping date to list of polygon data)
+        """
+        pg = self._request_pg()
+        if temporal_extent is None:
+            temporal_extent = partitioning.find_extent(pg, "temporal_extent")
+        if not temporal_extent or None in temporal_extent:
+            raise OpenEoClientException("No (closed) temporal extent to split: {e!r}".format(e=temporal_extent))
+        temporal_chunks = partitioning.split_temporal_extent(temporal_extent, chunk_size=temporal_chunk)
+        geometry_chunks = [None]
+        polygon_counts = [None]
+        if geometry_chunk_size:
+            geometries = partitioning.find_process_argument(pg, "aggregate_spatial", "geometries")
+            if not isinstance(geometries, dict):
+                raise OpenEoClientException("No (GeoJSON) geometries to split: {g!r}".format(g=geometries))
+            geometry_chunks = partitioning.split_geometries(geometries, chunk_size=geometry_chunk_size)
+            polygon_counts = [len(g.get("geometries", g.get("features"))) for g in geometry_chunks]
+        partitions = [
+            (t, g, geometries)
+            for t in temporal_chunks
+            for g, geometries in enumerate(geometry_chunks)
+        ]
+        log.info("Executing timeseries in {n} chunks".format(n=len(partitions)))
+
+        def execute(partition: Tuple[List[str], int, Union[dict, None]]) -> Tuple[int, dict]:
+            extent, geometry_chunk_index, geometries = partition
+            chunk_pg = partitioning.restrict_load_collections(pg, temporal_extent=extent)
+            if geometries is not None:
+                chunk_pg = partitioning.replace_aggregate_spatial_geometries(chunk_pg, geometries=geometries)
+            return geometry_chunk_index, self._connection.execute(chunk_pg.flatten())
+
+        parts = partitioning.run_partitioned(
+            execute, partitions, max_workers=max_workers, max_retries=max_retries, retry_interval=retry_interval
+        )
+        return partitioning.merge_timeseries(parts, polygon_counts=polygon_counts)
+
+    def download_to_buffer(self, format: str = "GTIFF", options: dict = None,
+                           max_memory: int = 256 * 1024 * 1024, timeout: int = 1000) -> IO[bytes]:
+        """
+        Download the result (e.g. as GeoTIFF or NetCDF) into a file-like buffer instead of a file
+        (see :py:meth:`openeo.rest.connection.Connection.download_to_buffer`).
+        """
+        newcollection = self.save_result(format=format, options=options)
+        return self._connection.download_to_buffer(
+            newcollection._request_graph(), max_memory=max_memory, timeout=timeout
+        )
+
+    def to_xarray(self, format: str = "netCDF", options: dict = None, max_memory: int = 256 * 1024 * 1024,
+                  timeout: int = 1000):
+        """
+        Execute synchronously and load the (NetCDF) result directly as `xarray.Dataset`,
+        without writing it to a file path.
+
+        Requires the `xarray` package (and a NetCDF backend for it that supports file objects, e.g. `h5netcdf`).
+        """
+        import xarray
+        buffer = self.download_to_buffer(format=format, options=options, max_memory=max_memory, timeout=timeout)
+        with buffer:
+            return xarray.load_dataset(buffer)
+
+    def execute_to_array(self, format: str = "GTiff", options: dict = None, max_memory: int = 256 * 1024 * 1024,
+                         timeout: int = 1000):
+        """
+        Execute synchronously and decode the result directly into a NumPy array, without writing it to a file path.
+
+        - GeoTIFF results are decoded with `rasterio` (array with dimensions band, y, x)
+        - NetCDF results are decoded with `xarray` (data variables are stacked along the first dimension)
+
+        :param format: result format: "GTiff" or "netCDF"
+        :param timeout: request timeout (in seconds)
+        :return: numpy.ndarray
+        """
+        if format.lower() in ("gtiff", "geotiff"):
+            import rasterio.io
+            buffer = self.download_to_buffer(format=format, options=options, max_memory=max_memory, timeout=timeout)
+            with buffer, rasterio.io.MemoryFile(buffer) as memory_file, memory_file.open() as dataset:
+                return dataset.read()
+        elif format.lower() in ("netcdf", "nc"):
+            return self.to_xarray(
+                format=format, options=options, max_memory=max_memory, timeout=timeout
+            ).to_array().values
+        else:
+            raise ValueError("Unsupported format for array decoding: {f!r}".format(f=format))
 
     def tiled_viewing_service(self, type: str, **kwargs) -> Dict:
-        return self._connection.create_service(self._pg.flatten(), type=type, **kwargs)
+        return self._connection.create_service(self._request_graph(), type=type, **kwargs)
 
     def execute_batch(
             self,
@@ -904,11 +1170,18 @@ class DataCube(ImageCollection):
         if out_format:
             # add `save_result` node
             img = img.save_result(format=out_format, options=format_options)
-        return self._connection.create_job(process_graph=img.graph, additional=job_options)
+        return self._connection.create_job(process_graph=img._request_graph(), additional=job_options)
 
     def execute(self) -> Dict:
         """Executes the process graph of the imagery. """
-        return self._connection.execute(self._pg.flatten())
+        return self._connection.execute(self._request_graph())
+
+    def execute_iter(self, chunk_size: int = 64 * 1024) -> Iterator[Tuple[Union[str, int], Any]]:
+        """
+        Execute the process graph synchronously and incrementally yield the items of the (JSON) result
+        (see :py:meth:`openeo.rest.connection.Connection.execute_iter`).
+        """
+        return self._connection.execute_iter(self._request_graph(), chunk_size=chunk_size)
 
     def to_graphviz(self):
         """
@@ -0,0 +1,146 @@
+"""
+Compact encoding of (large) geometries for process graph arguments (e.g. `mask_polygon`, `aggregate_spatial`):
+clipping to the spatial extent of the data cube, simplification and coordinate rounding,
+or upload as user file (to be referenced with `read_vector`) instead of inlining.
+"""
+import hashlib
+import logging
+import threading
+from typing import Union
+
+import shapely.geometry
+import shapely.geometry.base
+from shapely.geometry import MultiPolygon, Polygon
+
+from openeo.util import encode_json
+
+_log = logging.getLogger(__name__)
+
+_WGS84 = {None, 4326, "4326", "EPSG:4326", "epsg:4326"}
+
+
+def round_coordinates(coordinates, precision: int):
+    """Round (nested) GeoJSON coordinates to given number of decimals."""
+    if isinstance(coordinates, (int, float)):
+        return round(coordinates, precision)
+    return [round_coordinates(c, precision) for c in coordinates]
+
+
+def _polygonal(geometry: shapely.geometry.base.BaseGeometry) -> Union[Polygon, MultiPolygon, None]:
+    """Keep only the polygonal parts of given geometry (e.g. result of an intersection)."""
+    if isinstance(geometry, (Polygon, MultiPolygon)):
+        return geometry
+    polygons = [g for g in getattr(geometry, "geoms", []) if isinstance(g, Polygon)]
+    return MultiPolygon(polygons) if polygons else None
+
+
+def clip_to_extent(geometry: shapely.geometry.base.BaseGeometry, extent: dict) -> shapely.geometry.base.BaseGeometry:
+    """
+    Clip (multi)polygon to a bounding box (dictionary with "west", "south", "east", "north").
+    Other geometries, or polygons that would become empty, are returned unchanged.
+    """
+    if not isinstance(geometry, (Polygon, MultiPolygon)):
+        return geometry
+    box = shapely.geometry.box(extent["west"], extent["south"], extent["east"], extent["north"])
+    if box.contains(geometry):
+        return geometry
+    clipped = _polygonal(geometry.intersection(box))
+    if clipped is None or clipped.is_empty:
+        return geometry
+    return clipped
+
+
+class GeometryEncoding:
+    """
+    Options to compact large geometries before they are inlined in a process graph.
+
+    Usage example:
+
+    >>> encoding = GeometryEncoding(simplify_tolerance=0.001, precision=5)
+    >>> connection = openeo.connect(url, options=ConnectionOptions(geometry_encoding=encoding))
+    >>> cube.mask_polygon(country)
+    """
+
+    def __init__(
+            self, simplify_tolerance: float = None, precision: int = None, clip_to_extent: bool = True,
+            upload_threshold: int = None, upload_prefix: str = "openeo-python-client/geometries"
+    ):
+        """
+        :param simplify_tolerance: (optional) tolerance for geometry simplification (in units of the geometry CRS),
+            topology is preserved
+        :param precision: (optional) number of decimals to round coordinates to
+        :param clip_to_extent: whether to clip polygons to the spatial extent of the cube's `load_collection`
+            (when known, and expressed in the same CRS)
+        :param upload_threshold: (optional) minimum size (in bytes) of the encoded geometry to upload it
+            as user file (with the files API) and reference it with `read_vector`, instead of inlining it
+        :param upload_prefix: path prefix for uploaded geometry files
+        """
+        self.simplify_tolerance = simplify_tolerance
+        self.precision = precision
+        self.clip_to_extent = clip_to_extent
+        self.upload_threshold = upload_threshold
+        self.upload_prefix = upload_prefix
+        # Geometry files uploaded already (content addressed paths),
+        # per backend and user (an encoding instance can be shared by multiple connections).
+        self._uploaded = set()
+        self._lock = threading.Lock()
+
+    def encode(self, geometry: shapely.geometry.base.BaseGeometry, srs: str = "EPSG:4326",
+               extent: dict = None) -> dict:
+        """
+        Encode given geometry as GeoJSON dictionary, applying clipping, simplification and rounding.
+
+        :param geometry: shapely geometry
+        :param srs: reference system of the geometry
+        :param extent: (optional) spatial extent of the data (bounding box dictionary) to clip to
+        """
+        if self.clip_to_extent and isinstance(extent, dict) and extent.get("crs") in _WGS84 and srs in _WGS84:
+            if all(isinstance(extent.get(k), (int, float)) for k in ["west", "south", "east", "north"]):
+                geometry = clip_to_extent(geometry, extent)
+        if self.simplify_tolerance:
+            geometry = geometry.simplify(self.simplify_tolerance, preserve_topology=True)
+        geojson = shapely.geometry.mapping(geometry)
+        if self.precision is not None:
+            geojson = self._round(geojson)
+        return geojson
+
+    def _round(self, geojson: dict) -> dict:
+        if geojson["type"] == "GeometryCollection":
+            return dict(geojson, geometries=[self._round(g) for g in geojson["geometries"]])
+        return dict(geojson, coordinates=round_coordinates(geojson["coordinates"], self.precision))
+
+    def should_upload(self, data: bytes) -> bool:
+        return self.upload_threshold is not None and len(data) >= self.upload_threshold
+
+    def upload(self, connection, data: bytes) -> str:
+        """
+        Upload encoded GeoJSON as user file (PUT /files/{path}), unless uploaded already.
+
+        :return: path of the user file
+        """
+        path = "{p}/{h}.geojson".format(p=self.upload_prefix.rstrip("/"), h=hashlib.sha256(data).hexdigest()[:32])
+        key = (connection.build_url("/"), connection._auth_identity(), path)
+        with self._lock:
+            if key in self._uploaded:
+                return path
+        _log.info("Uploading geometry ({s} bytes) to user file {p!r}".format(s=len(data), p=path))
+        connection.put(path="/files/" + path, headers={"Content-Type": "application/geo+json"}, data=data)
+        with self._lock:
+            self._uploaded.add(key)
+        return path
+
+    def geometry_argument(
+            self, connection, geometry: shapely.geometry.base.BaseGeometry, srs: str = "EPSG:4326",
+            extent: dict = None
+    ) -> Union[dict, str]:
+        """
+        Build process graph argument for given geometry: an (inline) GeoJSON dictionary (with CRS),
+        or the path of the uploaded user file (string) if it is larger than the upload threshold.
+        """
+        geojson = self.encode(geometry, srs=srs, extent=extent)
+        geojson["crs"] = {"type": "name", "properties": {"name": srs}}
+        if self.upload_threshold is not None:
+            data = encode_json(geojson)
+            if self.should_upload(data):
+                return self.upload(connection, data)
+        return geojson
@@ -29,12 +29,16 @@ class ImageCollectionClient(ImageCollection):
         self.node_id = node_id
         self.builder= builder
         self.session = session
-        self.graph = builder.processes
         self.metadata = metadata
 
     def __str__(self):
         return "ImageCollection: %s" % self.node_id
 
+    @property
+    def graph(self) -> dict:
+        # Flat process graph dictionary, only built (by the graph builder) when needed.
+        return self.builder.processes
+
     @property
     def _api_version(self):
         return self.session.capabilities().api_version_check
@@ -280,7 +284,7 @@ class ImageCollectionClient(ImageCollection):
         else:
             new_builder = my_builder.copy()
             current_result = new_builder.find_result_node_id()
-            new_builder.processes[current_result]['result'] = False
+            new_builder.update_node(current_result)['result'] = False
             new_builder.add_process(operator, expression={'from_node': current_result},  result=True)
 
         return self._create_reduced_collection(new_builder, extend_previous_callback_graph)
@@ -320,19 +324,21 @@ class ImageCollectionClient(ImageCollection):
         return self._reduce_bands_binary_xy('lt',other)
 
     def _create_reduced_collection(self, callback_graph_builder, extend_previous_callback_graph):
+        # The callback graph builder is embedded as such (and only flattened when the process graph is built),
+        # so that a long chain of band math operations does not copy the callback graph at each step.
         if not extend_previous_callback_graph:
             # there was no previous reduce step
             args = {
                 'data': {'from_node': self.node_id},
                 'dimension': self.metadata.band_dimension.name,
                 'reducer': {
-                    'callback': callback_graph_builder.processes
+                    'callback': callback_graph_builder
                 }
             }
             return self.graph_add_process("reduce", args)
         else:
             process_graph_copy = self.builder.shallow_copy()
-            process_graph_copy.processes[self.node_id]['arguments']['reducer']['callback'] = callback_graph_builder.processes
+            process_graph_copy.update_node(self.node_id)['arguments']['reducer']['callback'] = callback_graph_builder
 
             # now current_node should be a reduce node, let's modify it
             # TODO: set metadata of reduced cube?
@@ -393,8 +399,10 @@ class ImageCollectionClient(ImageCollection):
         # callback is ready, now we need to properly set up the reduce process that will invoke it
         if my_builder is None and other_builder is None:
             # there was no previous reduce step, perhaps this is a cube merge?
-            # cube merge is happening when node id's differ, otherwise we can use regular reduce
-            if (self.node_id != other.node_id):
+            # cube merge is happening when the cubes differ, otherwise we can use regular reduce
+            if not self.builder.same_graph_data(
+                    {"from_node": self.node_id}, other.builder, {"from_node": other.node_id}
+            ):
                 # we're combining data from two different datacubes: http://api.openeo.org/v/0.4.0/processreference/#merge_cubes
 
                 # set result node id's first, to keep track
@@ -434,17 +442,17 @@ class ImageCollectionClient(ImageCollection):
                 }
                 return self.graph_add_process("reduce", args)
         else:
-            left_data_arg = self.builder.processes[self.node_id]["arguments"]["data"]
-            right_data_arg = other.builder.processes[other.node_id]["arguments"]["data"]
-            if left_data_arg != right_data_arg:
+            left_data_arg = self.builder.get_node(self.node_id)["arguments"]["data"]
+            right_data_arg = other.builder.get_node(other.node_id)["arguments"]["data"]
+            if not self.builder.same_graph_data(left_data_arg, other.builder, right_data_arg):
                 raise BandMathException("'Band math' between bands of different image collections is not supported yet.")
             node_id = self.node_id
             reducing_graph = self
-            if reducing_graph.graph[node_id]["process_id"] != "reduce":
+            if reducing_graph.builder.get_node(node_id)["process_id"] != "reduce":
                 node_id = other.node_id
                 reducing_graph = other
             new_builder = reducing_graph.builder.shallow_copy()
-            new_builder.processes[node_id]['arguments']['reducer']['callback'] = merged.processes
+            new_builder.update_node(node_id)['arguments']['reducer']['callback'] = merged
             # now current_node should be a reduce node, let's modify it
             # TODO: set metadata of reduced cube?
             return ImageCollectionClient(node_id, new_builder, reducing_graph.session)
@@ -467,7 +475,7 @@ class ImageCollectionClient(ImageCollection):
             else:
                 new_builder = my_builder.shallow_copy()
                 current_result = new_builder.find_result_node_id()
-                new_builder.processes[current_result]['result'] = False
+                new_builder.update_node(current_result)['result'] = False
                 new_builder.add_process(operator, x={'from_node': current_result}, y = other, result=True)
 
             return self._create_reduced_collection(new_builder, extend_previous_callback_graph)
@@ -487,16 +495,19 @@ class ImageCollectionClient(ImageCollection):
         else:
             current_result = my_builder.find_result_node_id()
             new_builder = my_builder.shallow_copy()
-            new_builder.processes[current_result]['result'] = False
+            new_builder.update_node(current_result)['result'] = False
             new_builder.add_process(operator, data=[{'from_node': current_result}, other], result=True)
 
         return self._create_reduced_collection(new_builder,extend_previous_callback_graph)
 
     def _get_band_graph_builder(self):
-        current_node = self.graph[self.node_id]
+        current_node = self.builder.get_node(self.node_id)
         if current_node["process_id"] == "reduce":
             # TODO: check "dimension" of "reduce" in some way?
             callback_graph = current_node["arguments"]["reducer"]["callback"]
+            if isinstance(callback_graph, GraphBuilder):
+                # Callback of previous band math operation: share its nodes.
+                return callback_graph.shallow_copy()
             return GraphBuilder.from_process_graph(callback_graph)
         return None
 
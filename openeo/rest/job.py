@@ -1,12 +1,19 @@
 import datetime
+import json
 import logging
+import re
+import threading
 import time
 import typing
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from requests import ConnectionError
-from typing import List, Union, Dict
+from typing import List, Union, Dict, Tuple
+
+import requests
 from deprecated import deprecated
+from requests import ConnectionError
+from requests.exceptions import ChunkedEncodingError
 
 from openeo.job import Job, JobResult, JobLogEntry
 from openeo.rest import OpenEoClientException, JobFailedException
@@ -87,24 +94,14 @@ class RESTJob(Job):
             # Best effort translation of on old style to "assets" style (#134)
             return {a["href"].split("/")[-1]: a for a in response["links"]}
 
-    def _download_url(self, url: str, path: Path):
-        ensure_dir(path.parent)
-        with path.open('wb') as handle:
-            # TODO: finetune download parameters/chunking?
-            response = self.connection.get(url, stream=True)
-            for block in response.iter_content(1024):
-                if not block:
-                    break
-                handle.write(block)
-        return path
-
-    def download_result(self, target: Union[str, Path] = None) -> Path:
+    def download_result(self, target: Union[str, Path] = None, downloader: 'ResultDownloader' = None) -> Path:
         """
         Download single job result to the target file path or into folder (current working dir by default).
         
         Fails if there are multiple result files.
 
         :param target: String or path where the file should be downloaded to.
+        :param downloader: (optional) download engine to use (e.g. with custom worker pool or chunk size)
         """
         assets = self._download_get_assets()
         if len(assets) != 1:
@@ -117,16 +114,20 @@ class RESTJob(Job):
         if target.is_dir():
             target = target / filename
 
-        self._download_url(url, target)
+        downloader = downloader or ResultDownloader(self.connection)
+        downloader.download({target: url})
         return target
 
-    def download_results(self, target: Union[str, Path] = None) -> Dict[Path, dict]:
+    def download_results(self, target: Union[str, Path] = None, downloader: 'ResultDownloader' = None) \
+            -> Dict[Path, dict]:
         """
         Download job results into given folder (current working dir by default).
 
         The names of the files are taken directly from the backend.
+        The result files are downloaded concurrently (see :py:class:`ResultDownloader`).
 
         :param target: String/path, folder where to put the result files.
+        :param downloader: (optional) download engine to use (e.g. with custom worker pool or chunk size)
         :return: file_list: Dict containing the downloaded file path as value and asset metadata
         """
         target = Path(target or Path.cwd())
@@ -137,8 +138,8 @@ class RESTJob(Job):
         if len(assets) == 0:
             raise OpenEoClientException("Expected at least one result file to download, but got 0.")
 
-        for path, metadata in assets.items():
-            self._download_url(metadata["href"], path)
+        downloader = downloader or ResultDownloader(self.connection)
+        downloader.download({path: metadata["href"] for path, metadata in assets.items()})
 
         return assets
 
@@ -224,3 +225,274 @@ class RESTJob(Job):
             ), job=self)
 
         return self
+
+
+class DownloadStats:
+    """Thread-safe tally of downloaded bytes and files, to report aggregate throughput."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.files = 0
+        self.start_time = time.time()
+        self.end_time = None
+        self._lock = threading.Lock()
+
+    def add_bytes(self, count: int):
+        with self._lock:
+            self.bytes += count
+
+    def add_file(self):
+        with self._lock:
+            self.files += 1
+
+    def finish(self) -> 'DownloadStats':
+        self.end_time = time.time()
+        return self
+
+    @property
+    def elapsed(self) -> float:
+        """Elapsed time in seconds."""
+        return (self.end_time or time.time()) - self.start_time
+
+    @property
+    def throughput(self) -> float:
+        """Aggregate throughput in bytes per second."""
+        return self.bytes / max(self.elapsed, 1e-6)
+
+    def __str__(self):
+        return "{f} files, {b} bytes in {t:.2f}s ({r:.2f} MB/s)".format(
+            f=self.files, b=self.bytes, t=self.elapsed, r=self.throughput / 1e6
+        )
+
+
+class ResultDownloader:
+    """
+    Download engine for (batch job result) assets.
+
+    - assets are fetched concurrently with a pool of worker threads
+    - response bodies are read in large chunks
+    - big assets (when the server supports HTTP Range requests) are split in parts that are fetched concurrently
+    - a dropped connection is resumed with a Range request from the last received byte
+    - an interrupted download leaves a ``.part`` file that will be resumed on the next attempt
+      (validated with the ETag/Last-Modified and size of the original response, recorded in a ``.part.json`` file)
+
+    Usage example:
+
+    >>> downloader = ResultDownloader(connection, max_workers=8)
+    >>> job.download_results("results/", downloader=downloader)
+    """
+
+    # Size of blocks to read from response streams (in bytes)
+    DEFAULT_CHUNK_SIZE = 1024 * 1024
+    # Size of HTTP Range request parts to split big assets in (in bytes)
+    DEFAULT_PART_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, connection: 'Connection', max_workers: int = 4, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 part_size: int = DEFAULT_PART_SIZE, max_retries: int = 3, retry_interval: float = 5):
+        """
+        :param connection: connection to do the (authenticated) requests with
+        :param max_workers: maximum number of concurrent requests
+        :param chunk_size: size of blocks to read from a response stream
+        :param part_size: size of the Range request parts to split big assets in
+        :param max_retries: maximum number of retries (per asset or part) after a connection error
+        :param retry_interval: number of seconds to wait before resuming after a connection error
+        """
+        self.connection = connection
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.part_size = part_size
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+
+    def download(self, downloads: Dict[Path, str]) -> DownloadStats:
+        """
+        Download given urls to given paths.
+
+        :param downloads: dictionary mapping target path to url
+        :return: download statistics (e.g. aggregate throughput)
+        """
+        stats = DownloadStats()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            # First request of each asset also detects whether it should be split in parts.
+            starts = {
+                pool.submit(self._download_start, url=url, path=Path(path), stats=stats): (Path(path), url)
+                for path, url in downloads.items()
+            }
+            transfers = []
+            for future in as_completed(starts):
+                path, url = starts[future]
+                temp_path, ranges = future.result()
+                parts = [
+                    pool.submit(self._fetch, url=url, path=temp_path, start=start, end=end, stats=stats)
+                    for (start, end) in ranges
+                ]
+                transfers.append((path, temp_path, parts))
+            for path, temp_path, parts in transfers:
+                for part in parts:
+                    part.result()
+                temp_path.replace(path)
+                self._remove_part_info(path)
+                stats.add_file()
+        logger.info("Downloaded {s}".format(s=stats.finish()))
+        return stats
+
+    def _download_start(self, url: str, path: Path, stats: DownloadStats) -> Tuple[Path, List[Tuple[int, int]]]:
+        """
+        Start downloading given url: resume a partial download, do a full download
+        or fetch first part of a big asset.
+
+        :return: tuple: temp path to download to and list of (start, end) byte ranges that remain to be fetched
+        """
+        ensure_dir(path.parent)
+        partial = path.with_name(path.name + ".part")
+        if partial.exists() and partial.stat().st_size > 0:
+            if self._resume(url=url, path=path, partial=partial, stats=stats):
+                return partial, []
+
+        response = self._get(url, start=0, end=self.part_size - 1)
+        total = self._get_content_range_total(response) if response.status_code == 206 else None
+        if response.status_code == 206 and total is None:
+            # Unknown total size: fall back on a plain full download.
+            response.close()
+            response = self._get(url)
+        if total is None or total <= self.part_size:
+            if total is None and "Content-Length" in response.headers:
+                total = int(response.headers["Content-Length"])
+            self._write_part_info(path, response=response, total=total)
+            self._fetch(url=url, path=partial, start=0, response=response, stats=stats)
+            return partial, []
+
+        # Big asset: fetch the remaining parts concurrently (in a separate temp file that is not resumable).
+        parts = path.with_name(path.name + ".parts")
+        with parts.open("wb") as f:
+            f.truncate(total)
+        self._fetch(url=url, path=parts, start=0, end=self.part_size - 1, response=response, stats=stats)
+        ranges = [(s, min(s + self.part_size, total) - 1) for s in range(self.part_size, total, self.part_size)]
+        return parts, ranges
+
+    def _resume(self, url: str, path: Path, partial: Path, stats: DownloadStats) -> bool:
+        """
+        Try to resume the download of given url to existing (non-empty) partial file.
+
+        :return: whether the download was resumed (or already complete),
+            False if the partial file does not match the current content (and was discarded).
+        """
+        offset = partial.stat().st_size
+        info = self._read_part_info(path)
+        if_range = info.get("etag") or info.get("last_modified")
+        logger.info("Resuming download of {u} to {p} from byte {o}".format(u=url, p=partial, o=offset))
+        response = self._get(url, start=offset, if_range=if_range, check_error=False)
+        start, total = self._get_content_range(response)
+        if response.status_code >= 400 and response.status_code != 416:
+            self.connection._raise_api_error(response)
+        if response.status_code == 416:
+            # Nothing left to fetch: partial file is complete if it has the expected size.
+            response.close()
+            if total == offset and info.get("total", offset) == offset:
+                return True
+        elif response.status_code == 206:
+            if start == offset and (total is None or info.get("total", total) == total):
+                self._fetch(url=url, path=partial, start=offset, response=response, stats=stats)
+                return True
+            response.close()
+        else:
+            # Full content (e.g. If-Range validator did not match): start over with it.
+            self._write_part_info(path, response=response, total=info.get("total"))
+            self._fetch(url=url, path=partial, start=offset, response=response, stats=stats)
+            return True
+        logger.warning("Partial download {p} does not match {u}: restarting from scratch".format(p=partial, u=url))
+        partial.unlink()
+        self._remove_part_info(path)
+        return False
+
+    @staticmethod
+    def _part_info_path(path: Path) -> Path:
+        return path.with_name(path.name + ".part.json")
+
+    def _write_part_info(self, path: Path, response: requests.Response, total: Union[int, None]):
+        """Record validators of the response that is downloaded to the partial file, to resume it later."""
+        info = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "total": total,
+        }
+        with self._part_info_path(path).open("w") as f:
+            json.dump({k: v for k, v in info.items() if v is not None}, f)
+
+    def _read_part_info(self, path: Path) -> dict:
+        try:
+            with self._part_info_path(path).open("r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _remove_part_info(self, path: Path):
+        info_path = self._part_info_path(path)
+        if info_path.exists():
+            info_path.unlink()
+
+    def _get(self, url: str, start: int = 0, end: int = None, if_range: str = None,
+             check_error: bool = True) -> requests.Response:
+        """Do streaming GET request, using a Range header (and optional If-Range validator) if necessary."""
+        headers = None
+        if start > 0 or end is not None:
+            headers = {"Range": "bytes={s}-{e}".format(s=start, e="" if end is None else end)}
+            if if_range:
+                headers["If-Range"] = if_range
+        return self.connection.get(url, stream=True, headers=headers, check_error=check_error)
+
+    @staticmethod
+    def _get_content_range(response: requests.Response) -> Tuple[Union[int, None], Union[int, None]]:
+        """
+        Extract start and total size from a "Content-Range: bytes 0-99/1234"
+        (or "Content-Range: bytes */1234") header (if any).
+        """
+        match = re.match(r"bytes\s+(?:(\d+)-\d+|\*)/(\d+)", response.headers.get("Content-Range", ""))
+        if not match:
+            return None, None
+        return (int(match.group(1)) if match.group(1) else None), int(match.group(2))
+
+    @classmethod
+    def _get_content_range_total(cls, response: requests.Response) -> Union[int, None]:
+        """Extract total size from a "Content-Range: bytes 0-99/1234" header (if any)."""
+        return cls._get_content_range(response)[1]
+
+    def _fetch(self, url: str, path: Path, start: int = 0, end: int = None, response: requests.Response = None,
+               stats: DownloadStats = None) -> int:
+        """
+        Fetch bytes `start` to `end` (inclusive, or till end of content if None) of given url
+        and write them to given file at same offset.
+        After a dropped connection, the transfer is resumed with a Range request from the last received byte.
+
+        :param response: (optional) already started response for the first attempt
+        :return: position in the file after the last written byte
+        """
+        position = start
+        retries = 0
+        while True:
+            try:
+                if response is None:
+                    response = self._get(url, start=position, end=end)
+                if position > 0 and response.status_code == 200:
+                    if end is not None:
+                        raise OpenEoClientException("Server does not support range requests for {u}".format(u=url))
+                    logger.warning("Server ignored range request for {u}: restarting from scratch".format(u=url))
+                    position = 0
+                mode = "wb" if (position == 0 and end is None) or not path.exists() else "r+b"
+                with path.open(mode) as f:
+                    f.seek(position)
+                    for block in response.iter_content(self.chunk_size):
+                        f.write(block)
+                        position += len(block)
+                        if stats:
+                            stats.add_bytes(len(block))
+                return position
+            except (ConnectionError, ChunkedEncodingError) as e:
+                retries += 1
+                if retries > self.max_retries:
+                    raise
+                logger.warning("Download of {u} interrupted at byte {p} ({e!r}): resuming (retry {r})".format(
+                    u=url, p=position, e=e, r=retries
+                ))
+                time.sleep(self.retry_interval)
+                response = None
@@ -0,0 +1,258 @@
+"""
+Scheduler to track many batch jobs from a single polling loop.
+"""
+
+import logging
+import threading
+import time
+import typing
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+from requests import ConnectionError
+
+from openeo.rest import JobFailedException
+from openeo.rest.job import RESTJob
+
+if hasattr(typing, 'TYPE_CHECKING') and typing.TYPE_CHECKING:
+    # Only import this for type hinting purposes. Runtime import causes circular dependency issues.
+    # Note: the `hasattr` check is necessary for Python versions before 3.5.2.
+    from openeo.rest.connection import Connection
+
+logger = logging.getLogger(__name__)
+
+# Job statuses that still can change.
+_ACTIVE_STATUSES = {'submitted', 'created', 'queued', 'running'}
+
+
+class RateLimiter:
+    """
+    Simple request rate budget: allow at most `max_per_minute` requests per minute
+    by enforcing a minimum time interval between consecutive requests.
+    """
+
+    def __init__(self, max_per_minute: float = None, sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.time):
+        self._interval = 60.0 / max_per_minute if max_per_minute else 0
+        self._sleep = sleep
+        self._clock = clock
+        self._next = None
+
+    def acquire(self):
+        """Block until a next request is allowed."""
+        now = self._clock()
+        if self._next is not None and now < self._next:
+            self._sleep(self._next - now)
+            now = self._next
+        self._next = now + self._interval
+
+
+class _TrackedJob:
+    """Book-keeping of a job tracked by a :py:class:`JobPool`."""
+
+    def __init__(self, job: RESTJob, start: bool, callback: Callable[[RESTJob, dict], None] = None):
+        self.job = job
+        self.to_start = start
+        self.callback = callback
+        self.future = Future()
+        self.status = None
+
+
+class JobPool:
+    """
+    Track (and optionally start) many batch jobs from a single scheduler,
+    instead of a `start_and_wait` polling loop (and thread) per job.
+
+    - status checks are batched: one ``GET /jobs`` listing covers all tracked jobs of the user
+      (jobs that are missing from the listing are checked individually with ``GET /jobs/{job_id}``)
+    - polling uses a shared adaptive backoff: fast polling after status changes, slower polling otherwise
+    - all requests share a global request rate budget
+    - a :py:class:`concurrent.futures.Future` (and optional callback) is resolved when a job finishes or fails
+
+    Usage example:
+
+    >>> pool = JobPool(connection, max_requests_per_minute=30)
+    >>> futures = [pool.add(cube.send_job(), start=True) for cube in cubes]
+    >>> pool.run()
+    >>> for future in futures:
+    ...     future.result().download_results("results/")
+    """
+
+    def __init__(self, connection: 'Connection', min_poll_interval: float = 5, max_poll_interval: float = 60,
+                 max_requests_per_minute: float = 60, use_job_listing: bool = True,
+                 sleep: Callable[[float], None] = time.sleep, clock: Callable[[], float] = time.time):
+        """
+        :param connection: connection to the backend
+        :param min_poll_interval: number of seconds to wait between polls after a status change
+        :param max_poll_interval: maximum number of seconds to wait between polls (when nothing changes)
+        :param max_requests_per_minute: global budget of requests (start, listing or status requests)
+        :param use_job_listing: whether to check job statuses in batch with the ``GET /jobs`` listing
+        """
+        self.connection = connection
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.use_job_listing = use_job_listing
+        self._poll_interval = min_poll_interval
+        self._rate_limiter = RateLimiter(max_per_minute=max_requests_per_minute, sleep=sleep, clock=clock)
+        self._sleep = sleep
+        self._clock = clock
+        self._jobs = {}  # type: Dict[str, _TrackedJob]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, job: RESTJob, start: bool = False, callback: Callable[[RESTJob, dict], None] = None) -> Future:
+        """
+        Add a job to track.
+
+        :param job: batch job to track
+        :param start: whether the job should be started by the pool
+        :param callback: function to call with job and final job info when the job finishes or fails
+        :return: future that resolves to the job when finished
+            (or raises :py:class:`JobFailedException` when the job failed,
+            or the original error when the job could not be started or its status could not be retrieved)
+        """
+        tracked = _TrackedJob(job=job, start=start, callback=callback)
+        with self._lock:
+            self._jobs[job.job_id] = tracked
+        return tracked.future
+
+    @property
+    def active_jobs(self) -> List[RESTJob]:
+        with self._lock:
+            return [t.job for t in self._jobs.values()]
+
+    def run(self, timeout: float = None):
+        """
+        Poll (in current thread) until all tracked jobs are finished (or failed).
+
+        :param timeout: maximum number of seconds to wait
+        """
+        start = self._clock()
+        while self._jobs and not self._stop.is_set():
+            self.poll()
+            if not self._jobs:
+                break
+            if timeout is not None and self._clock() - start + self._poll_interval > timeout:
+                raise TimeoutError("{c} jobs still active after {t}s".format(c=len(self._jobs), t=timeout))
+            self._sleep(self._poll_interval)
+
+    def start(self) -> threading.Thread:
+        """Start polling in a background (daemon) thread, until `stop()` is called."""
+
+        def loop():
+            while not self._stop.is_set():
+                if self._jobs:
+                    try:
+                        self.poll()
+                    except Exception:
+                        # Keep polling: the other jobs should not be abandoned.
+                        logger.exception("Failure while polling jobs")
+                self._stop.wait(self._poll_interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Stop background polling."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def poll(self):
+        """Do a single round of starting new jobs and checking the status of all tracked jobs."""
+        with self._lock:
+            tracked = list(self._jobs.values())
+        changed = False
+        for t in tracked:
+            if t.to_start:
+                self._rate_limiter.acquire()
+                try:
+                    t.job.start_job()
+                except ConnectionError as e:
+                    # Transient: retry at next poll.
+                    logger.warning("Connection error while starting job {i!r}: {e}".format(i=t.job.job_id, e=e))
+                    continue
+                except Exception as e:
+                    logger.error("Failed to start job {i!r}: {e!r}".format(i=t.job.job_id, e=e))
+                    self._fail(t, e)
+                else:
+                    t.to_start = False
+                changed = True
+
+        tracked = [t for t in tracked if not t.future.done()]
+        job_infos = self._get_job_infos(tracked)
+
+        for t in tracked:
+            job_info = job_infos.get(t.job.job_id)
+            if job_info is None:
+                continue
+            status = job_info.get("status", "N/A")
+            if status != t.status:
+                logger.info("Job {i!r}: {s} (progress {p})".format(
+                    i=t.job.job_id, s=status,
+                    p='{p}%'.format(p=job_info["progress"]) if "progress" in job_info else "N/A"
+                ))
+                t.status = status
+                changed = True
+            if status not in _ACTIVE_STATUSES:
+                self._resolve(t, job_info)
+
+        # Adaptive backoff, shared by all jobs.
+        if changed:
+            self._poll_interval = self.min_poll_interval
+        else:
+            self._poll_interval = min(1.25 * self._poll_interval, self.max_poll_interval)
+
+    def _get_job_infos(self, tracked: List[_TrackedJob]) -> Dict[str, dict]:
+        """Get job info (status) of given jobs, preferably with a single job listing request."""
+        job_infos = {}
+        if self.use_job_listing:
+            self._rate_limiter.acquire()
+            try:
+                job_infos = {j["id"]: j for j in self.connection.list_jobs() if "id" in j}
+            except Exception as e:
+                logger.warning("Failed to list jobs (checking jobs individually): {e!r}".format(e=e))
+        for t in tracked:
+            info = job_infos.get(t.job.job_id)
+            if info is None or "status" not in info:
+                # Fallback for jobs missing in listing (e.g. due to pagination) or listings without status.
+                self._rate_limiter.acquire()
+                try:
+                    job_infos[t.job.job_id] = t.job.describe_job()
+                except ConnectionError as e:
+                    # Transient: retry at next poll.
+                    logger.warning("Connection error while querying status of job {i!r}: {e}".format(
+                        i=t.job.job_id, e=e))
+                    job_infos.pop(t.job.job_id, None)
+                except Exception as e:
+                    logger.error("Failed to get status of job {i!r}: {e!r}".format(i=t.job.job_id, e=e))
+                    job_infos.pop(t.job.job_id, None)
+                    self._fail(t, e)
+        return job_infos
+
+    def _fail(self, tracked: _TrackedJob, error: Exception):
+        """Stop tracking given job and pass given error to its future."""
+        with self._lock:
+            self._jobs.pop(tracked.job.job_id, None)
+        tracked.future.set_exception(error)
+
+    def _resolve(self, tracked: _TrackedJob, job_info: dict):
+        with self._lock:
+            del self._jobs[tracked.job.job_id]
+        if tracked.callback:
+            try:
+                tracked.callback(tracked.job, job_info)
+            except Exception:
+                logger.exception("Failure in callback of job {i!r}".format(i=tracked.job.job_id))
+        if job_info.get("status") == "finished":
+            tracked.future.set_result(tracked.job)
+        else:
+            tracked.future.set_exception(JobFailedException(
+                "Batch job {i} didn't finish properly. Status: {s}.".format(
+                    i=tracked.job.job_id, s=job_info.get("status")
+                ), job=tracked.job
+            ))
@@ -0,0 +1,123 @@
+"""
+Persistent index of parsed collection metadata, to avoid re-fetching and re-parsing
+collection metadata in each (short-lived) client process.
+"""
+
+import contextlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterator, Union
+
+from openeo.metadata import CollectionMetadata, dimension_from_dict
+from openeo.util import ensure_dir
+
+_log = logging.getLogger(__name__)
+
+
+class CollectionMetadataIndex:
+    """
+    SQLite backed store of collection metadata, keyed by backend URL, user and collection id
+    (metadata of private collections, or user specific metadata, is not shared between users).
+
+    Next to the original metadata document, the parsed dimensions
+    (including band name/common name lookup maps) are stored,
+    so that loading from the index skips the dimension parsing.
+    SQLite handles locking, so the index can be shared between processes.
+    """
+
+    DEFAULT_PATH = Path("~/.cache/openeo-python-client/collection_metadata.sqlite")
+
+    # Function that returns current time (overridable for unit tests)
+    _now = time.time
+
+    def __init__(self, path: Union[str, Path] = None, ttl: float = 24 * 3600, timeout: float = 10):
+        """
+        :param path: path of the SQLite database file
+        :param ttl: time-to-live of index entries (in seconds)
+        :param timeout: number of seconds to wait for a database lock held by another process
+        """
+        self.path = Path(path or self.DEFAULT_PATH).expanduser()
+        self.ttl = ttl
+        self.timeout = timeout
+        ensure_dir(self.path.parent)
+        with self._transaction() as db:
+            columns = [row[1] for row in db.execute("PRAGMA table_info(collections)")]
+            if columns and "user" not in columns:
+                # Index from an older version (without user column): just start over.
+                db.execute("DROP TABLE collections")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS collections ("
+                " backend TEXT NOT NULL, user TEXT NOT NULL, collection_id TEXT NOT NULL, timestamp REAL NOT NULL,"
+                " metadata TEXT NOT NULL, dimensions TEXT NOT NULL,"
+                " PRIMARY KEY (backend, user, collection_id))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Short lived connection per operation: sqlite3 connections can not be shared between threads.
+        return sqlite3.connect(str(self.path), timeout=self.timeout)
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Connection with a transaction (committed on success, rolled back on error), closed afterwards.
+        (Note that a `sqlite3.Connection` context manager only handles the transaction, it does not close.)
+        """
+        with contextlib.closing(self._connect()) as db:
+            with db:
+                yield db
+
+    def get(self, backend: str, collection_id: str, user: str = None) -> Union[CollectionMetadata, None]:
+        """
+        Get (non-expired) collection metadata from the index (or None).
+
+        :param user: identity of the authenticated user (None for anonymous access)
+        """
+        try:
+            with self._transaction() as db:
+                row = db.execute(
+                    "SELECT timestamp, metadata, dimensions FROM collections"
+                    " WHERE backend = ? AND user = ? AND collection_id = ?",
+                    (backend, user or "", collection_id)
+                ).fetchone()
+        except sqlite3.Error:
+            _log.warning("Failed to query collection metadata index {p}".format(p=self.path), exc_info=True)
+            return None
+        if row is None:
+            return None
+        timestamp, metadata, dimensions = row
+        if self._now() - timestamp >= self.ttl:
+            return None
+        return CollectionMetadata(
+            metadata=json.loads(metadata),
+            dimensions=[dimension_from_dict(d) for d in json.loads(dimensions)]
+        )
+
+    def set(self, backend: str, collection_id: str, metadata: CollectionMetadata, user: str = None):
+        """
+        Store collection metadata in the index.
+
+        :param user: identity of the authenticated user (None for anonymous access)
+        """
+        try:
+            with self._transaction() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO collections VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        backend, user or "", collection_id, self._now(),
+                        json.dumps(metadata.get()),
+                        json.dumps([d.to_dict() for d in metadata.dimensions]),
+                    )
+                )
+        except sqlite3.Error:
+            _log.warning("Failed to update collection metadata index {p}".format(p=self.path), exc_info=True)
+
+    def invalidate(self, backend: str = None):
+        """Remove all entries (of given backend, or all backends), for all users."""
+        with self._transaction() as db:
+            if backend is None:
+                db.execute("DELETE FROM collections")
+            else:
+                db.execute("DELETE FROM collections WHERE backend = ?", (backend,))
@@ -0,0 +1,270 @@
+"""
+Partitioned execution of synchronous requests: split a process graph in smaller partitions
+(e.g. spatial tiles, temporal chunks or geometry chunks) and execute these concurrently, with retries.
+"""
+
+import collections
+import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, Tuple, TypeVar, Union
+
+import requests
+import urllib3.exceptions
+
+from openeo.internal.graph_building import PGNode
+from openeo.internal.graph_optimizer import rewrite_graph, clone_with_arguments, intersect_spatial_extent, \
+    intersect_temporal_extent
+from openeo.rest import OpenEoClientException
+from openeo.util import date_to_rfc3339
+
+_log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Spatial tile: row and column in tile grid and bounding box dictionary
+Tile = collections.namedtuple("Tile", ["row", "col", "extent"])
+
+
+def split_spatial_extent(extent: dict, tile_size: Union[float, Sequence[float]]) -> List[Tile]:
+    """
+    Split a bounding box in a grid of tiles.
+
+    :param extent: bounding box dictionary (with "west", "south", "east", "north" and optionally "crs")
+    :param tile_size: size of a tile (in units of the extent CRS), or (width, height) tuple
+    :return: list of tiles (row by row, from north to south, west to east)
+    """
+    width, height = (tile_size, tile_size) if isinstance(tile_size, (int, float)) else tile_size
+    if width <= 0 or height <= 0:
+        raise ValueError("Invalid tile size {s!r}".format(s=tile_size))
+    west, south, east, north = (extent[k] for k in ["west", "south", "east", "north"])
+    tiles = []
+    row = 0
+    top = north
+    while top > south:
+        bottom = max(top - height, south)
+        col = 0
+        left = west
+        while left < east:
+            right = min(left + width, east)
+            tile_extent = dict(west=left, south=bottom, east=right, north=top)
+            if "crs" in extent:
+                tile_extent["crs"] = extent["crs"]
+            tiles.append(Tile(row=row, col=col, extent=tile_extent))
+            left = right
+            col += 1
+        top = bottom
+        row += 1
+    return tiles
+
+
+def _parse_date(d: str) -> Union[datetime.date, datetime.datetime]:
+    for fmt, convert in [("%Y-%m-%d", lambda x: x.date()), ("%Y-%m-%dT%H:%M:%SZ", lambda x: x)]:
+        try:
+            return convert(datetime.datetime.strptime(d, fmt))
+        except ValueError:
+            pass
+    raise ValueError("Unsupported date format: {d!r}".format(d=d))
+
+
+def split_temporal_extent(extent: Sequence[str], chunk_size: Union[int, datetime.timedelta]) -> List[List[str]]:
+    """
+    Split a (start inclusive, end exclusive) temporal extent in consecutive chunks.
+
+    :param extent: pair of start and end date (e.g. "2019-01-01") or date-time (e.g. "2019-01-01T00:00:00Z")
+    :param chunk_size: size of a chunk, as number of days or timedelta
+    :return: list of temporal extents
+    """
+    if not isinstance(chunk_size, datetime.timedelta):
+        chunk_size = datetime.timedelta(days=chunk_size)
+    if chunk_size <= datetime.timedelta(0):
+        raise ValueError("Invalid chunk size {s!r}".format(s=chunk_size))
+    start, end = (_parse_date(d) for d in extent)
+    if type(start) != type(end) or chunk_size % datetime.timedelta(days=1):
+        start, end = (d if isinstance(d, datetime.datetime) else datetime.datetime.combine(d, datetime.time())
+                      for d in (start, end))
+    chunks = []
+    while start < end:
+        chunk_end = min(start + chunk_size, end)
+        chunks.append([date_to_rfc3339(start), date_to_rfc3339(chunk_end)])
+        start = chunk_end
+    return chunks
+
+
+def split_geometries(geometries: dict, chunk_size: int) -> List[dict]:
+    """
+    Split a GeoJSON GeometryCollection or FeatureCollection in collections of at most `chunk_size` items.
+    """
+    key = {"GeometryCollection": "geometries", "FeatureCollection": "features"}.get(geometries.get("type"))
+    if key is None:
+        raise OpenEoClientException("Can not split geometries of type {t!r}".format(t=geometries.get("type")))
+    items = geometries[key]
+    return [
+        dict(geometries, **{key: items[i:i + chunk_size]})
+        for i in range(0, len(items), chunk_size)
+    ]
+
+
+def find_process_argument(pg: PGNode, process_id: str, argument: str):
+    """
+    Get the (common) value of given argument (e.g. "spatial_extent") of the nodes
+    with given process id (e.g. "load_collection") in a graph.
+    Returns None if not set, raises exception when these nodes have different values.
+    """
+    values = []
+
+    def collect(node: PGNode, original: PGNode) -> PGNode:
+        if node.process_id == process_id and node.arguments.get(argument) not in values:
+            values.append(node.arguments.get(argument))
+        return node
+
+    rewrite_graph(pg, collect)
+    if len(values) > 1:
+        raise OpenEoClientException("Multiple values for {a!r} in {p} nodes: {v!r}".format(
+            a=argument, p=process_id, v=values
+        ))
+    return values[0] if values else None
+
+
+# load_collection extent argument to filter process (and extent intersection function) that can narrow it down.
+_EXTENT_FILTERS = {
+    "spatial_extent": ("filter_bbox", intersect_spatial_extent),
+    "temporal_extent": ("filter_temporal", intersect_temporal_extent),
+}
+
+
+def find_extent(pg: PGNode, argument: str):
+    """
+    Get the (common) extent (`argument`: "spatial_extent" or "temporal_extent") of the `load_collection` nodes
+    in a graph, narrowed down by the extent of `filter_bbox`/`filter_temporal` nodes
+    (which are not pushed down into `load_collection` when the graph is not optimized).
+    """
+    extent = find_process_argument(pg, "load_collection", argument)
+    filter_process, intersect = _EXTENT_FILTERS[argument]
+    filter_extent = find_process_argument(pg, filter_process, "extent")
+    if filter_extent is not None:
+        extent = intersect(extent, filter_extent) or extent
+    return extent
+
+
+def restrict_load_collections(pg: PGNode, spatial_extent: dict = None, temporal_extent: list = None) -> PGNode:
+    """
+    Restrict the spatial and/or temporal extent of all `load_collection` nodes in a graph
+    (intersecting with their current extent).
+    """
+
+    def restrict(node: PGNode, original: PGNode) -> PGNode:
+        if node.process_id != "load_collection":
+            return node
+        arguments = dict(node.arguments)
+        for argument, extent, intersect in [
+            ("spatial_extent", spatial_extent, intersect_spatial_extent),
+            ("temporal_extent", temporal_extent, intersect_temporal_extent),
+        ]:
+            if extent is not None:
+                arguments[argument] = intersect(arguments.get(argument), extent)
+                if arguments[argument] is None:
+                    raise OpenEoClientException("Can not restrict {a} {e!r} of load_collection".format(
+                        a=argument.replace("_", " "), e=node.arguments.get(argument)
+                    ))
+        return clone_with_arguments(node, arguments)
+
+    return rewrite_graph(pg, restrict)
+
+
+def replace_aggregate_spatial_geometries(pg: PGNode, geometries: dict) -> PGNode:
+    """Replace the geometries of the `aggregate_spatial` nodes in a graph."""
+
+    def replace(node: PGNode, original: PGNode) -> PGNode:
+        if node.process_id != "aggregate_spatial":
+            return node
+        return clone_with_arguments(node, dict(node.arguments, geometries=geometries))
+
+    return rewrite_graph(pg, replace)
+
+
+def merge_timeseries(parts: List[Tuple[int, dict]], polygon_counts: List[int]) -> dict:
+    """
+    Merge partial timeseries results (as returned by `aggregate_spatial`: mapping of date to list of polygon data)
+    of temporal and geometry chunks.
+
+    :param parts: list of (geometry chunk index, timeseries) tuples
+    :param polygon_counts: number of polygons in each geometry chunk
+    :return: merged timeseries (polygons ordered by geometry chunk)
+    """
+    merged = collections.OrderedDict()
+    for chunk_index, timeseries in parts:
+        for date, polygon_data in timeseries.items():
+            chunks = merged.setdefault(date, [None] * len(polygon_counts))
+            if chunks[chunk_index] is None:
+                chunks[chunk_index] = polygon_data
+    return {
+        date: [
+            band_data
+            for chunk_index, polygon_data in enumerate(chunks)
+            for band_data in (polygon_data if polygon_data is not None else [[]] * polygon_counts[chunk_index])
+        ]
+        for date, chunks in merged.items()
+    }
+
+
+def is_retryable(error: Exception) -> bool:
+    """Is given request error worth a retry (connection problems, time outs, server side errors)?"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return True
+    # Errors while streaming a response (e.g. reading `response.raw`) are raised by urllib3 directly.
+    if isinstance(error, (urllib3.exceptions.ProtocolError, urllib3.exceptions.ReadTimeoutError)):
+        return True
+    status = getattr(error, "http_status_code", None)
+    return isinstance(error, OpenEoClientException) and status is not None and (status >= 500 or status == 429)
+
+
+def run_partitioned(
+        func: Callable[[T], R], partitions: Sequence[T], max_workers: int = 4, max_retries: int = 3,
+        retry_interval: float = 5, sleep: Callable[[float], None] = time.sleep
+) -> List[R]:
+    """
+    Call given function for each partition concurrently (with bounded parallelism),
+    retrying failed partitions (on retryable errors).
+
+    :return: list of results (in same order as partitions)
+    """
+
+    def call(partition: T) -> R:
+        attempt = 0
+        while True:
+            try:
+                return func(partition)
+            except Exception as e:
+                attempt += 1
+                if attempt > max_retries or not is_retryable(e):
+                    raise
+                _log.warning("Partition {p!r} failed (attempt {a}/{m}): {e!r}. Retrying.".format(
+                    p=partition, a=attempt, m=max_retries, e=e
+                ))
+                sleep(retry_interval * attempt)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(call, partitions))
+
+
+def mosaic_tiles(paths: List[str], outputfile: str):
+    """
+    Merge GeoTIFF tiles into a single GeoTIFF file.
+
+    Requires the `rasterio` package.
+    """
+    import rasterio
+    import rasterio.merge
+    datasets = [rasterio.open(str(p)) for p in paths]
+    try:
+        mosaic, transform = rasterio.merge.merge(datasets)
+        profile = datasets[0].profile
+        profile.update(height=mosaic.shape[1], width=mosaic.shape[2], transform=transform)
+        with rasterio.open(str(outputfile), "w", **profile) as dst:
+            dst.write(mosaic)
+    finally:
+        for ds in datasets:
+            ds.close()
@@ -1,37 +1,105 @@
-
 from openeo.file import File
-import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, IO, Iterator, Union
 import os
+import pathlib
+
+# Progress callback: called with number of bytes transferred so far and total size (None if unknown)
+ProgressCallback = Callable[[int, Union[int, None]], None]
+
+# Size of blocks to read from files and response streams (in bytes)
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class _ChunkedReader:
+    """
+    File-like wrapper to stream an upload in chunks of given size (reporting progress),
+    with a known length (so that a Content-Length header can be sent instead of chunked transfer encoding).
+    """
+
+    def __init__(self, f: IO[bytes], size: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 progress: ProgressCallback = None):
+        self._f = f
+        self._size = size
+        self._chunk_size = chunk_size
+        self._progress = progress
+        self._done = 0
+
+    def __len__(self):
+        return self._size - self._done
+
+    def read(self, size: int = -1) -> bytes:
+        # Ignore the (small) block size of the HTTP library and read in bigger chunks.
+        data = self._f.read(self._chunk_size)
+        self._done += len(data)
+        if self._progress and data:
+            self._progress(self._done, self._size)
+        return data
 
 
 class RESTFile(File):
     """Represents a file of openeo."""
 
-    def download_file(self, target):
+    def _api_path(self) -> str:
+        # Legacy (0.4) API style: GET /files/{user_id}/{path}, 1.0 API style: GET /files/{path}
+        userid = getattr(self.connection, "userid", None)
+        if userid:
+            return "/files/{}/{}".format(userid, self.path)
+        return "/files/{}".format(self.path)
+
+    def iter_content(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
         """
-        Downloads a user file to the back end.
-        :param target: local path, where the file should be saved.
-        :return: status: Response status code
+        Stream the content of a user file from the back end, in chunks of given size.
         """
-        # GET /files/{user_id}/{path}
-
-        path = "/files/{}/{}".format(self.connection.userid, self.path)
+        resp = self.connection.get(self._api_path(), stream=True)
+        try:
+            yield from resp.iter_content(chunk_size=chunk_size)
+        finally:
+            resp.close()
 
-        resp = self.connection.get(path, stream=True)
+    def download_file(self, target, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: ProgressCallback = None):
+        """
+        Downloads a user file from the back end.
+        The file is streamed to disk in chunks, it is never fully held in memory.
 
-        if resp.status_code == 200:
+        :param target: local path, where the file should be saved.
+        :param chunk_size: size (in bytes) of the chunks to read from the response
+        :param progress: (optional) callback, called with number of bytes downloaded so far and total size
+        :return: status: Response status code
+        """
+        resp = self.connection.get(self._api_path(), stream=True)
+        try:
+            if resp.status_code != 200:
+                return resp.status_code
+            total = int(resp.headers["Content-Length"]) if "Content-Length" in resp.headers else None
+            done = 0
             with open(target, 'wb') as f:
-                shutil.copyfileobj(resp.raw, f)
-            return resp.status_code
-        else:
+                for chunk in resp.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    done += len(chunk)
+                    if progress:
+                        progress(done, total)
             return resp.status_code
+        finally:
+            resp.close()
 
-    def upload_file(self, source):
+    def upload_file(self, source: Union[str, pathlib.Path, IO[bytes]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    progress: ProgressCallback = None):
         """
         Uploads a user file to the back end.
-        :param source: Local path to the file that should be uploaded.
+        The file is streamed from disk in chunks, it is never fully held in memory.
+
+        :param source: Local path to the file that should be uploaded,
+            or a (seekable) binary file-like object (in which case the file path should be set)
+        :param chunk_size: size (in bytes) of the chunks to read from the source
+        :param progress: (optional) callback, called with number of bytes uploaded so far and total size
         :return: status: True if it was successful, False otherwise
         """
+        if hasattr(source, "read"):
+            if not self.path:
+                raise ValueError("A file path is required to upload a file-like object.")
+            return self._upload(source, chunk_size=chunk_size, progress=progress)
+
         if not os.path.isfile(source):
             return False
 
@@ -39,13 +107,17 @@ class RESTFile(File):
             self.path = os.path.basename(source)
 
         with open(source, 'rb') as f:
-            input_file = f.read()
+            return self._upload(f, chunk_size=chunk_size, progress=progress)
 
-        path = "/files/{}/{}".format(self.connection.userid, self.path)
+    def _upload(self, f: IO[bytes], chunk_size: int, progress: ProgressCallback = None):
+        start = f.tell()
+        size = f.seek(0, os.SEEK_END) - start
+        f.seek(start)
 
         content_type = {'Content-Type': 'application/octet-stream'}
 
-        resp = self.connection.put(path=path, headers=content_type, data=input_file)
+        body = _ChunkedReader(f, size=size, chunk_size=chunk_size, progress=progress)
+        resp = self.connection.put(path=self._api_path(), headers=content_type, data=body)
 
         return resp.status_code
 
@@ -59,3 +131,26 @@ class RESTFile(File):
         resp = self.connection.delete(path)
 
         return resp.status_code
+
+
+def upload_files(connection, files: Dict[str, Union[str, pathlib.Path]], max_workers: int = 4,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 progress: Callable[[str, int, Union[int, None]], None] = None) -> Dict[str, int]:
+    """
+    Upload multiple user files concurrently (each one streamed in chunks).
+
+    :param connection: connection to do the (authenticated) requests with
+    :param files: dictionary mapping user file path (on the back end) to local path
+    :param max_workers: maximum number of concurrent uploads
+    :param chunk_size: size (in bytes) of the chunks to read from the source files
+    :param progress: (optional) callback, called with user file path, number of bytes uploaded so far and total size
+    :return: dictionary mapping user file path to response status code
+    """
+
+    def upload(path: str, source) -> int:
+        file_progress = (lambda done, total: progress(path, done, total)) if progress else None
+        return RESTFile(connection, path).upload_file(source, chunk_size=chunk_size, progress=file_progress)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {path: executor.submit(upload, path, source) for path, source in files.items()}
+        return {path: future.result() for path, future in futures.items()}
@@ -1,10 +1,13 @@
 """
 Various utilities and helpers.
 """
+import codecs
+import json
 import logging
+import math
 import re
 from datetime import datetime, date
-from typing import Any, Union, Tuple, Callable
+from typing import Any, Union, Tuple, Callable, Iterable, Iterator
 from pathlib import Path
 
 _rfc3339_date_format = re.compile(r'\d{4}-\d{2}-\d{2}')
@@ -100,6 +103,68 @@ def get_temporal_extent(*args,
     return convertor(start_date) if start_date else None, convertor(end_date) if end_date else None
 
 
+def _get_json_encoder() -> Callable[[Any], bytes]:
+    """Get fastest available JSON encoder (producing UTF-8 encoded bytes): orjson, ujson or stdlib json."""
+    try:
+        import orjson
+        # Don't encode types that stdlib json rejects (datetimes, dataclasses) or handles differently (subclasses):
+        # orjson raises a TypeError for these and `encode_json` falls back on stdlib json.
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_SUBCLASS
+        return lambda data: orjson.dumps(data, option=options)
+    except ImportError:
+        pass
+    try:
+        import ujson
+        return lambda data: ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False).encode("utf-8")
+    except ImportError:
+        pass
+    return _stdlib_json_encode
+
+
+def _stdlib_json_encode(data) -> bytes:
+    return json.dumps(data, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+_json_encode = _get_json_encoder()
+
+
+def _check_finite_floats(data):
+    """Raise ValueError for non-finite floats (NaN, infinity) in (nested) data."""
+    stack = [data]
+    while stack:
+        x = stack.pop()
+        if isinstance(x, float):
+            if not math.isfinite(x):
+                raise ValueError("Out of range float values are not JSON compliant: {x!r}".format(x=x))
+        elif isinstance(x, dict):
+            stack.extend(x.values())
+        elif isinstance(x, (list, tuple)):
+            stack.extend(x)
+
+
+def encode_json(data, strict: bool = False) -> bytes:
+    """
+    Encode data to compact, UTF-8 encoded JSON bytes,
+    using a fast JSON library (orjson or ujson) when installed.
+
+    Values that are not supported by the standard library `json` module (e.g. dates) raise a TypeError.
+    Non-finite floats (NaN, infinity) raise a ValueError with stdlib json,
+    but are encoded as `null` by orjson.
+
+    :param strict: raise a ValueError for non-finite floats with every JSON library
+        (at the cost of an extra pass over the data)
+    """
+    if _json_encode is _stdlib_json_encode:
+        return _stdlib_json_encode(data)
+    if strict:
+        _check_finite_floats(data)
+    try:
+        return _json_encode(data)
+    except (TypeError, OverflowError):
+        # Fast encoders are stricter (e.g. no non-string keys or big integers): fall back on stdlib json.
+        return _stdlib_json_encode(data)
+
+
 class TimingLogger:
     """
     Context manager for quick and easy logging of start time, end time and elapsed time of some block of code
@@ -180,3 +245,147 @@ def deep_get(data: dict, *keys, default=_deep_get_default_undefined):
             else:
                 return default
     return data
+
+
+# Characters that are relevant to find the end of a (streamed) JSON value:
+# structural characters outside strings, quote and backslash inside strings, delimiters after scalars.
+_json_structure = re.compile(r'[\\"{}\[\]]')
+_json_string_special = re.compile(r'[\\"]')
+_json_scalar_end = re.compile(r'[ \t\n\r,:\]}]')
+
+
+def iter_json_items(chunks: Iterable[Union[bytes, str]]) -> Iterator[Tuple[Union[str, int], Any]]:
+    """
+    Incrementally parse a JSON document with a top-level object or array from a stream of (byte or text) chunks,
+    and yield its items as soon as they are complete:
+    (key, value) pairs for a top-level object, (index, value) pairs for a top-level array.
+
+    Only a single item has to be held in memory, instead of the whole document.
+    Each chunk is scanned once to find the end of the current item, which is only parsed when complete.
+
+        >>> list(iter_json_items([b'{"a": [1, 2], "b"', b': 3}']))
+        [("a", [1, 2]), ("b", 3)]
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def read_chunk() -> Union[str, None]:
+        """Read and decode next chunk (empty string at end of stream), None when end of stream was reached already."""
+        nonlocal eof
+        if eof:
+            return None
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            eof = True
+            return text_decoder.decode(b"", final=True)
+        return text_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+    def fill() -> bool:
+        """Read next chunk into buffer (dropping consumed part). Returns False at end of stream."""
+        nonlocal buffer, pos
+        chunk = read_chunk()
+        if chunk is None:
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def next_char() -> str:
+        """Skip whitespace and return next character (without consuming it), empty string at end of stream."""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\n\r":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return ""
+
+    def expect(chars: str) -> str:
+        nonlocal pos
+        c = next_char()
+        if not c or c not in chars:
+            raise ValueError("Invalid JSON stream: expected one of {e!r} but got {c!r}".format(e=chars, c=c))
+        pos += 1
+        return c
+
+    def decode_value():
+        nonlocal buffer, pos
+        first = next_char()
+        # Scan state: nesting depth of arrays/objects, inside string, after backslash in string.
+        depth = 0
+        in_string = False
+        escape = False
+
+        def is_complete(text: str, start: int = 0) -> bool:
+            """Continue scanning for the end of the value in the next piece of text."""
+            nonlocal depth, in_string, escape
+            if first not in '{["':
+                # Number or literal: complete when followed by a delimiter.
+                return _json_scalar_end.search(text, start) is not None
+            i = start
+            while i < len(text):
+                if escape:
+                    escape = False
+                    i += 1
+                    continue
+                match = (_json_string_special if in_string else _json_structure).search(text, i)
+                if not match:
+                    return False
+                c = match.group()
+                i = match.end()
+                if in_string:
+                    if c == "\\":
+                        escape = True
+                    else:
+                        in_string = False
+                        if depth == 0:
+                            return True
+                elif c == '"':
+                    in_string = True
+                elif c in "{[":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth <= 0:
+                        return True
+            return False
+
+        # Collect chunks until the value is complete (without re-scanning or re-parsing previous chunks).
+        complete = is_complete(buffer, pos)
+        parts = []
+        while not complete:
+            chunk = read_chunk()
+            if chunk is None:
+                break
+            parts.append(chunk)
+            complete = eof or is_complete(chunk)
+        if parts:
+            buffer = buffer[pos:] + "".join(parts)
+            pos = 0
+        # Raises ValueError on invalid or truncated (at end of stream) JSON.
+        value, pos = decoder.raw_decode(buffer, pos)
+        return value
+
+    start = expect("{[")
+    end = "}" if start == "{" else "]"
+    index = 0
+    if next_char() == end:
+        return
+    while True:
+        if start == "{":
+            key = decode_value()
+            if not isinstance(key, str):
+                raise ValueError("Invalid JSON stream: object key should be string but got {k!r}".format(k=key))
+            expect(":")
+        else:
+            key = index
+        yield key, decode_value()
+        index += 1
+        if expect("," + end) == end:
+            return
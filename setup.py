@@ -48,7 +48,18 @@ setup(name=name,
               "requests-mock",
               "pytest",
               "flake8",
-          ]
+          ],
+          "async": [
+              "aiohttp",
+          ],
+          "arrays": [
+              "xarray",
+              "h5netcdf",
+              "rasterio",
+          ],
+          "fastjson": [
+              "orjson",
+          ],
       },
       classifiers=[
         "Programming Language :: Python :: 3",
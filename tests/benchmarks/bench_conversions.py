@@ -0,0 +1,89 @@
+"""
+Benchmark of `timeseries_json_to_pandas` against the original (record based) implementation.
+
+Usage:
+
+    python -m tests.benchmarks.bench_conversions --dates 365 --polygons 1000 --bands 10
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas
+
+from openeo.rest.conversions import timeseries_json_to_pandas
+
+
+def timeseries_json_to_pandas_records(timeseries: dict, index: str = "date", auto_collapse=True) -> pandas.DataFrame:
+    """Original implementation: build a record tuple per value and reshape with `unstack`."""
+    band_counts = set(len(band_data) for values in timeseries.values() for band_data in values)
+    band_counts.discard(0)
+    if len(band_counts) != 1:
+        raise ValueError("Multiple band counts found in timeseries data: {b}".format(b=band_counts))
+    band_count = band_counts.pop()
+    band_data_fallback = [np.nan] * band_count
+    s = pandas.DataFrame.from_records(
+        (
+            (date, polygon_index, band_index, value)
+            for (date, polygon_data) in timeseries.items()
+            for polygon_index, band_data in enumerate(polygon_data)
+            for band_index, value in enumerate(band_data or band_data_fallback)
+        ),
+        columns=["date", "polygon", "band", "value"],
+        index=["date", "polygon", "band"]
+    )["value"].rename(None)
+    if auto_collapse:
+        if s.index.levshape[2] == 1:
+            s.index = s.index.droplevel("band")
+        if s.index.levshape[1] == 1:
+            s.index = s.index.droplevel("polygon")
+    if index == "date":
+        if len(s.index.names) > 1:
+            return s.unstack("date").T
+        else:
+            return s
+    elif index == "polygon":
+        return s.unstack("polygon").T
+    else:
+        raise ValueError(index)
+
+
+def generate_timeseries(dates: int, polygons: int, bands: int, missing: float = 0.01, seed: int = 42) -> dict:
+    rng = np.random.default_rng(seed)
+    timeseries = {}
+    for date in pandas.date_range("2020-01-01", periods=dates, freq="D"):
+        values = rng.random((polygons, bands)).tolist()
+        for p in np.flatnonzero(rng.random(polygons) < missing):
+            values[p] = []
+        timeseries[date.strftime("%Y-%m-%dT%H:%M:%SZ")] = values
+    return timeseries
+
+
+def timed(f, *args, **kwargs):
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dates", type=int, default=365)
+    parser.add_argument("--polygons", type=int, default=100)
+    parser.add_argument("--bands", type=int, default=10)
+    parser.add_argument("--skip-original", action="store_true", help="Only run the new implementation")
+    args = parser.parse_args()
+
+    timeseries = generate_timeseries(dates=args.dates, polygons=args.polygons, bands=args.bands)
+    print("Timeseries: {d} dates x {p} polygons x {b} bands".format(d=args.dates, p=args.polygons, b=args.bands))
+
+    new, elapsed = timed(timeseries_json_to_pandas, timeseries)
+    print("timeseries_json_to_pandas: {e:.3f}s".format(e=elapsed))
+    if not args.skip_original:
+        original, elapsed = timed(timeseries_json_to_pandas_records, timeseries)
+        print("original (record based) implementation: {e:.3f}s".format(e=elapsed))
+        pandas.testing.assert_frame_equal(new, original)
+        print("Results are equal.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark of process graph serialization (`PGNode.to_dict`, `PGNode.structural_hash`, `PGNode.flatten`)
+and deserialization (`PGNode.from_flat_graph`) on very deep/large process graphs.
+
+Usage:
+
+    python -m tests.benchmarks.bench_graph_flattening --nodes 10000
+"""
+import argparse
+import time
+
+from openeo.internal.graph_building import PGNode
+
+
+def generate_chain(nodes: int) -> PGNode:
+    """Long chain of processes (e.g. generated pipeline)."""
+    node = PGNode("load_collection", id="S2", spatial_extent=None, temporal_extent=None)
+    for i in range(nodes - 1):
+        node = PGNode("apply", data=node, process={"process_graph": PGNode("add", x={"from_parameter": "x"}, y=i)})
+    return node
+
+
+def generate_band_math(nodes: int) -> PGNode:
+    """Long band math expression: a single `reduce_dimension` with a deep reducer graph."""
+    expression = PGNode("array_element", data={"from_parameter": "data"}, index=0)
+    for i in range(nodes - 3):
+        band = PGNode("array_element", data={"from_parameter": "data"}, index=i % 4)
+        expression = PGNode("multiply" if i % 2 else "add", x=expression, y=band)
+    data = PGNode("load_collection", id="S2", spatial_extent=None, temporal_extent=None)
+    return PGNode("reduce_dimension", data=data, dimension="bands", reducer={"process_graph": expression})
+
+
+def generate_shared(nodes: int) -> PGNode:
+    """Ladder of diamonds: each node is consumed twice (exponential number of paths)."""
+    node = PGNode("load_collection", id="S2", spatial_extent=None, temporal_extent=None)
+    for i in range((nodes - 1) // 3):
+        left = PGNode("apply", data=node, process="absolute")
+        right = PGNode("apply", data=node, process="sqrt")
+        node = PGNode("merge_cubes", cube1=left, cube2=right)
+    return node
+
+
+def timed(f, *args, **kwargs):
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=10000)
+    args = parser.parse_args()
+
+    graphs = [
+        ("chain", generate_chain(args.nodes), True),
+        ("band math", generate_band_math(args.nodes), True),
+        # Nested dict representation of a diamond ladder is exponential in size: skip `to_dict`.
+        ("shared", generate_shared(args.nodes), False),
+    ]
+    for name, graph, with_to_dict in graphs:
+        print("Graph {n!r} (~{c} nodes)".format(n=name, c=args.nodes))
+        if with_to_dict:
+            _, elapsed = timed(graph.to_dict)
+            print("  to_dict: {e:.3f}s".format(e=elapsed))
+        _, elapsed = timed(graph.structural_hash)
+        print("  structural_hash: {e:.3f}s".format(e=elapsed))
+        _, elapsed = timed(graph.structural_hash)
+        print("  structural_hash (memoized): {e:.6f}s".format(e=elapsed))
+        flat, elapsed = timed(graph.flatten)
+        print("  flatten: {e:.3f}s ({c} flat nodes)".format(e=elapsed, c=len(flat)))
+        _, elapsed = timed(PGNode.from_flat_graph, flat)
+        print("  from_flat_graph: {e:.3f}s".format(e=elapsed))
+
+
+if __name__ == "__main__":
+    main()
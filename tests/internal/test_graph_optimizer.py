@@ -0,0 +1,108 @@
+from openeo.internal.graph_building import PGNode, ReduceNode
+from openeo.internal.graph_optimizer import push_down_filters, count_consumers, rewrite_graph, optimize
+
+
+def load_collection(**kwargs):
+    return PGNode("load_collection", id="S2", spatial_extent=None, temporal_extent=None, **kwargs)
+
+
+def test_count_consumers():
+    a = load_collection()
+    b = PGNode("apply", data={"from_node": a}, process="absolute")
+    c = PGNode("merge_cubes", cube1={"from_node": a}, cube2={"from_node": b})
+    counts = count_consumers(c)
+    assert counts == {id(a): 2, id(b): 1, id(c): 0}
+
+
+def test_rewrite_graph_untouched():
+    a = load_collection()
+    b = PGNode("apply", data={"from_node": a}, process="absolute")
+    assert rewrite_graph(b, lambda node, original: node) is b
+
+
+def test_push_down_filters():
+    graph = PGNode("filter_bands", data=PGNode(
+        "filter_temporal", data=PGNode(
+            "filter_bbox", data=load_collection(), extent={"west": 1, "east": 2, "north": 4, "south": 3, "crs": None}
+        ), extent=["2020-01-01", "2020-06-01"]
+    ), bands=["B02"])
+    optimized = push_down_filters(graph)
+    assert optimized.flatten() == {
+        "loadcollection1": {
+            "process_id": "load_collection",
+            "arguments": {
+                "id": "S2",
+                "spatial_extent": {"west": 1, "east": 2, "north": 4, "south": 3, "crs": None},
+                "temporal_extent": ["2020-01-01", "2020-06-01"],
+                "bands": ["B02"],
+            },
+            "result": True,
+        }
+    }
+    # Original graph is not modified
+    assert len(graph.flatten()) == 4
+
+
+def test_push_down_filters_intersect_extents():
+    load = PGNode(
+        "load_collection", id="S2",
+        spatial_extent={"west": 0, "east": 10, "north": 10, "south": 0},
+        temporal_extent=["2020-01-01", None],
+        bands=["B02", "B03", "B04"],
+    )
+    graph = PGNode("filter_bands", data=PGNode(
+        "filter_temporal", data=PGNode(
+            "filter_bbox", data=load, extent={"west": 5, "east": 15, "north": 5, "south": -5, "crs": 4326}
+        ), extent=["2019-01-01", "2020-06-01"]
+    ), bands=["B04", "B02"])
+    assert push_down_filters(graph).arguments == {
+        "id": "S2",
+        "spatial_extent": {"west": 5, "east": 10, "north": 5, "south": 0, "crs": 4326},
+        "temporal_extent": ["2020-01-01", "2020-06-01"],
+        "bands": ["B04", "B02"],
+    }
+
+
+def test_push_down_filters_not_possible():
+    # Different CRS
+    graph = PGNode("filter_bbox", data=PGNode(
+        "load_collection", id="S2", spatial_extent={"west": 0, "east": 10, "north": 10, "south": 0, "crs": 32631}
+    ), extent={"west": 1, "east": 2, "north": 4, "south": 3})
+    assert push_down_filters(graph) is graph
+    # Band not in loaded bands
+    graph = PGNode("filter_bands", data=load_collection(bands=["B02"]), bands=["B03"])
+    assert push_down_filters(graph) is graph
+    # Parameterized extent
+    graph = PGNode("filter_temporal", data=load_collection(), extent={"from_parameter": "t"})
+    assert push_down_filters(graph) is graph
+
+
+def test_push_down_filters_shared_load_collection():
+    load = load_collection()
+    filtered = PGNode("filter_bands", data=load, bands=["B02"])
+    graph = PGNode("merge_cubes", cube1=load, cube2=filtered)
+    assert push_down_filters(graph) is graph
+
+
+def test_push_down_filters_keeps_node_class():
+    load = load_collection()
+    graph = ReduceNode(
+        PGNode("filter_bands", data=load, bands=["B02"]), reducer="mean", dimension="t", band_math_mode=True
+    )
+    optimized = push_down_filters(graph)
+    assert isinstance(optimized, ReduceNode)
+    assert optimized.band_math_mode is True
+    assert optimized.arguments["data"]["from_node"].arguments["bands"] == ["B02"]
+
+
+def test_optimize_long_chain():
+    node = PGNode("filter_bbox", data=load_collection(), extent={"west": 1, "east": 2, "north": 4, "south": 3})
+    for i in range(5000):
+        node = PGNode("apply", data={"from_node": node}, process="absolute", index=i)
+    optimized = optimize(node)
+    assert count_consumers(optimized)[id(optimized)] == 0
+    flat = optimized.flatten()
+    assert len(flat) == 5001
+    assert flat["loadcollection1"]["arguments"]["spatial_extent"] == {"west": 1, "east": 2, "north": 4, "south": 3}
+    assert flat["apply1"]["arguments"]["data"] == {"from_node": "loadcollection1"}
+    assert flat["apply5000"]["arguments"]["index"] == 4999
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from openeo.internal.graph_building import PGNode
+from openeo.internal.graph_template import GraphTemplate, GraphTemplateCache, parameter
+
+
+def build_graph():
+    load = PGNode("load_collection", id="S2", spatial_extent=parameter("bbox"), temporal_extent=parameter("dates"))
+    callback = {"process_graph": PGNode("absolute", x=parameter("x"))}
+    return PGNode("apply", data=load, process=callback)
+
+
+BBOX = {"west": 3, "south": 51, "east": 4, "north": 52}
+DATES = ["2020-01-01", "2020-02-01"]
+
+
+def test_parameter_detection():
+    template = GraphTemplate(build_graph())
+    # Parameter "x" of the callback is not a template parameter
+    assert template.parameters == ["bbox", "dates"]
+
+
+def test_render():
+    graph = build_graph()
+    template = GraphTemplate(graph)
+    rendered = template.render(bbox=BBOX, dates=DATES)
+    expected = graph.flatten()
+    expected["loadcollection1"]["arguments"].update(spatial_extent=BBOX, temporal_extent=DATES)
+    assert rendered == expected
+    # Template itself is not modified
+    assert template.render(bbox=[1], dates=[2])["loadcollection1"]["arguments"]["spatial_extent"] == [1]
+    assert rendered["loadcollection1"]["arguments"]["spatial_extent"] == BBOX
+    # Unaffected parts are shared
+    assert rendered["apply1"] is template.render(bbox=[1], dates=[2])["apply1"]
+
+
+def test_render_json():
+    graph = build_graph()
+    template = GraphTemplate(graph)
+    rendered = template.render_json(bbox=BBOX, dates=DATES)
+    assert isinstance(rendered, bytes)
+    assert json.loads(rendered.decode("utf-8")) == template.render(bbox=BBOX, dates=DATES)
+
+
+def test_render_json_repeated_parameter():
+    graph = PGNode("add", x=parameter("a"), y=[parameter("a"), parameter("b"), "b"])
+    template = GraphTemplate(graph)
+    assert json.loads(template.render_json(a=1, b="x").decode("utf-8")) == {
+        "add1": {"process_id": "add", "arguments": {"x": 1, "y": [1, "x", "b"]}, "result": True}
+    }
+
+
+def test_render_no_parameters():
+    graph = PGNode("add", x=1, y=2)
+    template = GraphTemplate(graph)
+    assert template.parameters == []
+    assert template.render() == graph.flatten()
+    assert json.loads(template.render_json().decode("utf-8")) == graph.flatten()
+
+
+def test_explicit_parameters():
+    template = GraphTemplate(build_graph(), parameters=["bbox"])
+    rendered = template.render(bbox=BBOX)
+    assert rendered["loadcollection1"]["arguments"]["temporal_extent"] == {"from_parameter": "dates"}
+
+
+def test_render_invalid_parameters():
+    template = GraphTemplate(build_graph())
+    with pytest.raises(ValueError, match="Missing template parameters: \\['dates'\\]"):
+        template.render(bbox=BBOX)
+    with pytest.raises(ValueError, match="Unknown template parameters: \\['foo'\\]"):
+        template.render_json(bbox=BBOX, dates=DATES, foo=3)
+
+
+def test_template_cache():
+    cache = GraphTemplateCache(max_size=2)
+    t1 = cache.get(build_graph())
+    # Rebuilt (structurally identical) graph hits the cache.
+    assert cache.get(build_graph()) is t1
+    assert cache.get(build_graph(), parameters=["bbox"]) is not t1
+    cache.get(PGNode("add", x=1, y=2))
+    assert len(cache) == 2
+    assert cache.get(build_graph()) is not t1
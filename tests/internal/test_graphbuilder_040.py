@@ -1,12 +1,10 @@
+import threading
 from unittest import TestCase
 from openeo.internal.graphbuilder_040 import GraphBuilder
 
 
 class GraphBuilderTest(TestCase):
 
-    def setUp(self) -> None:
-        GraphBuilder.id_counter = {}
-
     def test_create_empty(self):
         builder = GraphBuilder()
         builder.process("sum",{})
@@ -39,7 +37,7 @@ class GraphBuilderTest(TestCase):
         builder = GraphBuilder(graph)
 
         print(builder.processes)
-        self.assertEqual(2,builder.id_counter["sum"])
+        self.assertEqual("sum3", builder.process("sum", {}))
 
     def test_merge(self):
         graph1 = {
@@ -94,11 +92,9 @@ class GraphBuilderTest(TestCase):
 
         import json
         print(json.dumps(merged, indent=2))
-        self.assertIn("sum1", merged)
-        self.assertIn("sum4",merged)
-        self.assertIn("sum5", merged)
-        self.assertEqual("sum4",merged["sum5"]["arguments"]["data"]["from_node"])
-        self.assertEqual("sum4", merged["sum5"]["arguments"]["data2"][0]["from_node"])
+        self.assertEqual({"sum1", "sum2", "sum3"}, set(merged.keys()))
+        self.assertEqual("sum2",merged["sum3"]["arguments"]["data"]["from_node"])
+        self.assertEqual("sum2", merged["sum3"]["arguments"]["data2"][0]["from_node"])
 
     def test_merge_issue50(self):
         """https://github.com/Open-EO/openeo-python-client/issues/50"""
@@ -113,3 +109,133 @@ class GraphBuilderTest(TestCase):
         assert builder.processes['op2']['arguments']['data'] == {'from_node': 'src', 'ref': 'B'}
         assert builder.processes['op3']['arguments']['data'] == {'from_node': 'op1', 'ref': 'A'}
         assert builder.processes['op4']['arguments']['data'] == {'from_node': 'op3', 'ref': 'D'}
+
+    def test_shallow_copy_isolation(self):
+        builder = GraphBuilder()
+        src = builder.process("load", {})
+        copy1 = builder.shallow_copy()
+        op = copy1.process("op", {"data": {"from_node": src}})
+        copy2 = copy1.shallow_copy()
+        copy2.processes[op]["result"] = True
+        copy2.process("other", {})
+        assert set(builder.processes.keys()) == {"load1"}
+        assert set(copy1.processes.keys()) == {"load1", "op1"}
+        assert set(copy2.processes.keys()) == {"load1", "op1", "other1"}
+        assert copy1.processes["op1"]["result"] is False
+        assert copy2.processes["op1"]["result"] is True
+
+    def test_shallow_copy_after_modification(self):
+        builder = GraphBuilder()
+        src = builder.process("load", {})
+        builder.processes[src]["result"] = True
+        the_copy = builder.shallow_copy()
+        builder.processes[src]["arguments"]["foo"] = "bar"
+        assert the_copy.processes == {"load1": {"process_id": "load", "arguments": {}, "result": True}}
+
+    def test_long_chain_shares_nodes(self):
+        builder = GraphBuilder()
+        node_id = builder.process("load", {})
+        builders = [builder]
+        for i in range(5000):
+            builder = builder.shallow_copy()
+            node_id = builder.process("op", {"data": {"from_node": node_id}})
+            builders.append(builder)
+        processes = builder.processes
+        assert len(processes) == 5001
+        assert processes["op5000"]["arguments"]["data"] == {"from_node": "op4999"}
+        assert processes["op1"]["arguments"]["data"] == {"from_node": "load1"}
+        # Intermediate builders still share their nodes: they are not flattened.
+        assert all(b._processes is None for b in builders[:-1])
+        assert len(builders[10].processes) == 11
+
+    def test_update_node_copy_on_write(self):
+        builder = GraphBuilder()
+        node_id = builder.add_process("load", result=True)
+        copy = builder.shallow_copy()
+        copy.update_node(node_id)["result"] = False
+        op_id = copy.add_process("op", data={"from_node": node_id}, result=True)
+        assert builder.get_node(node_id)["result"] is True
+        assert builder.find_result_node_id() == node_id
+        assert copy.find_result_node_id() == op_id
+        # Read through the segments, without flattening.
+        assert builder._processes is None and copy._processes is None
+        assert copy.processes[node_id]["result"] is False
+        assert builder.processes[node_id]["result"] is True
+
+    def test_embedded_builder(self):
+        callback = GraphBuilder()
+        callback.add_process("sum", data=[{"from_argument": "data"}, 1], result=True)
+        builder = GraphBuilder()
+        node_id = builder.add_process("reduce", reducer={"callback": callback}, result=True)
+        processes = builder.processes
+        assert processes[node_id]["arguments"]["reducer"]["callback"] == callback.processes
+        assert processes[node_id]["arguments"]["reducer"]["callback"] is not callback.processes
+
+    def test_from_process_graph_no_id_collision(self):
+        builder = GraphBuilder.from_process_graph({"sum3": {"process_id": "sum", "arguments": {}, "result": True}})
+        node_id = builder.process("sum", {"data": {"from_node": "sum3"}})
+        assert node_id == "sum4"
+        assert len(builder.processes) == 2
+
+    def test_node_ids_per_graph(self):
+        base = GraphBuilder()
+        base.process("load_collection", {"id": "S2"})
+        builder1 = base.shallow_copy()
+        builder2 = base.shallow_copy()
+        assert builder1.process("apply", {"data": {"from_node": "loadcollection1"}}) == "apply1"
+        assert builder2.process("apply", {"data": {"from_node": "loadcollection1"}, "x": 2}) == "apply1"
+        assert GraphBuilder().process("load_collection", {"id": "S2"}) == "loadcollection1"
+
+    def test_same_graph_data(self):
+        base = GraphBuilder()
+        base.process("load_collection", {"id": "S2"})
+        other_base = GraphBuilder()
+        other_base.process("load_collection", {"id": "S1"})
+        other_base.process("load_collection", {"id": "S2"})
+        builder1 = base.shallow_copy()
+        builder1.process("apply", {"data": {"from_node": "loadcollection1"}})
+        builder2 = base.shallow_copy()
+        builder2.process("apply", {"data": {"from_node": "loadcollection1"}, "x": 2})
+        builder3 = other_base.shallow_copy()
+        builder3.process("apply", {"data": {"from_node": "loadcollection2"}})
+        builder4 = other_base.shallow_copy()
+        builder4.process("apply", {"data": {"from_node": "loadcollection1"}})
+        ref = {"from_node": "apply1"}
+        # Same node id, shared node
+        assert builder1.same_graph_data(ref, builder1.shallow_copy(), ref)
+        # Same node id, different nodes
+        assert not builder1.same_graph_data(ref, builder2, ref)
+        # Different graphs, same process and inputs
+        assert builder1.same_graph_data(ref, builder3, ref)
+        assert builder1.same_graph_data({"from_node": "loadcollection1"}, builder3, {"from_node": "loadcollection2"})
+        # Different graphs, same process, different inputs
+        assert not builder1.same_graph_data(ref, builder4, ref)
+
+    def test_concurrent_graph_building(self):
+        base = GraphBuilder()
+        base_id = base.process("load_collection", {"id": "S2"})
+        thread_count = 8
+        chain_length = 500
+        results = [None] * thread_count
+        start = threading.Barrier(thread_count)
+
+        def build(index):
+            start.wait()
+            builder = base
+            node_id = base_id
+            for i in range(chain_length):
+                builder = builder.shallow_copy()
+                node_id = builder.process("apply", {"data": {"from_node": node_id}, "index": i})
+            builder.processes[node_id]["result"] = True
+            results[index] = builder.processes
+
+        threads = [threading.Thread(target=build, args=(i,)) for i in range(thread_count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # Node ids are generated per graph: all graphs are identical.
+        assert all(graph == results[0] for graph in results)
+        assert set(results[0].keys()) == {"loadcollection1"} | {"apply%d" % (i + 1) for i in range(chain_length)}
+        assert results[0]["apply%d" % chain_length]["result"] is True
@@ -1,6 +1,9 @@
+import copy
+import sys
+
 import pytest
 
-from openeo.internal.graph_building import FlatGraphNodeIdGenerator, PGNode, ReduceNode
+from openeo.internal.graph_building import FlatGraphNodeIdGenerator, PGNode, ReduceNode, GraphFlattener
 
 
 def test_pgnode_process_id():
@@ -179,3 +182,191 @@ def test_reduce_node_process_graph():
             'dimension': 'time',
         },
     }
+
+
+def test_pgnode_structural_hash():
+    a1 = PGNode("filter_bbox", data=PGNode("load_collection", collection_id="S2"), extent={"west": 1, "east": 2})
+    a2 = PGNode("filter_bbox", data=PGNode("load_collection", collection_id="S2"), extent={"east": 2, "west": 1})
+    b = PGNode("filter_bbox", data=PGNode("load_collection", collection_id="S1"), extent={"west": 1, "east": 2})
+    assert a1.structural_hash() == a2.structural_hash()
+    assert a1.structural_hash() != b.structural_hash()
+    assert a1.structural_hash() is a1.structural_hash()
+
+
+def test_flatten_merge_common_subgraphs():
+    def load():
+        return PGNode("filter_bbox", data=PGNode("load_collection", collection_id="S2"), extent=[1, 2, 3, 4])
+
+    graph = PGNode("merge_cubes", cube1=load(), cube2=load())
+    assert graph.flatten(merge_common_subgraphs=True) == {
+        "loadcollection1": {"process_id": "load_collection", "arguments": {"collection_id": "S2"}},
+        "filterbbox1": {
+            "process_id": "filter_bbox",
+            "arguments": {"data": {"from_node": "loadcollection1"}, "extent": [1, 2, 3, 4]}
+        },
+        "mergecubes1": {
+            "process_id": "merge_cubes",
+            "arguments": {"cube1": {"from_node": "filterbbox1"}, "cube2": {"from_node": "filterbbox1"}},
+            "result": True,
+        },
+    }
+    assert len(GraphFlattener(merge_common_subgraphs=False).flatten(graph)) == 5
+    # Not merged by default
+    assert len(graph.flatten()) == 5
+
+
+def test_flatten_merge_common_subgraphs_non_json_argument():
+    class Custom:
+        pass
+
+    value = Custom()
+    load = PGNode("load_collection", collection_id="S2")
+
+    def process():
+        return PGNode("apply", data=load, process=value)
+
+    graph = PGNode("merge_cubes", cube1=process(), cube2=process())
+    with pytest.raises(TypeError):
+        graph.structural_hash()
+    flat = GraphFlattener(merge_common_subgraphs=True).flatten(graph)
+    # Falls back on merging reused node objects only.
+    assert sorted(flat.keys()) == ["apply1", "apply2", "loadcollection1", "mergecubes1"]
+    assert flat["apply1"]["arguments"]["process"] is value
+
+
+def test_flatten_merge_common_subgraphs_keeps_callback_scope():
+    x = PGNode("absolute", x={"from_parameter": "x"})
+    cube = PGNode("apply", data=PGNode("load_collection", collection_id="S2"), process={"process_graph": x})
+    graph = PGNode("merge_cubes", cube1=cube, cube2=PGNode("absolute", x={"from_parameter": "x"}))
+    flat = graph.flatten(merge_common_subgraphs=True)
+    assert flat["apply1"]["arguments"]["process"]["process_graph"] == {
+        "absolute1": {"process_id": "absolute", "arguments": {"x": {"from_parameter": "x"}}, "result": True}
+    }
+    assert flat["mergecubes1"]["arguments"]["cube2"] == {"from_node": "absolute2"}
+
+
+def _deep_chain(size: int) -> PGNode:
+    node = PGNode("load_collection", collection_id="S2")
+    for i in range(size):
+        node = PGNode("add", x=node, y=i)
+    return node
+
+
+def test_flatten_deep_graph():
+    size = 5 * sys.getrecursionlimit()
+    flat = _deep_chain(size).flatten()
+    assert len(flat) == size + 1
+    assert flat["add1"]["arguments"] == {"x": {"from_node": "loadcollection1"}, "y": 0}
+    assert flat["add{s}".format(s=size)] == {
+        "process_id": "add",
+        "arguments": {"x": {"from_node": "add{s}".format(s=size - 1)}, "y": size - 1},
+        "result": True,
+    }
+
+
+def test_structural_hash_deep_graph():
+    size = 5 * sys.getrecursionlimit()
+    assert _deep_chain(size).structural_hash() == _deep_chain(size).structural_hash()
+    assert _deep_chain(size).structural_hash() != _deep_chain(size - 1).structural_hash()
+
+
+def test_to_dict_deep_graph():
+    size = 5 * sys.getrecursionlimit()
+    d = _deep_chain(size).to_dict()
+    depth = 0
+    while d["process_id"] == "add":
+        assert d["arguments"]["y"] == size - 1 - depth
+        d = d["arguments"]["x"]["from_node"]
+        depth += 1
+    assert depth == size
+    assert d == {"process_id": "load_collection", "arguments": {"collection_id": "S2"}}
+
+
+def test_to_dict_tuples():
+    pg = PGNode("foo", extent=(1, 2, (3, 4)), bands=["B02", ("B03", "B04")])
+    assert pg.to_dict() == {
+        "process_id": "foo",
+        "arguments": {"extent": (1, 2, (3, 4)), "bands": ["B02", ("B03", "B04")]}
+    }
+
+
+def test_from_flat_graph_roundtrip():
+    x = PGNode("absolute", x={"from_parameter": "x"})
+    load = PGNode("load_collection", collection_id="S2", spatial_extent={"west": 3, "south": 51, "east": 4, "north": 52})
+    cube = PGNode("apply", data=load, process={"process_graph": x})
+    graph = PGNode("merge_cubes", cube1=cube, cube2=PGNode("filter_bands", data=load, bands=["B02", "B03"]))
+    flat = graph.flatten()
+    assert PGNode.from_flat_graph(flat).flatten() == flat
+
+
+def test_from_flat_graph_shared_nodes():
+    flat = {
+        "load": {"process_id": "load_collection", "arguments": {"id": "S2"}},
+        "b1": {"process_id": "filter_bands", "arguments": {"data": {"from_node": "load"}, "bands": ["B02"]}},
+        "b2": {"process_id": "filter_bands", "arguments": {"data": {"from_node": "load"}, "bands": ["B03"]}},
+        "merge": {
+            "process_id": "merge_cubes",
+            "arguments": {"cubes": [{"from_node": "b1"}, {"from_node": "b2"}]},
+            "result": True,
+        },
+    }
+    original = copy.deepcopy(flat)
+    node = PGNode.from_flat_graph(flat)
+    assert node.process_id == "merge_cubes"
+    b1, b2 = [c["from_node"] for c in node.arguments["cubes"]]
+    assert b1.arguments["bands"] == ["B02"]
+    assert b2.arguments["bands"] == ["B03"]
+    assert b1.arguments["data"]["from_node"] is b2.arguments["data"]["from_node"]
+    assert b1.arguments["data"]["from_node"].arguments == {"id": "S2"}
+    # Input is not modified
+    assert flat == original
+
+
+def test_from_flat_graph_child_process_graph():
+    flat = {
+        "load": {"process_id": "load_collection", "arguments": {"id": "S2"}},
+        "reduce": {"process_id": "reduce_dimension", "arguments": {
+            "data": {"from_node": "load"},
+            "dimension": "t",
+            "reducer": {"process_graph": {
+                "mean": {"process_id": "mean", "arguments": {"data": {"from_parameter": "data"}}, "result": True}
+            }},
+        }, "result": True},
+    }
+    node = PGNode.from_flat_graph(flat)
+    reducer = node.arguments["reducer"]["process_graph"]
+    assert isinstance(reducer, PGNode)
+    assert reducer.process_id == "mean"
+    assert reducer.arguments == {"data": {"from_parameter": "data"}}
+
+
+def test_from_flat_graph_deep_graph():
+    size = 5 * sys.getrecursionlimit()
+    flat = _deep_chain(size).flatten()
+    node = PGNode.from_flat_graph(flat)
+    assert node.structural_hash() == _deep_chain(size).structural_hash()
+
+
+@pytest.mark.parametrize(["flat", "message"], [
+    ({"a": {"process_id": "foo"}}, "does not contain a result node"),
+    ({"a": {"process_id": "foo", "result": True}, "b": {"process_id": "foo", "result": True}}, "Multiple result nodes"),
+    (
+            {"a": {"process_id": "foo", "arguments": {"x": {"from_node": "b"}}, "result": True}},
+            "from_node 'b' \\(referenced by 'a'\\) not in process graph",
+    ),
+    (
+            {"a": {"process_id": "foo", "arguments": {"x": [1, {"from_node": "a"}]}, "result": True}},
+            "Cycle in process graph",
+    ),
+    (
+            {
+                "a": {"process_id": "foo", "arguments": {"x": {"from_node": "b"}}, "result": True},
+                "b": {"process_id": "foo", "arguments": {"x": {"from_node": "c"}}},
+                "c": {"process_id": "foo", "arguments": {"x": {"from_node": "b"}}},
+            },
+            "Cycle in process graph",
+    ),
+])
+def test_from_flat_graph_invalid(flat, message):
+    with pytest.raises(ValueError, match=message):
+        PGNode.from_flat_graph(flat)
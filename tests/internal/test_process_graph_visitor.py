@@ -244,3 +244,128 @@ def test_dereference_cycle():
     ProcessGraphVisitor.dereference_from_node_arguments(graph)
     assert graph["node1"]["arguments"]["data"]["node"] is graph["node2"]
     assert graph["node2"]["arguments"]["data"]["node"] is graph["node1"]
+
+
+def test_visit_arguments_in_name_order():
+    node = {"process_id": "foo", "arguments": {"z": 1, "a": 2, "m": 3}}
+    visitor = ProcessGraphVisitor()
+    visitor.constantArgument = MagicMock()
+    visitor.accept(node)
+    assert visitor.constantArgument.call_args_list == [
+        call(argument_id="a", value=2), call(argument_id="m", value=3), call(argument_id="z", value=1)
+    ]
+
+
+def test_visit_shared_nodes_once_arguments_in_given_order():
+    node = {"process_id": "foo", "arguments": {"z": 1, "a": 2, "m": 3}}
+    visitor = ProcessGraphVisitor(visit_shared_nodes_once=True)
+    visitor.constantArgument = MagicMock()
+    visitor.accept(node)
+    assert visitor.constantArgument.call_args_list == [
+        call(argument_id="z", value=1), call(argument_id="a", value=2), call(argument_id="m", value=3)
+    ]
+
+
+def _diamond_ladder(depth: int) -> dict:
+    """Flat graph where each level consumes the previous level twice (2**depth paths)."""
+    graph = {"load": {"process_id": "load_collection", "arguments": {"id": "S2"}}}
+    previous = "load"
+    for i in range(depth):
+        graph["abs{i}".format(i=i)] = {"process_id": "absolute", "arguments": {"x": {"from_node": previous}}}
+        graph["sqrt{i}".format(i=i)] = {"process_id": "sqrt", "arguments": {"x": {"from_node": previous}}}
+        graph["merge{i}".format(i=i)] = {"process_id": "merge_cubes", "arguments": {
+            "cubes": [{"from_node": "abs{i}".format(i=i)}, {"from_node": "sqrt{i}".format(i=i)}]
+        }}
+        previous = "merge{i}".format(i=i)
+    graph[previous]["result"] = True
+    return graph
+
+
+def test_visit_shared_nodes_tree_mode():
+    visitor = ProcessGraphVisitor()
+    visitor.leaveProcess = MagicMock()
+    visitor.accept_process_graph(_diamond_ladder(3))
+    # Visits per level: merge(d) = 1 + 2 * (1 + merge(d - 1)), with load = 1
+    assert visitor.leaveProcess.call_count == 29
+
+
+def test_visit_shared_nodes_once():
+    class Counter(ProcessGraphVisitor):
+        """Count the number of load_collection paths to each node."""
+
+        def __init__(self):
+            super().__init__(visit_shared_nodes_once=True)
+            self.visited = []
+            self.revisited = []
+            self._counts = []
+
+        def enterProcess(self, process_id: str, arguments: dict):
+            self._counts.append(1 if process_id == "load_collection" else 0)
+
+        def leaveProcess(self, process_id: str, arguments: dict):
+            self.visited.append(process_id)
+            count = self.total = self._counts.pop()
+            if self._counts:
+                self._counts[-1] += count
+            return count
+
+        def revisitProcess(self, process_id: str, arguments: dict, result):
+            self.revisited.append((process_id, result))
+            self._counts[-1] += result
+
+    depth = 50
+    visitor = Counter()
+    visitor.accept_process_graph(_diamond_ladder(depth))
+    assert len(visitor.visited) == 1 + 3 * depth
+    assert visitor.visited[:4] == ["load_collection", "absolute", "sqrt", "merge_cubes"]
+    assert visitor.revisited[:2] == [("load_collection", 1), ("merge_cubes", 2)]
+    assert len(visitor.revisited) == depth
+    assert visitor.total == 2 ** depth
+
+
+def test_visit_long_chain():
+    graph = {"op0": {"process_id": "load_collection", "arguments": {"id": "S2"}}}
+    for i in range(1, 5000):
+        graph["op{i}".format(i=i)] = {"process_id": "apply", "arguments": {"data": {"from_node": "op{p}".format(p=i - 1)}}}
+    graph["op4999"]["result"] = True
+    for visit_shared_nodes_once in [False, True]:
+        visitor = ProcessGraphVisitor(visit_shared_nodes_once=visit_shared_nodes_once)
+        visitor.leaveProcess = MagicMock()
+        visitor.accept_process_graph(graph)
+        assert visitor.leaveProcess.call_count == 5000
+        assert visitor.leaveProcess.call_args_list[0] == call(process_id="load_collection", arguments={"id": "S2"})
+        assert visitor.process_stack == []
+
+
+def test_visit_nested_nodes_through_accept_node():
+    class Tracker(ProcessGraphVisitor):
+        def __init__(self):
+            super().__init__()
+            self.accepted = []
+
+        def accept_node(self, node: dict):
+            self.accepted.append(node["process_id"])
+            return super().accept_node(node)
+
+    graph = {
+        "load": {"process_id": "load_collection", "arguments": {}},
+        "apply": {"process_id": "apply", "arguments": {"data": {"from_node": "load"}}},
+        "merge": {"process_id": "merge_cubes", "arguments": {
+            "cubes": [{"from_node": "apply"}, {"from_node": "load"}]
+        }, "result": True},
+    }
+    visitor = Tracker()
+    visitor.accept_process_graph(graph)
+    assert visitor.accepted == ["merge_cubes", "apply", "load_collection", "load_collection"]
+
+
+def test_accept_process_directly():
+    visitor = ProcessGraphVisitor()
+    visitor.leaveProcess = MagicMock(side_effect=lambda process_id, arguments: process_id)
+    node = {"process_id": "load_collection", "arguments": {}}
+    result = visitor._accept_process(process_id="apply", arguments={"data": {"from_node": "load", "node": node}})
+    assert result == "apply"
+    assert visitor.leaveProcess.call_args_list == [
+        call(process_id="load_collection", arguments={}),
+        call(process_id="apply", arguments=ANY),
+    ]
@@ -0,0 +1,34 @@
+from requests import Request
+
+from openeo.rest.auth.auth import BearerAuth, RefreshingBearerAuth
+
+
+def test_bearer_auth():
+    request = BearerAuth(bearer="6cc355")(Request())
+    assert request.headers["Authorization"] == "Bearer 6cc355"
+
+
+def test_refreshing_bearer_auth(monkeypatch):
+    now = [1000]
+    monkeypatch.setattr(RefreshingBearerAuth, "_now", lambda self: now[0])
+    refreshes = []
+
+    def refresh():
+        refreshes.append(now[0])
+        return "t0k3n{n}".format(n=len(refreshes)), now[0] + 300
+
+    auth = RefreshingBearerAuth(bearer="t0k3n0", refresh=refresh, expires_at=1300, refresh_margin=60)
+    assert auth(Request()).headers["Authorization"] == "Bearer t0k3n0"
+    now[0] = 1200
+    assert auth(Request()).headers["Authorization"] == "Bearer t0k3n0"
+    # Refresh proactively, within margin before expiry
+    now[0] = 1250
+    assert auth(Request()).headers["Authorization"] == "Bearer t0k3n1"
+    assert auth(Request()).headers["Authorization"] == "Bearer t0k3n1"
+    assert refreshes == [1250]
+    assert auth.expires_at == 1550
+
+
+def test_refreshing_bearer_auth_unknown_expiry():
+    auth = RefreshingBearerAuth(bearer="t0k3n0", refresh=lambda: ("t0k3n1", None), expires_at=None)
+    assert auth(Request()).headers["Authorization"] == "Bearer t0k3n0"
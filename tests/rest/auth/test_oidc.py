@@ -1,9 +1,16 @@
+import concurrent.futures
+import itertools
+import stat
+import urllib.parse
 from io import BytesIO
 from queue import Queue
 
+import pytest
 import requests
 
-from openeo.rest.auth.oidc import QueuingRequestHandler, drain_queue, HttpServerThread, OidcAuthCodePkceAuthenticator
+from openeo.rest.auth.oidc import QueuingRequestHandler, drain_queue, HttpServerThread, OidcAuthCodePkceAuthenticator, \
+    OidcRefreshTokenAuthenticator, OidcTokenStore, OAuthException, jwt_expiration, jwt_subject
+from ..conftest import _jwt_encode
 
 
 def handle_request(handler_class, path: str):
@@ -79,3 +86,79 @@ def test_oidc_flow(oidc_test_setup):
     # Do the Oauth/OpenID Connect flow
     tokens = authenticator.get_tokens()
     assert state["access_token"] == tokens.access_token
+    assert authenticator.token_endpoint == "https://auth.example.com/token"
+    assert tokens.refresh_token is not None
+
+
+def test_oidc_refresh_token_authenticator(requests_mock):
+    def token_callback(request, context):
+        params = urllib.parse.parse_qs(request.text)
+        assert params == {"grant_type": ["refresh_token"], "client_id": ["myclient"], "refresh_token": ["r3fr35h"]}
+        return {"access_token": "4cc355", "id_token": "1d"}
+
+    requests_mock.post("https://auth.example.com/token", json=token_callback)
+    authenticator = OidcRefreshTokenAuthenticator(
+        client_id="myclient", token_endpoint="https://auth.example.com/token", refresh_token="r3fr35h"
+    )
+    tokens = authenticator.get_tokens()
+    assert tokens.access_token == "4cc355"
+    # Refresh token is kept when not rotated
+    assert tokens.refresh_token == "r3fr35h"
+
+
+def test_oidc_refresh_token_authenticator_failure(requests_mock):
+    requests_mock.post("https://auth.example.com/token", status_code=400, json={"error": "invalid_grant"})
+    authenticator = OidcRefreshTokenAuthenticator(
+        client_id="myclient", token_endpoint="https://auth.example.com/token", refresh_token="r3fr35h"
+    )
+    with pytest.raises(OAuthException, match="Failed to refresh access token: \\[400\\]"):
+        authenticator.get_tokens()
+
+
+def test_oidc_token_store(tmp_path):
+    path = tmp_path / "sub" / "tokens.json"
+    store = OidcTokenStore(path)
+    assert store.get("https://oeo.net", "myclient") is None
+    store.set("https://oeo.net", "myclient", access_token="4cc355", refresh_token="r3fr35h",
+              token_endpoint="https://auth.example.com/token")
+    store.set("https://oeo.net", "otherclient", access_token="0th3r")
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    # New store instance (e.g. other process)
+    store = OidcTokenStore(path)
+    assert store.get("https://oeo.net", "myclient") == {
+        "access_token": "4cc355", "refresh_token": "r3fr35h", "token_endpoint": "https://auth.example.com/token"
+    }
+    assert store.get("https://oeo.net", "otherclient")["access_token"] == "0th3r"
+    assert store.get("https://other.net", "myclient") is None
+    store.remove("https://oeo.net", "myclient")
+    assert store.get("https://oeo.net", "myclient") is None
+    assert store.get("https://oeo.net", "otherclient")["access_token"] == "0th3r"
+
+
+def _store_tokens(path, client_ids):
+    store = OidcTokenStore(path)
+    for client_id in client_ids:
+        store.set("https://oeo.net", client_id, access_token="4cc355-" + client_id)
+
+
+def test_oidc_token_store_concurrent_processes(tmp_path):
+    path = tmp_path / "tokens.json"
+    client_ids = [["client{p}-{i}".format(p=p, i=i) for i in range(20)] for p in range(4)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_store_tokens, [path] * len(client_ids), client_ids))
+    store = OidcTokenStore(path)
+    # No lost updates
+    for client_id in itertools.chain.from_iterable(client_ids):
+        assert store.get("https://oeo.net", client_id)["access_token"] == "4cc355-" + client_id
+
+
+def test_jwt_expiration():
+    assert jwt_expiration(_jwt_encode({}, {"sub": "123", "exp": 1600000000})) == 1600000000
+    assert jwt_expiration(_jwt_encode({}, {"sub": "123"})) is None
+    assert jwt_expiration("n0t-4-jwt") is None
+
+
+def test_jwt_subject():
+    assert jwt_subject(_jwt_encode({}, {"sub": "123", "exp": 1600000000})) == "123"
+    assert jwt_subject(_jwt_encode({}, {"exp": 1600000000})) is None
+    assert jwt_subject("n0t-4-jwt") is None
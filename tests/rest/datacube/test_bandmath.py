@@ -6,12 +6,13 @@ Band math related tests against both
 
 """
 
+import json
+
 import numpy as np
 import pytest
 
 from openeo.rest import BandMathException
-from .. import get_download_graph
-from ..conftest import reset_graphbuilder
+from .. import get_download_graph, get_execute_graph
 from ... import load_json_resource
 
 
@@ -19,30 +20,39 @@ def test_band_basic(connection, api_version):
     cube = connection.load_collection("SENTINEL2_RADIOMETRY_10M")
     expected_graph = load_json_resource('data/%s/band0.json' % api_version)
     assert cube.band(0).graph == expected_graph
-    reset_graphbuilder()
     assert cube.band("B02").graph == expected_graph
 
 
 def test_indexing_040(con040):
     cube = con040.load_collection("SENTINEL2_RADIOMETRY_10M")
     expected_graph = load_json_resource('data/0.4.0/band_red.json')
-    reset_graphbuilder()
     assert cube.band("B04").graph == expected_graph
-    reset_graphbuilder()
     assert cube.band("red").graph == expected_graph
-    reset_graphbuilder()
     assert cube.band(2).graph == expected_graph
 
     cube2 = cube.filter_bands(['B04', 'B03'])
     expected_graph = load_json_resource('data/0.4.0/band_red_filtered.json')
-    reset_graphbuilder()
     assert cube2.band("B04").graph == expected_graph
-    reset_graphbuilder()
     assert cube2.band("red").graph == expected_graph
-    reset_graphbuilder()
     assert cube2.band(0).graph == expected_graph
 
 
+def test_band_math_long_chain_shares_nodes_040(con040):
+    cube = con040.load_collection("S2").band("B04")
+    cubes = [cube]
+    for i in range(2000):
+        cube = cube + 1 if i % 2 else cube > i
+        cubes.append(cube)
+    callback = cube.graph[cube.node_id]["arguments"]["reducer"]["callback"]
+    assert len(callback) == 2001
+    assert [v["process_id"] for v in callback.values() if v["result"]] == ["sum"]
+    # Intermediate cubes (and their callbacks) still share their nodes: they are not flattened.
+    assert all(c.builder._processes is None for c in cubes[:-1])
+    callback10 = cubes[10].graph[cubes[10].node_id]["arguments"]["reducer"]["callback"]
+    assert len(callback10) == 11
+    assert sum(v["result"] for v in callback10.values()) == 1
+
+
 def test_indexing_100(con100):
     cube = con100.load_collection("SENTINEL2_RADIOMETRY_10M")
     expected_graph = load_json_resource('data/1.0.0/band_red.json')
@@ -96,10 +106,12 @@ def test_ndvi_udf_v100(con100):
         "add1": {"process_id": "add", "arguments": {"x": 3, "y": {"from_node": "arrayelement1"}}, "result": True}
     }),
     ((lambda b: 3 + b + 5), {
-        "add1": {"process_id": "add", "arguments": {"x": 3, "y": {"from_node": "arrayelement1"}}},
-        "add2": {"process_id": "add", "arguments": {"x": {"from_node": "add1"}, "y": 5}, "result": True}
-    }
-     ),
+        "add1": {"process_id": "add", "arguments": {"x": 8, "y": {"from_node": "arrayelement1"}}, "result": True}
+    }),
+    ((lambda b: b / 2 / 5), {
+        "divide1": {"process_id": "divide", "arguments": {"x": {"from_node": "arrayelement1"}, "y": 10},
+                    "result": True}
+    }),
     ((lambda b: b - 3), {
         "subtract1": {"process_id": "subtract", "arguments": {"x": {"from_node": "arrayelement1"}, "y": 3},
                       "result": True}
@@ -260,9 +272,9 @@ def test_merge_cubes_multiple(connection, api_version):
     b1 = b1.linear_scale_range(0, 1, 0, 2)
     combined = b1 + b1 + b1
     actual = get_download_graph(combined)
+    # Element-wise operations on same input cube are fused in a single `apply` (instead of `merge_cubes`)
     assert sorted(n["process_id"] for n in actual.values()) == [
-        "linear_scale_range", "load_collection",
-        "merge_cubes", "merge_cubes", "reduce_dimension", "save_result"]
+        "apply", "linear_scale_range", "load_collection", "reduce_dimension", "save_result"]
     assert actual == load_json_resource('data/%s/merge_cubes_multiple.json' % api_version)
 
 
@@ -290,3 +302,24 @@ def test_fuzzy_mask(connection, api_version):
     print(json.dumps(mask.graph, indent=2))
     assert mask.graph == load_json_resource('data/%s/fuzzy_mask.json' % api_version)
 
+
+
+def test_band_math_cubes_with_same_node_id_040(con040):
+    s2 = con040.load_collection("S2")
+    cube1 = s2.filter_bbox(west=1, east=2, north=4, south=3)
+    cube2 = s2.filter_bbox(west=5, east=6, north=8, south=7)
+    # Node ids are generated per graph: different cubes can have the same node id.
+    assert cube1.node_id == cube2.node_id == "filterbbox1"
+    assert "mergecubes1" in (cube1 + cube2).graph
+    same = s2.filter_bbox(west=1, east=2, north=4, south=3)
+    assert (cube1 + same).graph["reduce1"]["arguments"]["data"] == {"from_node": "filterbbox1"}
+    with pytest.raises(BandMathException):
+        cube1.band("B02") + cube2.band("B04")
+
+
+def test_band_math_graph_matches_submitted_graph_040(con040):
+    s2 = con040.load_collection("S2")
+    result = (s2.band("B02") + s2.band("B04")) * 2
+    expected = json.loads(json.dumps(result.graph))
+    expected[result.node_id]["result"] = True
+    assert get_execute_graph(result) == expected
@@ -18,7 +18,6 @@ from openeo.rest import BandMathException
 from openeo.rest.datacube import DataCube
 from openeo.rest.imagecollectionclient import ImageCollectionClient
 from .. import get_download_graph
-from ..conftest import reset_graphbuilder
 from .conftest import API_URL
 from ... import load_json_resource
 
@@ -201,17 +200,14 @@ def test_pipe_with_args(s2cube):
     def ndvi_scaled(cube, in_max=2, out_max=3):
         return cube.ndvi().linear_scale_range(0, in_max, 0, out_max)
 
-    reset_graphbuilder()
     im = s2cube.pipe(ndvi_scaled)
     assert im.graph["linearscalerange1"]["arguments"] == {
         'inputMax': 2, 'inputMin': 0, 'outputMax': 3, 'outputMin': 0, 'x': {'from_node': 'ndvi1'}
     }
-    reset_graphbuilder()
     im = s2cube.pipe(ndvi_scaled, 4, 5)
     assert im.graph["linearscalerange1"]["arguments"] == {
         'inputMax': 4, 'inputMin': 0, 'outputMax': 5, 'outputMin': 0, 'x': {'from_node': 'ndvi1'}
     }
-    reset_graphbuilder()
     im = s2cube.pipe(ndvi_scaled, out_max=7)
     assert im.graph["linearscalerange1"]["arguments"] == {
         'inputMax': 2, 'inputMin': 0, 'outputMax': 7, 'outputMin': 0, 'x': {'from_node': 'ndvi1'}
@@ -339,7 +335,7 @@ def test_mask_raster(s2cube, connection, api_version):
                 "from_node": "loadcollection1"
             },
             "mask": {
-                "from_node": "loadcollection3" if api_version == '0.4.0' else "loadcollection2"
+                "from_node": "loadcollection2"
             },
             "replacement": 102
         },
@@ -433,7 +429,6 @@ def test_apply_dimension(connection, requests_mock):
     s22 = connection.load_collection("S22")
 
     for dim in ["color", "alpha", "date"]:
-        reset_graphbuilder()
         cube = s22.apply_dimension(dimension=dim, code="subtract_mean")
         assert cube.graph["applydimension1"]["process_id"] == "apply_dimension"
         assert cube.graph["applydimension1"]["arguments"]["dimension"] == dim
@@ -3,13 +3,22 @@
 Unit tests specifically for 1.0.0-style DataCube
 
 """
+import json
+import pathlib
+import re
+
 import pytest
 import shapely.geometry
+import urllib3.exceptions
 
 import openeo.metadata
 from openeo.internal.graph_building import PGNode
-from openeo.rest.connection import Connection
+from openeo.rest import OpenEoClientException
+from openeo.rest.connection import Connection, OpenEoApiError
+from openeo.rest.datacube import DataCube
+from openeo.rest.geometry import GeometryEncoding
 from .conftest import API_URL
+from .. import get_execute_graph
 from ... import load_json_resource
 
 
@@ -208,3 +217,366 @@ def test_apply_absolute_pgnode(con100):
     result = im.apply(PGNode(process_id="absolute", arguments={"x": {"from_parameter": "x"}}))
     expected_graph = load_json_resource('data/1.0.0/apply_absolute.json')
     assert result.graph == expected_graph
+
+
+def test_optimize_filter_pushdown(con100):
+    cube = con100.load_collection("S2").filter_bbox(west=1, east=2, north=4, south=3).filter_bands(["red"])
+    assert sorted(cube.flatten().keys()) == ["filterbands1", "filterbbox1", "loadcollection1"]
+    assert cube.optimize().flatten() == {
+        "loadcollection1": {
+            "process_id": "load_collection",
+            "arguments": {
+                "id": "S2",
+                "spatial_extent": {"west": 1, "east": 2, "north": 4, "south": 3, "crs": None},
+                "temporal_extent": None,
+                "bands": ["red"],
+            },
+            "result": True,
+        }
+    }
+
+
+def test_connection_optimize_graphs(con100):
+    cube = con100.load_collection("S2").filter_temporal("2020-01-01", "2020-02-01")
+    assert sorted(get_execute_graph(cube).keys()) == ["filtertemporal1", "loadcollection1"]
+    con100.optimize_graphs = True
+    graph = get_execute_graph(cube)
+    assert sorted(graph.keys()) == ["loadcollection1"]
+    assert graph["loadcollection1"]["arguments"]["temporal_extent"] == ["2020-01-01", "2020-02-01"]
+
+
+def test_connection_optimize_graphs_merges_common_subgraphs(con100):
+    def s2():
+        return con100.load_collection("S2").filter_bbox(west=1, south=2, east=3, north=4)
+
+    cube = s2().merge(s2())
+    assert sorted(get_execute_graph(cube).keys()) == [
+        "filterbbox1", "filterbbox2", "loadcollection1", "loadcollection2", "mergecubes1"
+    ]
+    con100.optimize_graphs = True
+    graph = get_execute_graph(cube)
+    assert sorted(graph.keys()) == ["loadcollection1", "mergecubes1"]
+    assert graph["mergecubes1"]["arguments"]["cube1"] == graph["mergecubes1"]["arguments"]["cube2"]
+
+
+def test_execute_long_chain_optimized(con100, requests_mock):
+    requests_mock.post(API_URL + "/result", json={"ok": True})
+    cube = con100.load_collection("S2").filter_bbox(west=1, south=2, east=3, north=4)
+    pg = cube._pg
+    for _ in range(5000):
+        pg = PGNode("absolute", data={"from_node": pg})
+    con100.optimize_graphs = True
+    assert DataCube(graph=pg, connection=con100).execute() == {"ok": True}
+    graph = requests_mock.last_request.json()["process"]["process_graph"]
+    assert len(graph) == 5001
+    assert graph["loadcollection1"]["arguments"]["spatial_extent"] == {
+        "west": 1, "south": 2, "east": 3, "north": 4, "crs": None
+    }
+
+
+def test_elementwise_scalar_operations_fused_in_apply(con100):
+    cube = con100.load_collection("S2")
+    result = (cube * 0.0001 - 0.1) / 2
+    assert result.flatten() == {
+        "loadcollection1": {
+            "process_id": "load_collection",
+            "arguments": {"id": "S2", "spatial_extent": None, "temporal_extent": None},
+        },
+        "apply1": {
+            "process_id": "apply",
+            "arguments": {
+                "data": {"from_node": "loadcollection1"},
+                "process": {"process_graph": {
+                    "multiply1": {"process_id": "multiply", "arguments": {"x": {"from_parameter": "x"}, "y": 0.0001}},
+                    "subtract1": {"process_id": "subtract", "arguments": {"x": {"from_node": "multiply1"}, "y": 0.1}},
+                    "divide1": {
+                        "process_id": "divide", "arguments": {"x": {"from_node": "subtract1"}, "y": 2}, "result": True
+                    },
+                }},
+            },
+            "result": True,
+        },
+    }
+
+
+def test_elementwise_operations_reverse_unary_and_folding(con100):
+    cube = con100.load_collection("S2")
+    result = ~(1 - (3 * (cube * 2)))
+    callback = result.flatten()["apply1"]["arguments"]["process"]["process_graph"]
+    assert callback == {
+        "multiply1": {"process_id": "multiply", "arguments": {"x": {"from_parameter": "x"}, "y": 6}},
+        "subtract1": {"process_id": "subtract", "arguments": {"x": 1, "y": {"from_node": "multiply1"}}},
+        "not1": {"process_id": "not", "arguments": {"x": {"from_node": "subtract1"}}, "result": True},
+    }
+
+
+def test_elementwise_cube_operations_fused_in_apply(con100):
+    cube = con100.load_collection("S2")
+    result = (cube * 2) + (cube - 1)
+    assert sorted(result.flatten().keys()) == ["apply1", "loadcollection1"]
+    assert result.flatten()["apply1"]["arguments"]["process"]["process_graph"] == {
+        "multiply1": {"process_id": "multiply", "arguments": {"x": {"from_parameter": "x"}, "y": 2}},
+        "subtract1": {"process_id": "subtract", "arguments": {"x": {"from_parameter": "x"}, "y": 1}},
+        "add1": {
+            "process_id": "add", "arguments": {"x": {"from_node": "multiply1"}, "y": {"from_node": "subtract1"}},
+            "result": True
+        },
+    }
+    # Different input cubes still need `merge_cubes`
+    other = con100.load_collection("MASK", fetch_metadata=False)
+    merged = (cube * 2) + other
+    assert sorted(merged.flatten().keys()) == ["apply1", "loadcollection1", "loadcollection2", "mergecubes1"]
+
+
+def test_download_to_buffer(con100, requests_mock):
+    def result(request, context):
+        assert request.json()["process"]["process_graph"]["saveresult1"]["arguments"]["format"] == "netCDF"
+        return b"netCDF data"
+
+    requests_mock.post(API_URL + "/result", content=result)
+    cube = con100.load_collection("S2")
+    with cube.download_to_buffer(format="netCDF") as buffer:
+        assert buffer.read() == b"netCDF data"
+    assert requests_mock.last_request.timeout == 1000
+    with cube.download_to_buffer(format="netCDF", timeout=60) as buffer:
+        assert buffer.read() == b"netCDF data"
+    assert requests_mock.last_request.timeout == 60
+
+
+def test_to_xarray(con100, requests_mock):
+    xarray = pytest.importorskip("xarray")
+    pytest.importorskip("h5netcdf")
+    import io
+    data = io.BytesIO()
+    xarray.Dataset({"B02": (("y", "x"), [[1, 2], [3, 4]])}).to_netcdf(data, engine="h5netcdf")
+    requests_mock.post(API_URL + "/result", content=data.getvalue())
+    cube = con100.load_collection("S2")
+    ds = cube.to_xarray()
+    assert ds["B02"].values.tolist() == [[1, 2], [3, 4]]
+    assert cube.execute_to_array(format="netCDF", timeout=60).tolist() == [[[1, 2], [3, 4]]]
+    assert requests_mock.last_request.timeout == 60
+
+
+def test_execute_to_array_gtiff(con100, requests_mock):
+    rasterio = pytest.importorskip("rasterio")
+    import numpy as np
+    import rasterio.io
+    with rasterio.io.MemoryFile() as memory_file:
+        with memory_file.open(driver="GTiff", width=2, height=2, count=2, dtype="uint16") as dataset:
+            dataset.write(np.array([[[1, 2], [3, 4]], [[5, 6], [7, 8]]], dtype="uint16"))
+        data = memory_file.read()
+
+    def result(request, context):
+        assert request.json()["process"]["process_graph"]["saveresult1"]["arguments"]["format"] == "GTiff"
+        return data
+
+    requests_mock.post(API_URL + "/result", content=result)
+    cube = con100.load_collection("S2")
+    array = cube.execute_to_array(format="GTiff", timeout=60)
+    assert array.tolist() == [[[1, 2], [3, 4]], [[5, 6], [7, 8]]]
+    assert requests_mock.last_request.timeout == 60
+
+
+def test_execute_to_array_unsupported_format(con100):
+    with pytest.raises(ValueError, match="Unsupported format"):
+        con100.load_collection("S2").execute_to_array(format="JSON")
+
+
+def test_download_tiled(con100, requests_mock, tmp_path):
+    extents = []
+
+    def result(request, context):
+        graph = request.json()["process"]["process_graph"]
+        extent = graph["loadcollection1"]["arguments"]["spatial_extent"]
+        extents.append(extent)
+        if len(extents) == 1:
+            context.status_code = 502
+            return b"Bad gateway"
+        return "tile {w}-{s}".format(w=extent["west"], s=extent["south"]).encode("utf-8")
+
+    requests_mock.post(API_URL + "/result", content=result)
+    cube = con100.load_collection("S2").filter_bbox(west=0, south=0, east=4, north=2)
+    tiles = cube.download_tiled(tmp_path, tile_size=2, retry_interval=0, max_workers=1)
+    assert len(extents) == 3
+    assert [(t.row, t.col, p.name) for t, p in tiles] == [
+        (0, 0, "tile_0_0.tiff"), (0, 1, "tile_0_1.tiff")
+    ]
+    assert (tmp_path / "tile_0_1.tiff").read_bytes() == b"tile 2-0"
+    index = json.loads((tmp_path / "tiles.json").read_text())
+    assert [(t["row"], t["col"], t["extent"]["west"], t["path"]) for t in index] == [
+        (0, 0, 0, "tile_0_0.tiff"), (0, 1, 2, "tile_0_1.tiff")
+    ]
+
+
+@pytest.mark.parametrize("optimize_graphs", [False, True])
+def test_download_tiled_optimize_graphs(con100, requests_mock, tmp_path, optimize_graphs):
+    graphs = []
+
+    def result(request, context):
+        graphs.append(request.json()["process"]["process_graph"])
+        return b"tile"
+
+    requests_mock.post(API_URL + "/result", content=result)
+    con100.optimize_graphs = optimize_graphs
+    cube = con100.load_collection("S2").filter_bbox(west=0, south=0, east=4, north=2)
+    pg = cube._pg
+    for _ in range(5000):
+        pg = PGNode("absolute", data={"from_node": pg})
+    DataCube(graph=pg, connection=con100).download_tiled(tmp_path, tile_size=2, max_workers=1)
+    assert [g["loadcollection1"]["arguments"]["spatial_extent"]["west"] for g in graphs] == [0, 2]
+    assert ("filterbbox1" in graphs[0]) is not optimize_graphs
+
+
+def test_download_tiled_broken_stream(con100, requests_mock, tmp_path, monkeypatch):
+    requests_mock.post(API_URL + "/result", content=b"complete tile")
+    download = con100.download
+    calls = []
+
+    def broken_download(graph, outputfile, timeout=None):
+        calls.append(outputfile)
+        if len(calls) == 1:
+            # Connection drops halfway the response.
+            pathlib.Path(outputfile).write_bytes(b"compl")
+            raise urllib3.exceptions.ProtocolError("Connection broken: IncompleteRead")
+        download(graph, outputfile, timeout=timeout)
+
+    monkeypatch.setattr(con100, "download", broken_download)
+    cube = con100.load_collection("S2").filter_bbox(west=0, south=0, east=2, north=2)
+    tiles = cube.download_tiled(tmp_path, tile_size=2, retry_interval=0, max_workers=1)
+    assert len(calls) == 2
+    assert [p.name for t, p in tiles] == ["tile_0_0.tiff"]
+    assert (tmp_path / "tile_0_0.tiff").read_bytes() == b"complete tile"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["tile_0_0.tiff", "tiles.json"]
+
+
+def test_download_tiled_failure_leaves_no_partial_tile(con100, requests_mock, tmp_path, monkeypatch):
+    def broken_download(graph, outputfile, timeout=None):
+        pathlib.Path(outputfile).write_bytes(b"compl")
+        raise OpenEoApiError(http_status_code=400, message="Invalid")
+
+    monkeypatch.setattr(con100, "download", broken_download)
+    cube = con100.load_collection("S2").filter_bbox(west=0, south=0, east=2, north=2)
+    with pytest.raises(OpenEoApiError, match="Invalid"):
+        cube.download_tiled(tmp_path, tile_size=2, retry_interval=0, max_workers=1)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_download_tiled_no_extent(con100, tmp_path):
+    with pytest.raises(OpenEoClientException, match="No \\(bounding box\\) spatial extent"):
+        con100.load_collection("S2").download_tiled(tmp_path, tile_size=2)
+
+
+def test_execute_timeseries_chunked(con100, requests_mock):
+    calls = []
+
+    def result(request, context):
+        graph = request.json()["process"]["process_graph"]
+        start, end = graph["loadcollection1"]["arguments"]["temporal_extent"]
+        geometries = graph["aggregatespatial1"]["arguments"]["geometries"]["geometries"]
+        calls.append((start, len(geometries)))
+        if len(calls) == 1:
+            context.status_code = 503
+            return {"code": "Unavailable", "message": "Try again"}
+        return {start: [[g["coordinates"][0]] for g in geometries]}
+
+    requests_mock.post(API_URL + "/result", json=result)
+    polygons = shapely.geometry.GeometryCollection([shapely.geometry.Point(i, i) for i in range(3)])
+    cube = con100.load_collection("S2").filter_temporal("2019-01-01", "2019-03-01").polygonal_mean_timeseries(polygons)
+    timeseries = cube.execute_timeseries_chunked(
+        temporal_chunk=30, geometry_chunk_size=2, max_workers=1, retry_interval=0
+    )
+    assert timeseries == {
+        "2019-01-01": [[0.0], [1.0], [2.0]],
+        "2019-01-31": [[0.0], [1.0], [2.0]],
+    }
+    assert sorted(calls[1:]) == [("2019-01-01", 1), ("2019-01-01", 2), ("2019-01-31", 1), ("2019-01-31", 2)]
+
+
+@pytest.mark.parametrize("optimize_graphs", [False, True])
+def test_execute_timeseries_chunked_optimize_graphs(con100, requests_mock, optimize_graphs):
+    graphs = []
+
+    def result(request, context):
+        graph = request.json()["process"]["process_graph"]
+        graphs.append(graph)
+        return {graph["loadcollection1"]["arguments"]["temporal_extent"][0]: [[1.0]]}
+
+    requests_mock.post(API_URL + "/result", json=result)
+    con100.optimize_graphs = optimize_graphs
+    cube = con100.load_collection("S2").filter_temporal("2019-01-01", "2019-03-01")
+    pg = cube._pg
+    for _ in range(5000):
+        pg = PGNode("absolute", data={"from_node": pg})
+    cube = DataCube(graph=pg, connection=con100).polygonal_mean_timeseries(shapely.geometry.box(0, 0, 1, 1))
+    timeseries = cube.execute_timeseries_chunked(temporal_chunk=30, max_workers=1)
+    assert timeseries == {"2019-01-01": [[1.0]], "2019-01-31": [[1.0]]}
+    assert ("filtertemporal1" in graphs[0]) is not optimize_graphs
+
+
+def test_execute_timeseries_chunked_no_temporal_extent(con100):
+    cube = con100.load_collection("S2").polygonal_mean_timeseries(shapely.geometry.box(0, 0, 1, 1))
+    with pytest.raises(OpenEoClientException, match="No \\(closed\\) temporal extent"):
+        cube.execute_timeseries_chunked()
+
+
+def test_to_template(con100):
+    cube = con100.load_collection(
+        "S2", spatial_extent={"from_parameter": "bbox"}, temporal_extent={"from_parameter": "dates"}
+    ).max_time()
+    template = cube.to_template()
+    assert template.parameters == ["bbox", "dates"]
+    assert con100.load_collection(
+        "S2", spatial_extent={"from_parameter": "bbox"}, temporal_extent={"from_parameter": "dates"}
+    ).max_time().to_template() is template
+    graph = template.render(bbox={"west": 3, "south": 51, "east": 4, "north": 52}, dates=["2020-01-01", "2020-02-01"])
+    assert graph["loadcollection1"]["arguments"] == {
+        "id": "S2",
+        "spatial_extent": {"west": 3, "south": 51, "east": 4, "north": 52},
+        "temporal_extent": ["2020-01-01", "2020-02-01"],
+    }
+
+
+def test_datacube_from_flat_graph(con100: Connection):
+    original = con100.load_collection("S2").filter_temporal("2020-01-01", "2020-02-01")
+    flat = json.loads(json.dumps(original.graph))
+    cube = DataCube(graph=PGNode.from_flat_graph(flat), connection=con100, metadata=original.metadata)
+    assert cube.max_time().graph == {
+        "loadcollection1": {
+            "process_id": "load_collection",
+            "arguments": {"id": "S2", "spatial_extent": None, "temporal_extent": None},
+        },
+        "filtertemporal1": {
+            "process_id": "filter_temporal",
+            "arguments": {"data": {"from_node": "loadcollection1"}, "extent": ["2020-01-01", "2020-02-01"]},
+        },
+        "reducedimension1": {
+            "process_id": "reduce_dimension",
+            "arguments": {
+                "data": {"from_node": "filtertemporal1"},
+                "dimension": "t",
+                "reducer": {"process_graph": {
+                    "max1": {"process_id": "max", "arguments": {"data": {"from_parameter": "data"}}, "result": True}
+                }},
+            },
+            "result": True,
+        },
+    }
+
+
+def test_mask_polygon_geometry_encoding(con100: Connection):
+    con100.geometry_encoding = GeometryEncoding(precision=2)
+    img = con100.load_collection("S2", spatial_extent={"west": 0.5, "south": 0.5, "east": 3, "north": 3})
+    masked = img.mask_polygon(mask=shapely.geometry.box(0.123, 0.123, 1.567, 1.567))
+    mask = masked.graph["mask1"]["arguments"]["mask"]
+    assert mask["crs"] == {"type": "name", "properties": {"name": "EPSG:4326"}}
+    assert shapely.geometry.shape(mask).equals(shapely.geometry.box(0.5, 0.5, 1.57, 1.57))
+
+
+def test_polygonal_timeseries_geometry_upload(con100: Connection, requests_mock):
+    con100.geometry_encoding = GeometryEncoding(upload_threshold=1000)
+    upload = requests_mock.put(re.compile(API_URL + "/files/openeo-python-client/geometries/.*"), text="")
+    cube = con100.load_collection("S2").polygonal_mean_timeseries(shapely.geometry.Point(3, 51).buffer(1))
+    assert upload.call_count == 1
+    filename = cube.graph["readvector1"]["arguments"]["filename"]
+    assert upload.last_request.path.endswith(filename)
+    assert cube.graph["aggregatespatial1"]["arguments"]["geometries"] == {"from_node": "readvector1"}
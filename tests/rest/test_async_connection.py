@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from openeo.capabilities import ApiVersionException
+from openeo.rest import JobFailedException, OpenEoClientException
+from openeo.rest.async_connection import AsyncConnection, AsyncRESTJob, AsyncDataCube
+from openeo.rest.auth.auth import BearerAuth
+from openeo.rest.connection import OpenEoApiError
+from openeo.rest.datacube import DataCube
+
+TIFF_CONTENT = b'T1f7D6t6l0l' * 1000
+
+
+def build_backend(api_version="1.0.0", job_statuses=("queued", "running", "finished")):
+    """Build a fake openEO backend as local `aiohttp` application (and a dict to inspect its state)."""
+    state = {"requests": [], "statuses": list(job_statuses)}
+
+    async def capabilities(request):
+        return web.json_response({"api_version": api_version})
+
+    async def collection(request):
+        return web.json_response({"cube:dimensions": {
+            "bands": {"type": "bands", "values": ["B02", "B03", "B04"]}
+        }})
+
+    async def result(request):
+        state["requests"].append(await request.json())
+        return web.json_response({"answer": 42})
+
+    async def create_job(request):
+        state["requests"].append(await request.json())
+        return web.Response(status=201, headers={"OpenEO-Identifier": "j0b"})
+
+    async def start_job(request):
+        return web.Response(status=202)
+
+    async def describe_job(request):
+        if request.headers.get("Authorization") != "Bearer s3cr3t":
+            return web.json_response({"code": "AuthenticationRequired", "message": "nope"}, status=401)
+        status = state["statuses"].pop(0) if len(state["statuses"]) > 1 else state["statuses"][0]
+        return web.json_response({"id": request.match_info["job_id"], "status": status})
+
+    async def job_results(request):
+        return web.json_response({"assets": {
+            "1.tiff": {"href": str(request.url.with_path("/dl/1.tiff"))},
+            "2.tiff": {"href": str(request.url.with_path("/dl/2.tiff"))},
+        }})
+
+    async def download(request):
+        return web.Response(body=TIFF_CONTENT)
+
+    app = web.Application()
+    app.router.add_get("/", capabilities)
+    app.router.add_get("/collections/S2", collection)
+    app.router.add_post("/result", result)
+    app.router.add_post("/jobs", create_job)
+    app.router.add_post("/jobs/{job_id}/results", start_job)
+    app.router.add_get("/jobs/{job_id}", describe_job)
+    app.router.add_get("/jobs/{job_id}/results", job_results)
+    app.router.add_get("/dl/{name}", download)
+    return app, state
+
+
+def run_with_backend(coroutine_function, app=None):
+    """Run given `coroutine_function(url)` against a local fake backend."""
+    app = app or build_backend()[0]
+
+    async def main():
+        async with TestServer(app) as server:
+            return await coroutine_function(str(server.make_url("/")))
+
+    return asyncio.run(main())
+
+
+def test_load_collection_and_execute():
+    async def scenario(url):
+        async with AsyncConnection(url) as connection:
+            cube = await connection.load_collection("S2", bands=["B03"])
+            assert isinstance(cube, AsyncDataCube)
+            assert isinstance(cube.cube, DataCube)
+            assert cube.metadata.band_names == ["B03"]
+            return await cube.execute()
+
+    app, state = build_backend()
+    assert run_with_backend(scenario, app) == {"answer": 42}
+    assert state["requests"] == [{"process": {"process_graph": {"loadcollection1": {
+        "process_id": "load_collection",
+        "arguments": {"id": "S2", "spatial_extent": None, "temporal_extent": None, "bands": ["B03"]},
+        "result": True,
+    }}}}]
+
+
+def test_cube_building_and_band_math(tmp_path):
+    async def scenario(url):
+        async with AsyncConnection(url, optimize_graphs=True) as connection:
+            cube = await connection.load_collection("S2")
+            cube = cube.filter_bbox(west=1, south=2, east=3, north=4)
+            cube = cube.filter_bands(["B02"]) * 2 + cube.filter_bands(["B03"])
+            assert isinstance(cube, AsyncDataCube)
+            assert isinstance(cube.cube, DataCube)
+            assert cube.connection is connection
+            with pytest.raises(OpenEoClientException, match="'download_tiled' is not supported"):
+                cube.download_tiled(tmp_path, tile_size=1)
+            await cube.download(tmp_path / "result.tiff")
+            return await cube.execute()
+
+    app, state = build_backend()
+    assert run_with_backend(scenario, app) == {"answer": 42}
+    download_graph, execute_graph = [r["process"]["process_graph"] for r in state["requests"]]
+    assert download_graph["saveresult1"]["arguments"]["format"] == "GTIFF"
+    # filter_bbox is pushed down into load_collection (optimize_graphs)
+    assert {n["process_id"] for n in execute_graph.values()} == {
+        "load_collection", "filter_bands", "apply", "merge_cubes"
+    }
+    assert execute_graph["loadcollection1"]["arguments"]["spatial_extent"] == {
+        "west": 1, "south": 2, "east": 3, "north": 4, "crs": None
+    }
+
+
+def test_api_version_check():
+    async def scenario(url):
+        async with AsyncConnection(url) as connection:
+            await connection.capabilities()
+
+    with pytest.raises(ApiVersionException):
+        run_with_backend(scenario, build_backend(api_version="0.4.0")[0])
+
+
+def test_batch_jobs_concurrently(tmp_path):
+    async def scenario(url):
+        async with AsyncConnection(url, auth=BearerAuth("s3cr3t")) as connection:
+            cube = await connection.load_collection("S2")
+            jobs = await asyncio.gather(*(cube.send_job(out_format="GTiff") for _ in range(3)))
+            assert all(isinstance(j, AsyncRESTJob) and j.job_id == "j0b" for j in jobs)
+            await asyncio.gather(*(j.start_and_wait(print=lambda m: None, max_poll_interval=0.01) for j in jobs))
+            return await jobs[0].download_results(tmp_path / "results")
+
+    assets = run_with_backend(scenario)
+    assert sorted(p.name for p in assets) == ["1.tiff", "2.tiff"]
+    assert (tmp_path / "results" / "1.tiff").read_bytes() == TIFF_CONTENT
+    assert (tmp_path / "results" / "2.tiff").read_bytes() == TIFF_CONTENT
+
+
+def test_job_failure_and_api_error():
+    async def scenario(url):
+        async with AsyncConnection(url, auth=BearerAuth("s3cr3t")) as connection:
+            job = connection.job("j0b")
+            with pytest.raises(JobFailedException, match="Status: error"):
+                await job.start_and_wait(print=lambda m: None, max_poll_interval=0.01)
+        async with AsyncConnection(url) as connection:
+            with pytest.raises(OpenEoApiError, match=r"\[401\] AuthenticationRequired: nope"):
+                await connection.job("j0b").describe_job()
+
+    run_with_backend(scenario, build_backend(job_statuses=("running", "error"))[0])
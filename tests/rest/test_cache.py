@@ -0,0 +1,162 @@
+import json
+import os
+
+import pytest
+
+import openeo
+from openeo.rest.cache import MemoryCache, DiskCache, CacheEntry
+
+API_URL = "https://oeo.net"
+
+
+class FakeTime:
+    def __init__(self, now=1000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake_time = FakeTime()
+    monkeypatch.setattr("openeo.rest.cache.ResponseCache._now", fake_time)
+    return fake_time
+
+
+def test_memory_cache_lru():
+    cache = MemoryCache(max_size=2)
+    cache.set("a", CacheEntry({"a": 1}, None, 0))
+    cache.set("b", CacheEntry({"b": 2}, None, 0))
+    assert cache.get("a").data == {"a": 1}
+    cache.set("c", CacheEntry({"c": 3}, None, 0))
+    assert cache.get("b") is None
+    assert cache.get("a").data == {"a": 1}
+    assert cache.get("c").data == {"c": 3}
+    assert len(cache) == 2
+
+
+def test_memory_cache_returns_copy():
+    cache = MemoryCache()
+    cache.set("a", CacheEntry({"a": [1, 2]}, None, 0))
+    cache.get("a").data["a"].append(3)
+    assert cache.get("a").data == {"a": [1, 2]}
+
+
+def test_memory_cache_stores_copy():
+    cache = MemoryCache()
+    data = {"a": [1, 2]}
+    cache.set("a", CacheEntry(data, None, 0))
+    data["a"].append(3)
+    assert cache.get("a").data == {"a": [1, 2]}
+
+
+def test_disk_cache_shared(tmp_path):
+    DiskCache(directory=tmp_path).set("https://oeo.net/collections", CacheEntry({"c": [1]}, '"e7ag"', 123))
+    entry = DiskCache(directory=tmp_path).get("https://oeo.net/collections")
+    assert entry == CacheEntry({"c": [1]}, '"e7ag"', 123)
+    assert DiskCache(directory=tmp_path).get("https://oeo.net/processes") is None
+    assert [p.suffix for p in tmp_path.iterdir()] == [".json"]
+
+
+def test_disk_cache_max_size(tmp_path):
+    cache = DiskCache(directory=tmp_path, max_size=2)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.set(key, CacheEntry({key: i}, None, 0))
+        # Explicit modification times: file system timestamps might be too coarse.
+        os.utime(str(cache._path(key)), (1000 + i, 1000 + i))
+        cache._evict()
+    assert cache.get("a") is None
+    assert cache.get("b").data == {"b": 1}
+    assert cache.get("c").data == {"c": 2}
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+@pytest.mark.parametrize("cache_factory", [MemoryCache, DiskCache])
+def test_connection_response_cache_ttl_and_etag(requests_mock, tmp_path, fake_time, cache_factory):
+    cache = cache_factory(ttl=60) if cache_factory is MemoryCache else cache_factory(directory=tmp_path, ttl=60)
+    requests_mock.get(API_URL + "/", json={"api_version": "1.0.0"})
+
+    def collection(request, context):
+        if request.headers.get("If-None-Match") == '"v1"':
+            context.status_code = 304
+            return None
+        context.headers["ETag"] = '"v1"'
+        return {"id": "S2", "description": "Sentinel 2"}
+
+    s2 = requests_mock.get(API_URL + "/collections/S2", json=collection)
+    con = openeo.connect(API_URL, options=openeo.ConnectionOptions(response_cache=cache))
+    for _ in range(3):
+        assert con.describe_collection("S2") == {"id": "S2", "description": "Sentinel 2"}
+    assert s2.call_count == 1
+
+    # Other connection sharing same cache.
+    con2 = openeo.connect(API_URL, options=openeo.ConnectionOptions(response_cache=cache))
+    con2.load_collection("S2")
+    assert s2.call_count == 1
+
+    # Expired: revalidation with ETag
+    fake_time.now += 100
+    assert con.describe_collection("S2") == {"id": "S2", "description": "Sentinel 2"}
+    assert s2.call_count == 2
+    assert s2.last_request.headers["If-None-Match"] == '"v1"'
+    # Revalidated entry is fresh again
+    assert con.describe_collection("S2") == {"id": "S2", "description": "Sentinel 2"}
+    assert s2.call_count == 2
+
+
+@pytest.mark.parametrize("cache_factory", [MemoryCache, DiskCache])
+def test_connection_response_cache_per_user(requests_mock, tmp_path, cache_factory):
+    cache = cache_factory() if cache_factory is MemoryCache else cache_factory(directory=tmp_path)
+    requests_mock.get(API_URL + "/", json={"api_version": "1.0.0"})
+    requests_mock.get(API_URL + "/credentials/basic", text=lambda request, context: json.dumps(
+        {"access_token": "t0k3n-" + request.headers["Authorization"]}
+    ))
+
+    def processes(request, context):
+        user = request.headers.get("Authorization", "anonymous")
+        return {"processes": [{"id": "add"}, {"id": "private_to_" + user}]}
+
+    processes_mock = requests_mock.get(API_URL + "/processes", json=processes)
+    anonymous = openeo.connect(API_URL, options=openeo.ConnectionOptions(response_cache=cache))
+    alice = openeo.connect(API_URL, options=openeo.ConnectionOptions(response_cache=cache)).authenticate_basic("alice", "4l1c3")
+    bob = openeo.connect(API_URL, options=openeo.ConnectionOptions(response_cache=cache)).authenticate_basic("bob", "b0b")
+    alice2 = openeo.connect(API_URL, options=openeo.ConnectionOptions(response_cache=cache)).authenticate_basic("alice", "4l1c3")
+    for _ in range(2):
+        assert anonymous.list_processes()[1] == {"id": "private_to_anonymous"}
+        assert alice.list_processes()[1]["id"].startswith("private_to_Bearer t0k3n-Basic")
+        assert bob.list_processes()[1] != alice.list_processes()[1]
+        assert alice2.list_processes() == alice.list_processes()
+    assert processes_mock.call_count == 3
+
+
+@pytest.mark.parametrize("cache_factory", [MemoryCache, DiskCache])
+def test_connection_response_cache_caller_manipulation(requests_mock, tmp_path, fake_time, cache_factory):
+    cache = cache_factory(ttl=60) if cache_factory is MemoryCache else cache_factory(directory=tmp_path, ttl=60)
+    requests_mock.get(API_URL + "/", json={"api_version": "1.0.0"})
+
+    def collection(request, context):
+        if request.headers.get("If-None-Match") == '"v1"':
+            context.status_code = 304
+            return None
+        context.headers["ETag"] = '"v1"'
+        return {"id": "S2", "links": []}
+
+    requests_mock.get(API_URL + "/collections/S2", json=collection)
+    con = openeo.connect(API_URL, options=openeo.ConnectionOptions(response_cache=cache))
+    # Cache miss, fresh cache hit and revalidation (304)
+    for expire in [False, False, True, False]:
+        fake_time.now += 100 if expire else 0
+        metadata = con.describe_collection("S2")
+        assert metadata == {"id": "S2", "links": []}
+        metadata["links"].append({"href": "https://evil.test"})
+        metadata["id"] = "S3"
+
+
+def test_connection_without_cache(requests_mock):
+    requests_mock.get(API_URL + "/", json={"api_version": "1.0.0"})
+    processes = requests_mock.get(API_URL + "/processes", json={"processes": [{"id": "add"}]})
+    con = openeo.connect(API_URL)
+    for _ in range(3):
+        assert con.list_processes() == [{"id": "add"}]
+    assert processes.call_count == 3
@@ -1,12 +1,23 @@
+import gzip
+import http.server
+import json
 import re
+import threading
+import time
 import unittest.mock as mock
 
 import pytest
+import requests
 import requests_mock
 
 from openeo.rest import OpenEoClientException
-from openeo.rest.auth.auth import NullAuth, BearerAuth
-from openeo.rest.connection import Connection, RestApiConnection, connect, OpenEoApiError
+from openeo.rest.auth.auth import NullAuth, BearerAuth, RefreshingBearerAuth
+from openeo.rest.auth.oidc import OidcTokenStore
+from openeo.rest.cache import MemoryCache
+from openeo.rest.connection import Connection, RestApiConnection, connect, OpenEoApiError, configure_session, \
+    build_retry, RETRY_STATUS_CODES, ConnectionOptions
+
+from .conftest import _jwt_encode
 
 API_URL = "https://oeo.net/"
 
@@ -151,6 +162,20 @@ def test_authenticate_basic(requests_mock):
     conn.authenticate_basic(username="john", password="j0hn")
     assert isinstance(conn.auth, BearerAuth)
     assert conn.auth.bearer == "w3lc0m3"
+    assert conn._auth_identity() == "basic:john"
+
+
+def test_auth_identity(requests_mock):
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    conn = Connection(API_URL)
+    assert conn._auth_identity() is None
+    conn.auth = BearerAuth(bearer="s3cr3t")
+    identity = conn._auth_identity()
+    assert identity.startswith("bearer:") and "s3cr3t" not in identity
+    conn.auth = BearerAuth(bearer="0th3r")
+    assert conn._auth_identity() != identity
+    conn.auth = BearerAuth(bearer="0th3r", identity="john")
+    assert conn._auth_identity() == "john"
 
 
 def test_authenticate_oidc(oidc_test_setup, requests_mock):
@@ -168,6 +193,201 @@ def test_authenticate_oidc(oidc_test_setup, requests_mock):
     assert conn.auth.bearer == state["access_token"]
 
 
+def test_authenticate_oidc_cached_discovery(oidc_test_setup, requests_mock):
+    client_id = "myclient"
+    oidc_discovery_url = API_URL + "credentials/oidc"
+    state, webbrowser_open = oidc_test_setup(client_id=client_id, oidc_discovery_url=oidc_discovery_url)
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    cache = MemoryCache(ttl=60)
+    for _ in range(2):
+        conn = Connection(API_URL, options=ConnectionOptions(response_cache=cache))
+        conn.authenticate_OIDC(client_id=client_id, webbrowser_open=webbrowser_open)
+        assert conn.auth.bearer == state["access_token"]
+    discovery_requests = [r for r in requests_mock.request_history if r.url == oidc_discovery_url]
+    assert len(discovery_requests) == 1
+
+
+def test_authenticate_oidc_token_store(oidc_test_setup, requests_mock, tmp_path):
+    client_id = "myclient"
+    state, webbrowser_open = oidc_test_setup(client_id=client_id, oidc_discovery_url=API_URL + "credentials/oidc")
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    store = OidcTokenStore(tmp_path / "tokens.json")
+
+    conn = Connection(API_URL)
+    conn.authenticate_OIDC(client_id=client_id, webbrowser_open=webbrowser_open, token_store=store)
+    assert isinstance(conn.auth, RefreshingBearerAuth)
+    assert conn.auth.bearer == state["access_token"]
+    stored = store.get(API_URL, client_id)
+    assert stored["access_token"] == state["access_token"]
+    assert stored["token_endpoint"] == "https://auth.example.com/token"
+    assert stored["refresh_token"] is not None
+
+
+def test_authenticate_oidc_token_store_reuse(requests_mock, tmp_path):
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    token_mock = requests_mock.post("https://auth.example.com/token", json={"access_token": "n3w"})
+    store = OidcTokenStore(tmp_path / "tokens.json")
+    access_token = _jwt_encode({}, {"sub": "123", "exp": time.time() + 3600})
+    store.set(API_URL, "myclient", access_token=access_token, refresh_token="r3fr35h",
+              token_endpoint="https://auth.example.com/token")
+
+    conn = Connection(API_URL)
+    # No interactive flow, no token request: stored access token is still valid.
+    conn.authenticate_OIDC(client_id="myclient", webbrowser_open=pytest.fail, token_store=store)
+    assert conn.auth.bearer == access_token
+    assert token_mock.call_count == 0
+    assert conn._auth_identity() == "oidc:myclient:123"
+
+
+def test_authenticate_oidc_token_store_refresh(requests_mock, tmp_path):
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    new_access_token = _jwt_encode({}, {"sub": "123", "exp": time.time() + 3600})
+    token_mock = requests_mock.post("https://auth.example.com/token", json={
+        "access_token": new_access_token, "refresh_token": "r3fr35h2"
+    })
+    store = OidcTokenStore(tmp_path / "tokens.json")
+    expired = _jwt_encode({}, {"sub": "123", "exp": time.time() - 10})
+    store.set(API_URL, "myclient", access_token=expired, refresh_token="r3fr35h",
+              token_endpoint="https://auth.example.com/token")
+
+    conn = Connection(API_URL)
+    conn.authenticate_OIDC(client_id="myclient", webbrowser_open=pytest.fail, token_store=store)
+    assert conn.auth.bearer == new_access_token
+    assert token_mock.call_count == 1
+    assert "grant_type=refresh_token" in token_mock.last_request.text
+    assert store.get(API_URL, "myclient")["refresh_token"] == "r3fr35h2"
+
+
+def test_authenticate_oidc_token_store_refresh_failure(oidc_test_setup, requests_mock, tmp_path):
+    client_id = "myclient"
+    state, webbrowser_open = oidc_test_setup(client_id=client_id, oidc_discovery_url=API_URL + "credentials/oidc")
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    store = OidcTokenStore(tmp_path / "tokens.json")
+    expired = _jwt_encode({}, {"sub": "123", "exp": time.time() - 10})
+    store.set(API_URL, client_id, access_token=expired, refresh_token="r3fr35h",
+              token_endpoint="https://auth.example.com/expired")
+    requests_mock.post("https://auth.example.com/expired", status_code=400, json={"error": "invalid_grant"})
+
+    conn = Connection(API_URL)
+    # Fall back on interactive flow
+    conn.authenticate_OIDC(client_id=client_id, webbrowser_open=webbrowser_open, token_store=store)
+    assert conn.auth.bearer == state["access_token"]
+    assert store.get(API_URL, client_id)["access_token"] == state["access_token"]
+
+
+def test_authenticate_oidc_proactive_refresh(requests_mock, tmp_path):
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    new_access_token = _jwt_encode({}, {"sub": "123", "exp": time.time() + 3600})
+    token_mock = requests_mock.post("https://auth.example.com/token", json={"access_token": new_access_token})
+    store = OidcTokenStore(tmp_path / "tokens.json")
+    # Access token that expires within the refresh margin.
+    access_token = _jwt_encode({}, {"sub": "123", "exp": time.time() + 600})
+    store.set(API_URL, "myclient", access_token=access_token, refresh_token="r3fr35h",
+              token_endpoint="https://auth.example.com/token")
+
+    conn = Connection(API_URL)
+    conn.authenticate_OIDC(client_id="myclient", token_store=store, refresh_margin=60)
+    assert token_mock.call_count == 0
+    conn.auth.refresh_margin = 900
+    requests_mock.get(API_URL + "me", json={"user_id": "john"})
+    conn.describe_account()
+    assert token_mock.call_count == 1
+    assert requests_mock.last_request.headers["Authorization"] == "Bearer " + new_access_token
+    assert store.get(API_URL, "myclient")["access_token"] == new_access_token
+
+
+class _RotatingTokenEndpoint:
+    """Fake token endpoint that rotates the refresh token: each refresh token can only be used once."""
+
+    def __init__(self, refresh_token: str):
+        self.valid = {refresh_token}
+        self.lock = threading.Lock()
+        self.grants = 0
+
+    def __call__(self, request, context):
+        refresh_token = re.search("refresh_token=([^&]+)", request.text).group(1)
+        # Slow response: give concurrent clients the chance to read the store meanwhile.
+        time.sleep(0.2)
+        with self.lock:
+            if refresh_token not in self.valid:
+                context.status_code = 400
+                return {"error": "invalid_grant"}
+            self.valid.remove(refresh_token)
+            self.grants += 1
+            new_refresh_token = "r3fr35h{g}".format(g=self.grants + 1)
+            self.valid.add(new_refresh_token)
+        access_token = _jwt_encode({}, {"sub": "123", "exp": time.time() + 3600, "grant": self.grants})
+        return {"access_token": access_token, "refresh_token": new_refresh_token}
+
+
+def _authenticate_concurrently(count: int, authenticate) -> list:
+    start = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        start.wait()
+        try:
+            results[index] = authenticate()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_authenticate_oidc_token_store_concurrent_refresh(requests_mock, tmp_path):
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    token_endpoint = _RotatingTokenEndpoint("r3fr35h")
+    requests_mock.post("https://auth.example.com/token", json=token_endpoint)
+    path = tmp_path / "tokens.json"
+    expired = _jwt_encode({}, {"sub": "123", "exp": time.time() - 10})
+    OidcTokenStore(path).set(API_URL, "myclient", access_token=expired, refresh_token="r3fr35h",
+                             token_endpoint="https://auth.example.com/token")
+
+    def authenticate():
+        # Separate connection and store instance, like separate processes.
+        conn = Connection(API_URL)
+        conn.authenticate_OIDC(client_id="myclient", webbrowser_open=pytest.fail, token_store=OidcTokenStore(path))
+        return conn.auth.bearer
+
+    results = _authenticate_concurrently(2, authenticate)
+    # Only one refresh grant: the other client uses the refreshed tokens from the store.
+    assert token_endpoint.grants == 1
+    assert results[0] == results[1]
+    assert OidcTokenStore(path).get(API_URL, "myclient") == {
+        "access_token": results[0], "refresh_token": "r3fr35h2", "token_endpoint": "https://auth.example.com/token"
+    }
+
+
+def test_authenticate_oidc_token_store_concurrent_proactive_refresh(requests_mock, tmp_path):
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    requests_mock.get(API_URL + "me", json={"user_id": "john"})
+    token_endpoint = _RotatingTokenEndpoint("r3fr35h")
+    requests_mock.post("https://auth.example.com/token", json=token_endpoint)
+    path = tmp_path / "tokens.json"
+    access_token = _jwt_encode({}, {"sub": "123", "exp": time.time() + 600})
+    OidcTokenStore(path).set(API_URL, "myclient", access_token=access_token, refresh_token="r3fr35h",
+                             token_endpoint="https://auth.example.com/token")
+    connections = []
+    for _ in range(2):
+        conn = Connection(API_URL)
+        conn.authenticate_OIDC(client_id="myclient", token_store=OidcTokenStore(path), refresh_margin=60)
+        conn.auth.refresh_margin = 900
+        connections.append(conn)
+
+    def describe_account(conn):
+        conn.describe_account()
+        return conn.auth.bearer
+
+    results = _authenticate_concurrently(2, lambda: describe_account(connections.pop()))
+    assert token_endpoint.grants == 1
+    assert results[0] == results[1] != access_token
+
+
 def test_load_collection_arguments_040(requests_mock):
     requests_mock.get(API_URL, json={"api_version": "0.4.0"})
     conn = Connection(API_URL)
@@ -262,3 +482,161 @@ def test_execute_100(requests_mock):
     assert request.call_args_list == [
         mock.call("post", path="/result", json={"process": {"process_graph": {"foo1": {"process_id": "foo"}}}})
     ]
+
+
+def test_execute_iter(requests_mock):
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    requests_mock.post(API_URL + "result", content=b'{"2019-01-01": [[1, 2]], "2019-01-02": [[3, 4]]}')
+    conn = Connection(API_URL)
+    items = conn.execute_iter({"foo1": {"process_id": "foo"}}, chunk_size=5)
+    assert list(items) == [("2019-01-01", [[1, 2]]), ("2019-01-02", [[3, 4]])]
+    assert requests_mock.last_request.json() == {"process": {"process_graph": {"foo1": {"process_id": "foo"}}}}
+
+
+@pytest.mark.parametrize(["max_memory", "rolled_over"], [(1024, False), (10, True)])
+def test_download_to_buffer(requests_mock, max_memory, rolled_over):
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    requests_mock.post(API_URL + "result", content=b"GeoTIFF data" * 10)
+    conn = Connection(API_URL)
+    with conn.download_to_buffer({"foo1": {"process_id": "foo"}}, max_memory=max_memory, chunk_size=7) as buffer:
+        assert buffer._rolled == rolled_over
+        assert buffer.read() == b"GeoTIFF data" * 10
+
+
+def test_post_json_encoding(requests_mock):
+    requests_mock.post(API_URL + "foo", json={"o": "k"})
+    conn = RestApiConnection(API_URL)
+    conn.post("/foo", json={"a": ["b", 3]})
+    request = requests_mock.last_request
+    assert request.headers["Content-Type"] == "application/json"
+    assert "Content-Encoding" not in request.headers
+    assert request.json() == {"a": ["b", 3]}
+
+
+def test_post_json_pre_encoded(requests_mock):
+    requests_mock.post(API_URL + "foo", json={"o": "k"})
+    conn = RestApiConnection(API_URL)
+    conn.post("/foo", json=b'{"a": 1}')
+    assert requests_mock.last_request.body == b'{"a": 1}'
+    assert requests_mock.last_request.headers["Content-Type"] == "application/json"
+
+
+@pytest.mark.parametrize(["size", "compressed"], [(10, False), (10000, True)])
+def test_post_json_gzip(requests_mock, size, compressed):
+    requests_mock.post(API_URL + "foo", json={"o": "k"})
+    conn = RestApiConnection(API_URL, options=ConnectionOptions(gzip_threshold=1000))
+    data = {"coordinates": list(range(size))}
+    conn.post("/foo", json=data)
+    request = requests_mock.last_request
+    if compressed:
+        assert request.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(request.body).decode("utf-8")) == data
+        assert len(request.body) < len(json.dumps(data))
+    else:
+        assert "Content-Encoding" not in request.headers
+        assert request.json() == data
+
+
+@pytest.mark.parametrize(["api_version", "expected"], [
+    ("0.4.2", {"process_graph": {"foo1": {"process_id": "foo"}}}),
+    ("1.0.0", {"process": {"process_graph": {"foo1": {"process_id": "foo"}}}}),
+])
+def test_execute_pre_encoded_graph(requests_mock, api_version, expected):
+    requests_mock.get(API_URL, json={"api_version": api_version})
+    requests_mock.post(API_URL + "result", json={"o": "k"})
+    conn = Connection(API_URL)
+    assert conn.execute(b'{"foo1": {"process_id": "foo"}}') == {"o": "k"}
+    assert requests_mock.last_request.json() == expected
+
+
+def test_create_job_pre_encoded_graph(requests_mock):
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    requests_mock.post(API_URL + "jobs", status_code=201, headers={"OpenEO-Identifier": "j-123"})
+    conn = Connection(API_URL)
+    job = conn.create_job(b'{"foo1": {"process_id": "foo"}}', title="Foo", additional={"memory": "2G"})
+    assert job.job_id == "j-123"
+    assert requests_mock.last_request.json() == {
+        "process": {"process_graph": {"foo1": {"process_id": "foo"}}},
+        "title": "Foo", "description": None, "plan": None, "budget": None, "job_options": {"memory": "2G"},
+    }
+
+
+def test_configure_session():
+    session = configure_session(requests.Session(), pool_size=16, max_retries=5)
+    adapter = session.get_adapter("https://oeo.net/")
+    assert adapter._pool_maxsize == 16
+    assert adapter.max_retries.total == 5
+    assert adapter.max_retries.status_forcelist == RETRY_STATUS_CODES
+
+
+def test_connection_options_configure_own_session_only(caplog):
+    conn = RestApiConnection(API_URL, options=ConnectionOptions(pool_size=16, max_retries=5))
+    adapter = conn.session.get_adapter("https://oeo.net/")
+    assert adapter._pool_maxsize == 16
+    assert adapter.max_retries.total == 5
+
+    session = requests.Session()
+    adapters = dict(session.adapters)
+    conn = RestApiConnection(API_URL, session=session, options=ConnectionOptions(pool_size=16, max_retries=5))
+    assert conn.session is session
+    assert session.adapters == adapters
+    assert "Ignoring pool_size/max_retries options" in caplog.text
+
+
+class _FlakyHandler(http.server.BaseHTTPRequestHandler):
+    """Request handler that fails with "503 Service Unavailable" on first request of each path."""
+    protocol_version = "HTTP/1.1"
+    seen = set()
+
+    def _respond(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status = 200 if self.path in self.seen else 503
+        self.seen.add(self.path)
+        body = json.dumps({"status": status}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_server():
+    _FlakyHandler.seen = set()
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{p}/".format(p=server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+def test_retry_idempotent_requests(flaky_server):
+    conn = RestApiConnection(flaky_server, options=ConnectionOptions(max_retries=build_retry(2, backoff_factor=0)))
+    # GET is retried after 503
+    assert conn.get("/foo").json() == {"status": 200}
+    # POST is not retried
+    with pytest.raises(OpenEoApiError, match=r"\[503\]"):
+        conn.post("/bar", json={})
+    # Without retries
+    conn = RestApiConnection(flaky_server)
+    with pytest.raises(OpenEoApiError, match=r"\[503\]"):
+        conn.get("/baz")
+
+
+def test_pool_stats(flaky_server):
+    conn = RestApiConnection(
+        flaky_server, options=ConnectionOptions(pool_size=4, max_retries=build_retry(2, backoff_factor=0))
+    )
+    for path in ["/foo", "/bar", "/baz"]:
+        conn.get(path)
+    stats = conn.pool_stats()
+    pool = stats[flaky_server.rstrip("/")]
+    # Keep-alive connection is reused for all (retried) requests.
+    assert pool == {"connections": 1, "requests": 6, "idle": 4, "maxsize": 4}
@@ -3,7 +3,7 @@ import pandas as pd
 import pytest
 from pandas.util.testing import assert_frame_equal, assert_series_equal
 
-from openeo.rest.conversions import timeseries_json_to_pandas
+from openeo.rest.conversions import timeseries_json_to_pandas, timeseries_json_to_ndarray, timeseries_json_to_xarray
 
 DATE1 = "2019-01-11T11:11:11Z"
 DATE2 = "2019-02-22T22:22:22Z"
@@ -145,3 +145,67 @@ def test_timeseries_json_to_pandas_none_nan_empty_handling():
         )
     )
     assert_frame_equal(df, expected)
+
+
+def test_timeseries_json_to_pandas_from_items():
+    timeseries = {
+        DATE1: [[], []],
+        DATE2: [[5, 6], [None, None]],
+        DATE3: [[1, 2], []],
+    }
+    df = timeseries_json_to_pandas(iter(timeseries.items()))
+    assert_frame_equal(df, timeseries_json_to_pandas(timeseries))
+    assert df.shape == (3, 4)
+    assert df.isna().sum().sum() == 8
+
+
+def test_timeseries_json_to_pandas_parse_dates():
+    timeseries = {DATE2: [[3, 4]], DATE1: [[1, 2]]}
+    df = timeseries_json_to_pandas(timeseries, parse_dates=True)
+    expected = pd.DataFrame(
+        data=[[1, 2], [3, 4]],
+        index=pd.DatetimeIndex([DATE1, DATE2], name="date"),
+        columns=pd.Index([0, 1], name="band")
+    )
+    assert_frame_equal(df, expected)
+
+
+def test_timeseries_json_to_pandas_varying_polygon_count():
+    timeseries = {DATE1: [[1], [2]], DATE2: [[3]]}
+    df = timeseries_json_to_pandas(timeseries)
+    expected = pd.DataFrame(
+        data=[[1, 2], [3, np.nan]],
+        dtype=float,
+        index=pd.Index([DATE1, DATE2], name="date"),
+        columns=pd.Index([0, 1], name="polygon")
+    )
+    assert_frame_equal(df, expected)
+
+
+@pytest.mark.parametrize("timeseries", [
+    {DATE1: [[1, 2]], DATE2: [[3]]},
+    {DATE1: [[1, 2], [3]]},
+    {DATE1: [[], []]},
+    {},
+])
+def test_timeseries_json_to_pandas_invalid_band_counts(timeseries):
+    with pytest.raises(ValueError, match="Multiple band counts"):
+        timeseries_json_to_pandas(timeseries)
+    with pytest.raises(ValueError, match="Multiple band counts"):
+        timeseries_json_to_pandas(iter(timeseries.items()))
+
+
+def test_timeseries_json_to_ndarray():
+    dates, data = timeseries_json_to_ndarray({DATE1: [[1, 2], []], DATE2: [[None, 4.5], [5, 6]]})
+    assert dates == [DATE1, DATE2]
+    assert data.shape == (2, 2, 2)
+    np.testing.assert_equal(data, [[[1, 2], [np.nan, np.nan]], [[np.nan, 4.5], [5, 6]]])
+
+
+def test_timeseries_json_to_xarray():
+    xarray = pytest.importorskip("xarray")
+    arr = timeseries_json_to_xarray({DATE1: [[1, 2], [3, 4]], DATE2: [[5, 6], []]})
+    assert isinstance(arr, xarray.DataArray)
+    assert arr.dims == ("date", "polygon", "band")
+    assert arr.shape == (2, 2, 2)
+    assert arr.sel(polygon=0, band=1).values.tolist() == [2, 6]
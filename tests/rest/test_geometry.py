@@ -0,0 +1,101 @@
+import json
+import re
+
+import shapely.geometry
+
+from openeo.rest.geometry import GeometryEncoding, clip_to_extent, round_coordinates
+
+
+def test_round_coordinates():
+    assert round_coordinates([[1.23456, 2.34567], [3.0, 4.99999]], 2) == [[1.23, 2.35], [3.0, 5.0]]
+
+
+def test_clip_to_extent():
+    polygon = shapely.geometry.box(0, 0, 10, 10)
+    clipped = clip_to_extent(polygon, {"west": 5, "south": 5, "east": 20, "north": 20})
+    assert clipped.equals(shapely.geometry.box(5, 5, 10, 10))
+
+
+def test_clip_to_extent_inside():
+    polygon = shapely.geometry.box(0, 0, 1, 1)
+    assert clip_to_extent(polygon, {"west": -5, "south": -5, "east": 5, "north": 5}) is polygon
+
+
+def test_clip_to_extent_disjoint():
+    polygon = shapely.geometry.box(0, 0, 1, 1)
+    assert clip_to_extent(polygon, {"west": 5, "south": 5, "east": 6, "north": 6}) is polygon
+
+
+def test_encode_default():
+    polygon = shapely.geometry.box(0, 0, 1, 1)
+    assert GeometryEncoding().encode(polygon) == shapely.geometry.mapping(polygon)
+
+
+def test_encode_simplify_and_round():
+    circle = shapely.geometry.Point(3, 51).buffer(1, resolution=256)
+    geojson = GeometryEncoding(simplify_tolerance=0.01, precision=3).encode(circle)
+    assert geojson["type"] == "Polygon"
+    coordinates = geojson["coordinates"][0]
+    assert 10 < len(coordinates) < len(circle.exterior.coords) / 4
+    assert all(round(x, 3) == x and round(y, 3) == y for x, y in coordinates)
+    assert shapely.geometry.shape(geojson).symmetric_difference(circle).area < 0.01 * circle.area
+
+
+def test_encode_clip():
+    polygon = shapely.geometry.box(0, 0, 10, 10)
+    extent = {"west": 5, "south": 5, "east": 20, "north": 20}
+    geojson = GeometryEncoding().encode(polygon, extent=extent)
+    assert shapely.geometry.shape(geojson).equals(shapely.geometry.box(5, 5, 10, 10))
+    # No clipping with different CRS
+    geojson = GeometryEncoding().encode(polygon, extent=dict(extent, crs=32631))
+    assert shapely.geometry.shape(geojson).equals(polygon)
+    geojson = GeometryEncoding(clip_to_extent=False).encode(polygon, extent=extent)
+    assert shapely.geometry.shape(geojson).equals(polygon)
+
+
+def test_geometry_argument_upload(requests_mock):
+    from openeo.rest.connection import RestApiConnection
+    connection = RestApiConnection("https://oeo.net/")
+    uploads = []
+    requests_mock.put(
+        re.compile("https://oeo.net/files/geoms/[0-9a-f]+\\.geojson"),
+        text=lambda request, context: uploads.append(request.body) or ""
+    )
+    encoding = GeometryEncoding(upload_threshold=1000, upload_prefix="geoms")
+    small = encoding.geometry_argument(connection, shapely.geometry.box(0, 0, 1, 1))
+    assert small["type"] == "Polygon"
+    assert small["crs"] == {"type": "name", "properties": {"name": "EPSG:4326"}}
+    large = shapely.geometry.Point(3, 51).buffer(1)
+    path = encoding.geometry_argument(connection, large)
+    assert path.startswith("geoms/") and path.endswith(".geojson")
+    assert len(uploads) == 1
+    assert json.loads(uploads[0].decode("utf-8"))["type"] == "Polygon"
+    # Same geometry is not uploaded again
+    assert encoding.geometry_argument(connection, large) == path
+    assert len(uploads) == 1
+
+
+def test_geometry_argument_upload_per_backend_and_user(requests_mock):
+    from openeo.rest.auth.auth import BearerAuth
+    from openeo.rest.connection import RestApiConnection
+    uploads = []
+    for url in ["https://oeo.net", "https://other.oeo.net"]:
+        requests_mock.put(
+            re.compile(url + "/files/geoms/[0-9a-f]+\\.geojson"),
+            text=lambda request, context: uploads.append((request.url, request.headers.get("Authorization"))) or ""
+        )
+    encoding = GeometryEncoding(upload_threshold=1000, upload_prefix="geoms")
+    large = shapely.geometry.Point(3, 51).buffer(1)
+    alice = RestApiConnection("https://oeo.net/", auth=BearerAuth("t0k3n-alice", identity="alice"))
+    bob = RestApiConnection("https://oeo.net/", auth=BearerAuth("t0k3n-bob", identity="bob"))
+    other = RestApiConnection("https://other.oeo.net/", auth=BearerAuth("t0k3n-alice", identity="alice"))
+    path = encoding.geometry_argument(alice, large)
+    assert encoding.geometry_argument(alice, large) == path
+    assert encoding.geometry_argument(bob, large) == path
+    assert encoding.geometry_argument(other, large) == path
+    assert encoding.geometry_argument(bob, large) == path
+    assert [(u.split("/files/")[0], a) for u, a in uploads] == [
+        ("https://oeo.net", "Bearer t0k3n-alice"),
+        ("https://oeo.net", "Bearer t0k3n-bob"),
+        ("https://other.oeo.net", "Bearer t0k3n-alice"),
+    ]
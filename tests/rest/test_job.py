@@ -1,10 +1,11 @@
+import io
 import re
 
 import openeo
 from openeo.rest import JobFailedException, OpenEoClientException
 import pytest
 
-from openeo.rest.job import RESTJob
+from openeo.rest.job import RESTJob, ResultDownloader
 from .. import as_path
 
 API_URL = "https://oeo.net"
@@ -228,3 +229,145 @@ def test_download_results(con100, requests_mock, tmp_path):
     assert set(p.name for p in target.iterdir()) == {"1.tiff", "2.tiff"}
     with (target / "1.tiff").open("rb") as f:
         assert f.read() == TIFF_CONTENT
+
+
+class RangeServer:
+    """Fake file server (for requests_mock) that supports HTTP Range requests."""
+
+    def __init__(self, content: bytes, drop_after: int = None, etag: str = None):
+        self.content = content
+        self.drop_after = drop_after
+        self.etag = etag
+        self.ranges = []
+
+    def __call__(self, request, context):
+        if self.etag:
+            context.headers["ETag"] = self.etag
+        match = re.match(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+        if match and request.headers.get("If-Range", self.etag) != self.etag:
+            # Validator mismatch: ignore range, send full content.
+            match = None
+        if match and int(match.group(1)) >= len(self.content):
+            self.ranges.append((int(match.group(1)), None))
+            context.status_code = 416
+            context.headers["Content-Range"] = "bytes */{t}".format(t=len(self.content))
+            return io.BytesIO(b"")
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or len(self.content) - 1), len(self.content) - 1)
+            self.ranges.append((start, end))
+            context.status_code = 206
+            context.headers["Content-Range"] = "bytes {s}-{e}/{t}".format(s=start, e=end, t=len(self.content))
+            body = self.content[start:end + 1]
+        else:
+            self.ranges.append(None)
+            body = self.content
+        if self.drop_after is not None:
+            # Simulate a dropped connection (once) after a number of bytes.
+            body, self.drop_after = DroppingStream(body, drop_after=self.drop_after), None
+            return body
+        return io.BytesIO(body)
+
+
+class DroppingStream(io.BytesIO):
+    def __init__(self, data: bytes, drop_after: int):
+        super().__init__(data)
+        self._drop_after = drop_after
+
+    def read(self, size=-1):
+        if self.tell() >= self._drop_after:
+            raise ConnectionResetError("Connection dropped")
+        size = self._drop_after - self.tell() if size < 0 else min(size, self._drop_after - self.tell())
+        return super().read(size)
+
+
+def test_download_results_range_parts(con100, requests_mock, tmp_path):
+    content = bytes(range(256)) * 40
+    server = RangeServer(content)
+    requests_mock.get(API_URL + "/jobs/jj/results", json={"assets": {
+        "1.tiff": {"href": API_URL + "/dl/jjr1.tiff"},
+        "2.tiff": {"href": API_URL + "/dl/jjr2.tiff"},
+    }})
+    requests_mock.get(API_URL + "/dl/jjr1.tiff", body=server)
+    requests_mock.get(API_URL + "/dl/jjr2.tiff", content=TIFF_CONTENT)
+    job = RESTJob("jj", connection=con100)
+    target = as_path(tmp_path / "folder")
+    downloader = ResultDownloader(con100, max_workers=3, chunk_size=100, part_size=4000)
+    job.download_results(target, downloader=downloader)
+    assert sorted(p.name for p in target.iterdir()) == ["1.tiff", "2.tiff"]
+    assert (target / "1.tiff").read_bytes() == content
+    assert (target / "2.tiff").read_bytes() == TIFF_CONTENT
+    assert sorted(server.ranges) == [(0, 3999), (4000, 7999), (8000, 10239)]
+
+
+def test_download_resume_after_connection_drop(con100, requests_mock, tmp_path):
+    server = RangeServer(TIFF_CONTENT, drop_after=3000)
+    requests_mock.get(API_URL + "/jobs/jj/results", json={"assets": {"1.tiff": {"href": API_URL + "/dl/jjr1.tiff"}}})
+    requests_mock.get(API_URL + "/dl/jjr1.tiff", body=server)
+    job = RESTJob("jj", connection=con100)
+    target = as_path(tmp_path / "result.tiff")
+    downloader = ResultDownloader(con100, chunk_size=1000, retry_interval=0)
+    job.download_result(target, downloader=downloader)
+    assert target.read_bytes() == TIFF_CONTENT
+    assert server.ranges == [(0, len(TIFF_CONTENT) - 1), (3000, len(TIFF_CONTENT) - 1)]
+
+
+def test_download_resume_partial_file_with_etag(con100, requests_mock, tmp_path):
+    server = RangeServer(TIFF_CONTENT, etag='"v1"')
+    requests_mock.get(API_URL + "/dl/jjr1.tiff", body=server)
+    target = as_path(tmp_path / "result.tiff")
+    (tmp_path / "result.tiff.part").write_bytes(TIFF_CONTENT[:1234])
+    (tmp_path / "result.tiff.part.json").write_text('{"etag": "\\"v1\\"", "total": %d}' % len(TIFF_CONTENT))
+    ResultDownloader(con100).download({target: API_URL + "/dl/jjr1.tiff"})
+    assert target.read_bytes() == TIFF_CONTENT
+    assert server.ranges == [(1234, len(TIFF_CONTENT) - 1)]
+    assert requests_mock.request_history[-1].headers["If-Range"] == '"v1"'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["result.tiff"]
+
+
+def test_download_stale_partial_file_etag_mismatch(con100, requests_mock, tmp_path):
+    server = RangeServer(TIFF_CONTENT, etag='"v2"')
+    requests_mock.get(API_URL + "/dl/jjr1.tiff", body=server)
+    target = as_path(tmp_path / "result.tiff")
+    (tmp_path / "result.tiff.part").write_bytes(b"stale content of earlier job run")
+    (tmp_path / "result.tiff.part.json").write_text('{"etag": "\\"v1\\""}')
+    ResultDownloader(con100).download({target: API_URL + "/dl/jjr1.tiff"})
+    assert target.read_bytes() == TIFF_CONTENT
+    # Range was ignored by the server (If-Range mismatch): full content was downloaded in one go.
+    assert server.ranges == [None]
+
+
+def test_download_stale_partial_file_size_mismatch(con100, requests_mock, tmp_path):
+    server = RangeServer(TIFF_CONTENT)
+    requests_mock.get(API_URL + "/dl/jjr1.tiff", body=server)
+    target = as_path(tmp_path / "result.tiff")
+    (tmp_path / "result.tiff.part").write_bytes(b"stale content of another result")
+    (tmp_path / "result.tiff.part.json").write_text('{"total": 123456789}')
+    ResultDownloader(con100).download({target: API_URL + "/dl/jjr1.tiff"})
+    assert target.read_bytes() == TIFF_CONTENT
+    assert server.ranges == [(31, len(TIFF_CONTENT) - 1), (0, len(TIFF_CONTENT) - 1)]
+
+
+def test_download_partial_file_already_complete(con100, requests_mock, tmp_path):
+    server = RangeServer(TIFF_CONTENT)
+    requests_mock.get(API_URL + "/dl/jjr1.tiff", body=server)
+    target = as_path(tmp_path / "result.tiff")
+    (tmp_path / "result.tiff.part").write_bytes(TIFF_CONTENT)
+    (tmp_path / "result.tiff.part.json").write_text('{"total": %d}' % len(TIFF_CONTENT))
+    stats = ResultDownloader(con100).download({target: API_URL + "/dl/jjr1.tiff"})
+    assert target.read_bytes() == TIFF_CONTENT
+    assert server.ranges == [(len(TIFF_CONTENT), None)]
+    assert (stats.files, stats.bytes) == (1, 0)
+
+
+def test_download_resume_partial_file(con100, requests_mock, tmp_path):
+    server = RangeServer(TIFF_CONTENT)
+    requests_mock.get(API_URL + "/dl/jjr1.tiff", body=server)
+    target = as_path(tmp_path / "result.tiff")
+    (tmp_path / "result.tiff.part").write_bytes(TIFF_CONTENT[:1234])
+    stats = ResultDownloader(con100).download({target: API_URL + "/dl/jjr1.tiff"})
+    assert target.read_bytes() == TIFF_CONTENT
+    assert not (tmp_path / "result.tiff.part").exists()
+    assert server.ranges == [(1234, len(TIFF_CONTENT) - 1)]
+    assert (stats.files, stats.bytes) == (1, len(TIFF_CONTENT) - 1234)
+    assert stats.throughput > 0
@@ -0,0 +1,180 @@
+import pytest
+import requests
+
+import openeo
+from openeo.rest import JobFailedException
+from openeo.rest.connection import OpenEoApiError
+from openeo.rest.job import RESTJob
+from openeo.rest.job_pool import JobPool, RateLimiter
+
+API_URL = "https://oeo.net"
+
+
+@pytest.fixture
+def con100(requests_mock):
+    requests_mock.get(API_URL + "/", json={"api_version": "1.0.0"})
+    return openeo.connect(API_URL)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limiter():
+    clock = FakeClock()
+    limiter = RateLimiter(max_per_minute=30, sleep=clock.sleep, clock=clock)
+    for _ in range(4):
+        limiter.acquire()
+    assert clock.sleeps == [2, 2, 2]
+
+
+def test_job_pool_listing(con100, requests_mock):
+    listing = requests_mock.get(API_URL + "/jobs", [
+        {"json": {"jobs": [{"id": "j1", "status": "queued"}, {"id": "j2", "status": "queued"}]}},
+        {"json": {"jobs": [{"id": "j1", "status": "running"}, {"id": "j2", "status": "running"}]}},
+        {"json": {"jobs": [{"id": "j1", "status": "running"}, {"id": "j2", "status": "running"}]}},
+        {"json": {"jobs": [{"id": "j1", "status": "finished"}, {"id": "j2", "status": "error"}]}},
+    ])
+    start1 = requests_mock.post(API_URL + "/jobs/j1/results", status_code=202)
+    start2 = requests_mock.post(API_URL + "/jobs/j2/results", status_code=202)
+    describe = requests_mock.get(API_URL + "/jobs/j1", json={})
+
+    clock = FakeClock()
+    pool = JobPool(con100, min_poll_interval=1, max_poll_interval=10, max_requests_per_minute=None,
+                   sleep=clock.sleep, clock=clock)
+    callbacks = []
+    f1 = pool.add(RESTJob("j1", con100), start=True, callback=lambda job, info: callbacks.append(info["status"]))
+    f2 = pool.add(RESTJob("j2", con100), start=True)
+    pool.run()
+
+    assert f1.result().job_id == "j1"
+    with pytest.raises(JobFailedException, match="j2 didn't finish properly. Status: error"):
+        f2.result()
+    assert callbacks == ["finished"]
+    assert (start1.call_count, start2.call_count) == (1, 1)
+    # All statuses from the listing: one request per poll, no per-job status requests.
+    assert listing.call_count == 4
+    assert describe.call_count == 0
+    # Adaptive backoff: back to fast polling after a status change.
+    assert clock.sleeps == [1, 1, 1.25]
+    assert pool.active_jobs == []
+
+
+def test_job_pool_fallback_to_describe_job(con100, requests_mock):
+    requests_mock.get(API_URL + "/jobs", json={"jobs": [{"id": "j1", "status": "running"}]})
+    requests_mock.get(API_URL + "/jobs/j1", json={"id": "j1", "status": "running"})
+    describe2 = requests_mock.get(API_URL + "/jobs/j2", [
+        {"json": {"id": "j2", "status": "running"}},
+        {"json": {"id": "j2", "status": "finished"}},
+    ])
+    clock = FakeClock()
+    pool = JobPool(con100, sleep=clock.sleep, clock=clock, max_requests_per_minute=6)
+    f1 = pool.add(RESTJob("j1", con100))
+    f2 = pool.add(RESTJob("j2", con100))
+    pool.poll()
+    pool.poll()
+    assert f2.done() and f2.result().job_id == "j2"
+    assert not f1.done()
+    assert describe2.call_count == 2
+    # Request budget of 6 per minute: 10 seconds between requests.
+    assert clock.sleeps == [10, 10, 10]
+
+
+def test_job_pool_timeout(con100, requests_mock):
+    requests_mock.get(API_URL + "/jobs", json={"jobs": [{"id": "j1", "status": "running"}]})
+    clock = FakeClock()
+    pool = JobPool(con100, min_poll_interval=5, max_requests_per_minute=None, sleep=clock.sleep, clock=clock)
+    pool.add(RESTJob("j1", con100))
+    with pytest.raises(TimeoutError, match="1 jobs still active after 60s"):
+        pool.run(timeout=60)
+
+
+def test_job_pool_start_failure(con100, requests_mock):
+    requests_mock.get(API_URL + "/jobs", json={"jobs": [{"id": "j1", "status": "created"}, {"id": "j2", "status": "finished"}]})
+    requests_mock.post(API_URL + "/jobs/j1/results", status_code=400, json={"code": "Invalid", "message": "Nope"})
+    requests_mock.post(API_URL + "/jobs/j2/results", status_code=202)
+    clock = FakeClock()
+    pool = JobPool(con100, max_requests_per_minute=None, sleep=clock.sleep, clock=clock)
+    f1 = pool.add(RESTJob("j1", con100), start=True)
+    f2 = pool.add(RESTJob("j2", con100), start=True)
+    pool.run(timeout=60)
+    with pytest.raises(OpenEoApiError, match="Nope"):
+        f1.result()
+    assert f2.result().job_id == "j2"
+    assert pool.active_jobs == []
+
+
+def test_job_pool_start_connection_error_retried(con100, requests_mock):
+    requests_mock.get(API_URL + "/jobs", [
+        {"json": {"jobs": [{"id": "j1", "status": "created"}]}},
+        {"json": {"jobs": [{"id": "j1", "status": "finished"}]}},
+    ])
+    start = requests_mock.post(API_URL + "/jobs/j1/results", [
+        {"exc": requests.exceptions.ConnectionError("flaky")},
+        {"status_code": 202},
+    ])
+    clock = FakeClock()
+    pool = JobPool(con100, max_requests_per_minute=None, sleep=clock.sleep, clock=clock)
+    f1 = pool.add(RESTJob("j1", con100), start=True)
+    pool.poll()
+    assert not f1.done()
+    pool.poll()
+    assert f1.result().job_id == "j1"
+    assert start.call_count == 2
+
+
+def test_job_pool_listing_failure_falls_back_to_describe_job(con100, requests_mock):
+    requests_mock.get(API_URL + "/jobs", status_code=500, json={"code": "Internal", "message": "Oops"})
+    describe = requests_mock.get(API_URL + "/jobs/j1", json={"id": "j1", "status": "finished"})
+    clock = FakeClock()
+    pool = JobPool(con100, max_requests_per_minute=None, sleep=clock.sleep, clock=clock)
+    f1 = pool.add(RESTJob("j1", con100))
+    pool.run(timeout=60)
+    assert f1.result().job_id == "j1"
+    assert describe.call_count == 1
+
+
+def test_job_pool_describe_failure(con100, requests_mock):
+    requests_mock.get(API_URL + "/jobs", json={"jobs": []})
+    requests_mock.get(API_URL + "/jobs/j1", status_code=404, json={"code": "JobNotFound", "message": "No j1"})
+    requests_mock.get(API_URL + "/jobs/j2", json={"id": "j2", "status": "finished"})
+    clock = FakeClock()
+    pool = JobPool(con100, max_requests_per_minute=None, sleep=clock.sleep, clock=clock)
+    f1 = pool.add(RESTJob("j1", con100))
+    f2 = pool.add(RESTJob("j2", con100))
+    pool.run(timeout=60)
+    with pytest.raises(OpenEoApiError, match="No j1"):
+        f1.result()
+    assert f2.result().job_id == "j2"
+    assert pool.active_jobs == []
+
+
+def test_job_pool_background_thread_survives_failure(con100, requests_mock):
+    requests_mock.get(API_URL + "/jobs", json={"jobs": [{"id": "j1", "status": "finished"}]})
+    pool = JobPool(con100, min_poll_interval=0.01, max_poll_interval=0.01, max_requests_per_minute=None)
+    poll = pool.poll
+    calls = []
+
+    def flaky_poll():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("Boom")
+        poll()
+
+    pool.poll = flaky_poll
+    f1 = pool.add(RESTJob("j1", con100))
+    pool.start()
+    try:
+        assert f1.result(timeout=5).job_id == "j1"
+    finally:
+        pool.stop()
+    assert len(calls) >= 2
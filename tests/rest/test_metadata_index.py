@@ -0,0 +1,139 @@
+import sqlite3
+
+import pytest
+
+import openeo
+from openeo.metadata import CollectionMetadata
+from openeo.rest.metadata_index import CollectionMetadataIndex
+
+API_URL = "https://oeo.net"
+
+COLLECTION = {
+    "id": "S2",
+    "cube:dimensions": {
+        "x": {"type": "spatial", "extent": [-10, 10]},
+        "bands": {"type": "bands", "values": ["B02", "B03"]},
+    },
+    "summaries": {"eo:bands": [{"name": "B02", "common_name": "blue"}, {"name": "B03", "common_name": "green"}]},
+}
+
+
+def test_index_shared_between_instances(tmp_path):
+    path = tmp_path / "index.sqlite"
+    metadata = CollectionMetadata(COLLECTION)
+    CollectionMetadataIndex(path=path).set(API_URL, "S2", metadata)
+
+    restored = CollectionMetadataIndex(path=path).get(API_URL, "S2")
+    assert restored.get("id") == "S2"
+    assert restored.dimension_names() == ["x", "bands"]
+    assert restored.band_dimension == metadata.band_dimension
+    assert restored.band_dimension.band_index("green") == 1
+    assert CollectionMetadataIndex(path=path).get(API_URL, "S1") is None
+    assert CollectionMetadataIndex(path=path).get("https://other.test", "S2") is None
+
+
+def test_index_ttl(tmp_path, monkeypatch):
+    now = [1000]
+    monkeypatch.setattr(CollectionMetadataIndex, "_now", lambda self: now[0])
+    index = CollectionMetadataIndex(path=tmp_path / "index.sqlite", ttl=60)
+    index.set(API_URL, "S2", CollectionMetadata(COLLECTION))
+    now[0] += 30
+    assert index.get(API_URL, "S2") is not None
+    now[0] += 60
+    assert index.get(API_URL, "S2") is None
+
+
+def test_index_invalidate(tmp_path):
+    index = CollectionMetadataIndex(path=tmp_path / "index.sqlite")
+    index.set(API_URL, "S2", CollectionMetadata(COLLECTION))
+    index.set("https://other.test", "S2", CollectionMetadata(COLLECTION))
+    index.invalidate(API_URL)
+    assert index.get(API_URL, "S2") is None
+    assert index.get("https://other.test", "S2") is not None
+
+
+def test_index_per_user(tmp_path):
+    index = CollectionMetadataIndex(path=tmp_path / "index.sqlite")
+    index.set(API_URL, "S2", CollectionMetadata(COLLECTION), user="basic:john")
+    assert index.get(API_URL, "S2", user="basic:john") is not None
+    assert index.get(API_URL, "S2", user="basic:mary") is None
+    assert index.get(API_URL, "S2") is None
+    index.set(API_URL, "S2", CollectionMetadata(COLLECTION))
+    index.invalidate(API_URL)
+    assert index.get(API_URL, "S2") is None
+    assert index.get(API_URL, "S2", user="basic:john") is None
+
+
+def test_index_drops_old_schema(tmp_path):
+    path = tmp_path / "index.sqlite"
+    db = sqlite3.connect(str(path))
+    with db:
+        db.execute(
+            "CREATE TABLE collections (backend TEXT NOT NULL, collection_id TEXT NOT NULL, timestamp REAL NOT NULL,"
+            " metadata TEXT NOT NULL, dimensions TEXT NOT NULL, PRIMARY KEY (backend, collection_id))"
+        )
+        db.execute("INSERT INTO collections VALUES (?, ?, ?, ?, ?)", (API_URL, "S2", 0, "{}", "[]"))
+    db.close()
+    index = CollectionMetadataIndex(path=path)
+    assert index.get(API_URL, "S2") is None
+    index.set(API_URL, "S2", CollectionMetadata(COLLECTION))
+    assert index.get(API_URL, "S2").band_names == ["B02", "B03"]
+
+
+def test_connection_collection_metadata_uses_index(requests_mock, tmp_path):
+    requests_mock.get(API_URL + "/", json={"api_version": "1.0.0"})
+    m = requests_mock.get(API_URL + "/collections/S2", json=COLLECTION)
+    path = tmp_path / "index.sqlite"
+
+    for _ in range(3):
+        con = openeo.connect(
+            API_URL, options=openeo.ConnectionOptions(metadata_index=CollectionMetadataIndex(path=path))
+        )
+        metadata = con.collection_metadata("S2")
+        assert metadata.band_names == ["B02", "B03"]
+    assert m.call_count == 1
+
+    cube = con.load_collection("S2").filter_bands(["blue"])
+    assert cube.metadata.band_names == ["B02"]
+    assert m.call_count == 1
+
+
+def test_connection_collection_metadata_index_per_user(requests_mock, tmp_path):
+    requests_mock.get(API_URL + "/", json={"api_version": "1.0.0"})
+    collections = {
+        "Bearer john": COLLECTION,
+        "Bearer mary": {"id": "S2", "cube:dimensions": {"bands": {"type": "bands", "values": ["B2", "B3"]}}},
+    }
+    m = requests_mock.get(
+        API_URL + "/collections/S2", json=lambda request, context: collections[request.headers["Authorization"]]
+    )
+    requests_mock.get(API_URL + "/credentials/basic", json=lambda request, context: {
+        "access_token": "john" if "am9obj" in request.headers["Authorization"] else "mary"
+    })
+    index = CollectionMetadataIndex(path=tmp_path / "index.sqlite")
+
+    for user, band_names in [("john", ["B02", "B03"]), ("mary", ["B2", "B3"]), ("john", ["B02", "B03"])]:
+        con = openeo.connect(API_URL, options=openeo.ConnectionOptions(metadata_index=index))
+        con.authenticate_basic(user, "pa55")
+        assert con.collection_metadata("S2").band_names == band_names
+    assert m.call_count == 2
+
+
+def test_index_closes_connections(tmp_path, monkeypatch):
+    connections = []
+    connect = CollectionMetadataIndex._connect
+
+    def tracking_connect(self):
+        connections.append(connect(self))
+        return connections[-1]
+
+    monkeypatch.setattr(CollectionMetadataIndex, "_connect", tracking_connect)
+    index = CollectionMetadataIndex(path=tmp_path / "index.sqlite")
+    index.set(API_URL, "S2", CollectionMetadata(COLLECTION))
+    assert index.get(API_URL, "S2") is not None
+    index.invalidate(API_URL)
+    assert index.get(API_URL, "S2") is None
+    assert len(connections) == 5
+    for db in connections:
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            db.execute("SELECT 1")
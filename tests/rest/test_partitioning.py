@@ -0,0 +1,159 @@
+import datetime
+import json
+
+import pytest
+import requests
+import urllib3.exceptions
+
+from openeo.internal.graph_building import PGNode
+from openeo.rest import OpenEoClientException
+from openeo.rest.connection import OpenEoApiError
+from openeo.rest.partitioning import split_spatial_extent, Tile, restrict_load_collections, run_partitioned, \
+    find_process_argument, is_retryable, split_temporal_extent, split_geometries, merge_timeseries, find_extent
+
+API_URL = "https://oeo.net"
+
+
+def test_split_spatial_extent():
+    tiles = split_spatial_extent({"west": 0, "south": 0, "east": 5, "north": 3, "crs": 32631}, tile_size=2)
+    assert tiles == [
+        Tile(0, 0, {"west": 0, "south": 1, "east": 2, "north": 3, "crs": 32631}),
+        Tile(0, 1, {"west": 2, "south": 1, "east": 4, "north": 3, "crs": 32631}),
+        Tile(0, 2, {"west": 4, "south": 1, "east": 5, "north": 3, "crs": 32631}),
+        Tile(1, 0, {"west": 0, "south": 0, "east": 2, "north": 1, "crs": 32631}),
+        Tile(1, 1, {"west": 2, "south": 0, "east": 4, "north": 1, "crs": 32631}),
+        Tile(1, 2, {"west": 4, "south": 0, "east": 5, "north": 1, "crs": 32631}),
+    ]
+
+
+def test_split_spatial_extent_width_height():
+    tiles = split_spatial_extent({"west": 0, "south": 0, "east": 4, "north": 4}, tile_size=(4, 1))
+    assert [t.extent["south"] for t in tiles] == [3, 2, 1, 0]
+    with pytest.raises(ValueError):
+        split_spatial_extent({"west": 0, "south": 0, "east": 4, "north": 4}, tile_size=0)
+
+
+def test_restrict_load_collections():
+    load = PGNode("load_collection", id="S2", spatial_extent={"west": 0, "south": 0, "east": 4, "north": 4})
+    graph = PGNode("apply", data=load, process="absolute")
+    restricted = restrict_load_collections(graph, spatial_extent={"west": 2, "south": 2, "east": 6, "north": 6})
+    assert restricted.arguments["data"]["from_node"].arguments["spatial_extent"] == {
+        "west": 2, "south": 2, "east": 4, "north": 4
+    }
+    assert find_process_argument(graph, "load_collection", "spatial_extent") == {
+        "west": 0, "south": 0, "east": 4, "north": 4
+    }
+
+
+def test_find_process_argument_conflict():
+    graph = PGNode(
+        "merge_cubes",
+        cube1=PGNode("load_collection", id="S2", spatial_extent={"west": 0, "south": 0, "east": 4, "north": 4}),
+        cube2=PGNode("load_collection", id="S1", spatial_extent=None),
+    )
+    with pytest.raises(OpenEoClientException, match="Multiple values"):
+        find_process_argument(graph, "load_collection", "spatial_extent")
+
+
+def test_find_extent():
+    load = PGNode("load_collection", id="S2", spatial_extent={"west": 0, "south": 0, "east": 4, "north": 4})
+    assert find_extent(load, "spatial_extent") == {"west": 0, "south": 0, "east": 4, "north": 4}
+    assert find_extent(load, "temporal_extent") is None
+    graph = PGNode(
+        "filter_temporal",
+        data=PGNode("filter_bbox", data=load, extent={"west": 2, "south": 2, "east": 6, "north": 6}),
+        extent=["2020-01-01", "2020-02-01"]
+    )
+    assert find_extent(graph, "spatial_extent") == {"west": 2, "south": 2, "east": 4, "north": 4}
+    assert find_extent(graph, "temporal_extent") == ["2020-01-01", "2020-02-01"]
+
+
+def test_run_partitioned_retries():
+    failures = {"a": [requests.ConnectionError("oops"), OpenEoApiError(http_status_code=503)], "b": []}
+    sleeps = []
+
+    def func(p):
+        if failures[p]:
+            raise failures[p].pop(0)
+        return p.upper()
+
+    assert run_partitioned(func, ["a", "b"], max_retries=3, sleep=sleeps.append) == ["A", "B"]
+    assert len(sleeps) == 2
+
+
+def test_run_partitioned_no_retry_on_client_error():
+    def func(p):
+        raise OpenEoApiError(http_status_code=400, message="Invalid")
+
+    with pytest.raises(OpenEoApiError, match="Invalid"):
+        run_partitioned(func, ["a"], max_retries=3, sleep=lambda s: pytest.fail("no retry expected"))
+
+
+def test_run_partitioned_max_retries():
+    calls = []
+
+    def func(p):
+        calls.append(p)
+        raise requests.Timeout()
+
+    with pytest.raises(requests.Timeout):
+        run_partitioned(func, ["a"], max_retries=2, sleep=lambda s: None)
+    assert calls == ["a", "a", "a"]
+
+
+@pytest.mark.parametrize(["error", "expected"], [
+    (requests.ConnectionError("oops"), True),
+    (requests.Timeout(), True),
+    (requests.exceptions.ChunkedEncodingError("truncated"), True),
+    (urllib3.exceptions.ProtocolError("Connection broken"), True),
+    (urllib3.exceptions.ReadTimeoutError(None, "https://oeo.net/result", "Read timed out"), True),
+    (OpenEoApiError(http_status_code=503), True),
+    (OpenEoApiError(http_status_code=429), True),
+    (OpenEoApiError(http_status_code=400), False),
+    (ValueError("nope"), False),
+])
+def test_is_retryable(error, expected):
+    assert is_retryable(error) == expected
+
+
+def test_split_temporal_extent():
+    assert split_temporal_extent(["2019-01-01", "2019-03-01"], chunk_size=30) == [
+        ["2019-01-01", "2019-01-31"], ["2019-01-31", "2019-03-01"]
+    ]
+    assert split_temporal_extent(["2019-01-01", "2019-01-02"], chunk_size=datetime.timedelta(hours=12)) == [
+        ["2019-01-01T00:00:00Z", "2019-01-01T12:00:00Z"], ["2019-01-01T12:00:00Z", "2019-01-02T00:00:00Z"]
+    ]
+    with pytest.raises(ValueError):
+        split_temporal_extent(["2019-01-01", "2019-01-02"], chunk_size=0)
+
+
+def test_restrict_load_collections_temporal():
+    graph = PGNode("load_collection", id="S2", temporal_extent=["2019-01-01", "2020-01-01"])
+    assert restrict_load_collections(graph, temporal_extent=["2019-06-01", "2021-01-01"]).arguments == {
+        "id": "S2", "temporal_extent": ["2019-06-01", "2020-01-01"]
+    }
+
+
+def test_split_geometries():
+    collection = {"type": "GeometryCollection", "geometries": [1, 2, 3, 4, 5], "crs": "EPSG:4326"}
+    assert split_geometries(collection, chunk_size=2) == [
+        {"type": "GeometryCollection", "geometries": [1, 2], "crs": "EPSG:4326"},
+        {"type": "GeometryCollection", "geometries": [3, 4], "crs": "EPSG:4326"},
+        {"type": "GeometryCollection", "geometries": [5], "crs": "EPSG:4326"},
+    ]
+    with pytest.raises(OpenEoClientException):
+        split_geometries({"type": "Polygon", "coordinates": []}, chunk_size=2)
+
+
+def test_merge_timeseries():
+    parts = [
+        (0, {"2019-01-01": [[1], [2]], "2019-01-02": [[3], [4]]}),
+        (1, {"2019-01-01": [[5]]}),
+        (0, {"2019-02-01": [[6], [7]]}),
+        (1, {"2019-02-01": [[8]], "2019-01-01": [[9]]}),
+    ]
+    assert merge_timeseries(parts, polygon_counts=[2, 1]) == {
+        "2019-01-01": [[1], [2], [5]],
+        "2019-01-02": [[3], [4], []],
+        "2019-02-01": [[6], [7], [8]],
+    }
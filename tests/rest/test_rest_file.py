@@ -0,0 +1,119 @@
+import io
+import re
+
+import pytest
+
+from openeo.rest.connection import RestApiConnection
+from openeo.rest.rest_file import RESTFile, upload_files
+
+API_URL = "https://oeo.net/"
+
+
+def read_body(request) -> bytes:
+    """Consume (streaming) request body."""
+    body = request.body
+    if hasattr(body, "read"):
+        chunks = []
+        while True:
+            chunk = body.read(8192)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+    return body
+
+
+@pytest.fixture
+def connection():
+    return RestApiConnection(API_URL)
+
+
+@pytest.fixture
+def uploads(requests_mock):
+    uploads = {}
+
+    def put(request, context):
+        uploads[request.path] = (read_body(request), request.headers)
+        return ""
+
+    requests_mock.put(re.compile(API_URL + "files/.*"), text=put)
+    return uploads
+
+
+def test_upload_file_streaming(connection, uploads, tmp_path):
+    source = tmp_path / "data.bin"
+    data = bytes(range(256)) * 100
+    source.write_bytes(data)
+    progress = []
+    status = RESTFile(connection, "foo/data.bin").upload_file(
+        source, chunk_size=10000, progress=lambda done, total: progress.append((done, total))
+    )
+    assert status == 200
+    body, headers = uploads["/files/foo/data.bin"]
+    assert body == data
+    assert headers["Content-Length"] == "25600"
+    assert headers["Content-Type"] == "application/octet-stream"
+    assert progress == [(10000, 25600), (20000, 25600), (25600, 25600)]
+
+
+def test_upload_file_default_path(connection, uploads, tmp_path):
+    source = tmp_path / "data.bin"
+    source.write_bytes(b"hello")
+    f = RESTFile(connection, None)
+    assert f.upload_file(str(source)) == 200
+    assert f.path == "data.bin"
+    assert uploads["/files/data.bin"][0] == b"hello"
+
+
+def test_upload_file_missing(connection, tmp_path):
+    assert RESTFile(connection, "foo.bin").upload_file(tmp_path / "nope.bin") is False
+
+
+def test_upload_file_like(connection, uploads):
+    assert RESTFile(connection, "hello.txt").upload_file(io.BytesIO(b"hello world")) == 200
+    assert uploads["/files/hello.txt"][0] == b"hello world"
+    with pytest.raises(ValueError, match="file path is required"):
+        RESTFile(connection, None).upload_file(io.BytesIO(b"hello world"))
+
+
+def test_upload_files(connection, uploads, tmp_path):
+    files = {}
+    for i in range(5):
+        source = tmp_path / "f{i}.txt".format(i=i)
+        source.write_bytes(b"file %d" % i)
+        files["dir/f{i}.txt".format(i=i)] = source
+    progress = []
+    statuses = upload_files(
+        connection, files, max_workers=3, progress=lambda path, done, total: progress.append((path, done, total))
+    )
+    assert statuses == {path: 200 for path in files}
+    assert {p: b for p, (b, h) in uploads.items()} == {
+        "/files/dir/f{i}.txt".format(i=i): b"file %d" % i for i in range(5)
+    }
+    assert sorted(progress) == [("dir/f{i}.txt".format(i=i), 6, 6) for i in range(5)]
+
+
+def test_download_file_streaming(connection, requests_mock, tmp_path):
+    data = bytes(range(256)) * 100
+    requests_mock.get(API_URL + "files/foo/data.bin", content=data, headers={"Content-Length": "25600"})
+    target = tmp_path / "data.bin"
+    progress = []
+    status = RESTFile(connection, "foo/data.bin").download_file(
+        target, chunk_size=10000, progress=lambda done, total: progress.append((done, total))
+    )
+    assert status == 200
+    assert target.read_bytes() == data
+    assert progress == [(10000, 25600), (20000, 25600), (25600, 25600)]
+
+
+def test_iter_content(connection, requests_mock):
+    requests_mock.get(API_URL + "files/foo.txt", content=b"hello world")
+    assert list(RESTFile(connection, "foo.txt").iter_content(chunk_size=4)) == [b"hell", b"o wo", b"rld"]
+
+
+def test_legacy_user_path(connection, requests_mock, tmp_path):
+    connection.userid = "john"
+    requests_mock.get(API_URL + "files/john/foo.txt", content=b"hello")
+    target = tmp_path / "foo.txt"
+    assert RESTFile(connection, "foo.txt").download_file(target) == 200
+    assert target.read_bytes() == b"hello"
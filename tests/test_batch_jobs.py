@@ -5,7 +5,6 @@ import requests_mock
 from mock import MagicMock
 
 import openeo
-from openeo.internal.graphbuilder_040 import GraphBuilder
 from openeo import Job
 from . import load_json_resource
 
@@ -13,9 +12,6 @@ from . import load_json_resource
 @requests_mock.mock()
 class TestBatchJobs(TestCase):
 
-    def setUp(self) -> None:
-        GraphBuilder.id_counter = {}
-
     def test_create_job(self, m):
         m.get("http://localhost:8000/api/", json={"api_version": "0.4.0"})
         m.get("http://localhost:8000/api/collections/SENTINEL2_RADIOMETRY_10M", json={})
@@ -4,7 +4,7 @@ from typing import List
 import pytest
 
 from openeo.metadata import CollectionMetadata, Band, SpatialDimension, Dimension, TemporalDimension, BandDimension, \
-    MetadataException
+    MetadataException, dimension_from_dict
 
 
 def test_metadata_get():
@@ -92,6 +92,32 @@ def test_band_dimension_filter_bands():
     assert bdim.filter_bands(["green", 2]) == BandDimension(name="bs", bands=[b03, b04])
 
 
+def test_band_dimension_lookup_maps_follow_band_list():
+    bdim = BandDimension(name="bs", bands=[Band("B02", "blue", 0.490), Band("B03", "green", 0.560)])
+    assert bdim.band_index("green") == 1
+    assert repr(bdim) == "BandDimension(type='bands', name='bs', bands=[Band(name='B02', common_name='blue', " \
+                         "wavelength_um=0.49), Band(name='B03', common_name='green', wavelength_um=0.56)])"
+    bdim.bands = [Band("B04", "red", 0.665)]
+    assert bdim.band_index("red") == 0
+    assert bdim.band_name("red", allow_common=False) == "B04"
+    with pytest.raises(ValueError):
+        bdim.band_index("green")
+
+
+@pytest.mark.parametrize("dim", [
+    SpatialDimension(name="x", extent=[-10, 10], crs=3857),
+    TemporalDimension(name="t", extent=["2020-01-01", "2020-02-01"]),
+    BandDimension(name="bs", bands=[Band("B02", "blue", 0.490), Band("B03", None, None)]),
+    Dimension(type="other", name="o"),
+])
+def test_dimension_to_dict_roundtrip(dim):
+    restored = dimension_from_dict(dim.to_dict())
+    assert restored == dim
+    if isinstance(dim, BandDimension):
+        assert restored.band_index("blue") == 0
+        assert restored.band_name(1) == "B03"
+
+
 def assert_same_dimensions(dims1: List[Dimension], dims2: List[Dimension]):
     assert sorted(dims1, key=lambda d: d.name) == sorted(dims2, key=lambda d: d.name)
 
@@ -101,6 +127,16 @@ def test_get_dimensions_cube_dimensions_empty():
     assert_same_dimensions(dims, [])
 
 
+def test_metadata_explicit_empty_dimensions():
+    metadata = CollectionMetadata(
+        {"cube:dimensions": {"bands": {"type": "bands", "values": ["B02"]}}},
+        dimensions=[]
+    )
+    assert metadata.dimension_names() == []
+    with pytest.raises(MetadataException, match="No band dimension"):
+        metadata.band_dimension
+
+
 def test_get_dimensions_cube_dimensions_spatial_xyt():
     dims = CollectionMetadata._parse_dimensions({
         "cube:dimensions": {
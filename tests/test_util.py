@@ -1,13 +1,15 @@
+import json
 import logging
 import os
 import pathlib
 import re
-from datetime import datetime
+from datetime import datetime, date
 
 import pytest
 
+import openeo.util
 from openeo.util import first_not_none, get_temporal_extent, TimingLogger, ensure_list, ensure_dir, dict_no_none, \
-    deep_get, DeepKeyError
+    deep_get, DeepKeyError, iter_json_items, encode_json
 
 
 def test_dict_no_none():
@@ -189,4 +191,122 @@ def test_deep_get_mixed():
     assert deep_get(d, "bar", 0, "a", 1) == 8
     assert deep_get(d, "bar", 1, "b", 0) == "ar"
     with pytest.raises(DeepKeyError, match=re.escape("2 (from deep key ('bar', 2, 22, 222))")):
-        deep_get(d, "bar", 2, 22, 222)
\ No newline at end of file
+        deep_get(d, "bar", 2, 22, 222)
+
+def _chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1000])
+def test_iter_json_items_object(chunk_size):
+    data = '{"2019-01-01": [[1, 2.5e3], []], "2019-01-02" : [[null, -3]], "n\\u00e4me": "été", "x": {}}'
+    chunks = _chunked(data.encode("utf-8"), chunk_size)
+    assert list(iter_json_items(chunks)) == [
+        ("2019-01-01", [[1, 2500.0], []]),
+        ("2019-01-02", [[None, -3]]),
+        ("näme", "été"),
+        ("x", {}),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1000])
+def test_iter_json_items_array(chunk_size):
+    chunks = _chunked(b' [12, true, "a,b", [3, {"c": null}], 1.5 ] ', chunk_size)
+    assert list(iter_json_items(chunks)) == [(0, 12), (1, True), (2, "a,b"), (3, [3, {"c": None}]), (4, 1.5)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 1000])
+def test_iter_json_items_tricky_strings(chunk_size):
+    data = r'{"a\"]": ["}\\", "[{\"", "\\\""], "b": "x\\", "c": [{"d": "]]"}]}'
+    chunks = _chunked(data.encode("utf-8"), chunk_size)
+    assert list(iter_json_items(chunks)) == list(json.loads(data).items())
+
+
+def test_iter_json_items_parses_each_item_once(monkeypatch):
+    calls = []
+
+    class CountingDecoder(json.JSONDecoder):
+        def raw_decode(self, s, idx=0):
+            calls.append(idx)
+            return super().raw_decode(s, idx)
+
+    monkeypatch.setattr(json, "JSONDecoder", CountingDecoder)
+    big = {"values": [[i, i * 0.5, "v{i}".format(i=i)] for i in range(2000)]}
+    data = json.dumps({"a": big, "b": 1, "c": big}).encode("utf-8")
+    chunks = _chunked(data, 100)
+    assert len(chunks) > 500
+    assert list(iter_json_items(chunks)) == [("a", big), ("b", 1), ("c", big)]
+    # One parse per key and per value (not per chunk).
+    assert len(calls) == 6
+
+
+@pytest.mark.parametrize("data", ["{}", "[]", " { } "])
+def test_iter_json_items_empty(data):
+    assert list(iter_json_items([data])) == []
+
+
+@pytest.mark.parametrize("data", ["3", '{"a": 1', '{"a" 1}', '[1 2]', '{1: 2}'])
+def test_iter_json_items_invalid(data):
+    with pytest.raises(ValueError):
+        list(iter_json_items([data]))
+
+
+@pytest.mark.parametrize("data", [
+    {"a": [1, 2.5, None, True], "b": {"c": "d/e"}},
+    [],
+    "föö",
+    # Not supported by all fast encoders: non-string keys, big integers
+    {1: 2},
+    {"big": 2 ** 70},
+])
+def test_encode_json(data):
+    encoded = encode_json(data)
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded.decode("utf-8")) == json.loads(json.dumps(data))
+
+
+def test_encode_json_invalid():
+    with pytest.raises(TypeError):
+        encode_json({"a": object()})
+
+
+@pytest.fixture(params=["stdlib", "orjson"])
+def json_encode_backend(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        monkeypatch.setattr(openeo.util, "_json_encode", openeo.util._get_json_encoder())
+    else:
+        monkeypatch.setattr(openeo.util, "_json_encode", openeo.util._stdlib_json_encode)
+    return request.param
+
+
+@pytest.mark.parametrize("data", [
+    {"a": [1, 2.5, None, True], "b": ("c", {"d": "e/f"})},
+    "föö",
+    {1: 2},
+    {"big": 2 ** 70},
+])
+def test_encode_json_backends(json_encode_backend, data):
+    assert json.loads(encode_json(data).decode("utf-8")) == json.loads(json.dumps(data))
+
+
+@pytest.mark.parametrize("data", [
+    {"a": date(2020, 1, 2)},
+    {"a": datetime(2020, 1, 2, 3, 4, 5)},
+    {"a": object()},
+])
+def test_encode_json_backends_invalid_type(json_encode_backend, data):
+    with pytest.raises(TypeError):
+        encode_json(data)
+
+
+@pytest.mark.parametrize("data", [
+    {"a": float("nan")},
+    [1, float("inf")],
+    {"a": [float("-inf")]},
+])
+def test_encode_json_backends_strict(json_encode_backend, data):
+    with pytest.raises(ValueError):
+        encode_json(data, strict=True)
+    if json_encode_backend == "orjson":
+        assert b"null" in encode_json(data)